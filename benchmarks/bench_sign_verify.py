@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+"""
+Benchmark signing and verifying synthetic multi-member gzip WARCs.
+
+For each key size and buffer size, measures the throughput (MB/s),
+the per-file latency and the peak RSS of:
+
+- sign: RSASigner.sign() of a filename
+- verify: RSASigner.verify() of a filename
+- verify_size: RSASigner.verify(stream, size=...), without seeking
+- unsigned_stream: reading all of RSASigner.get_unsigned_stream()
+
+Each measurement runs in a separate process, so that peak RSS is
+per operation. Results are written as JSON, and may be compared
+to a previous run with --compare.
+
+Usage:
+
+  python benchmarks/bench_sign_verify.py --size 64 --files 3 -o out.json
+  python benchmarks/bench_sign_verify.py --compare before.json after.json
+"""
+
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+from argparse import ArgumentParser
+from multiprocessing import Pool
+
+import rsa
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from warcsigner.warcsigner import RSASigner
+
+
+OPERATIONS = ('sign', 'verify', 'verify_size', 'unsigned_stream')
+
+MB = 1024 * 1024
+
+WARC_HEADER = """WARC/1.0\r
+WARC-Type: response\r
+WARC-Target-URI: http://example.com/%(num)d\r
+WARC-Date: 2014-01-01T00:00:00Z\r
+WARC-Record-ID: <urn:uuid:%(num)032d>\r
+Content-Type: application/http; msgtype=response\r
+Content-Length: %(length)d\r
+\r
+"""
+
+
+#=================================================================
+def write_warc(filename, size, records, seed=0):
+    """ Write a synthetic WARC of about size bytes of gzip members,
+    one per record, with partly compressible payloads
+    """
+    rand = random.Random(seed)
+    record_size = max(size // records, 1)
+
+    # a pool of random data, payloads are a mix of random and text
+    noise = ''.join(chr(rand.getrandbits(8)) for i in xrange(64 * 1024))
+
+    with open(filename, 'wb') as fh:
+        for num in xrange(records):
+            payload = []
+            payload_len = 0
+            while payload_len < record_size:
+                offset = rand.randrange(len(noise))
+                payload.append(noise[offset:offset + 4096])
+                payload.append('<p>lorem ipsum dolor sit amet</p>\n' * 64)
+                payload_len += len(payload[-1]) + len(payload[-2])
+
+            payload = ''.join(payload)
+            record = (WARC_HEADER % dict(num=num, length=len(payload)) +
+                      payload + '\r\n\r\n')
+
+            comp = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            fh.write(comp.compress(record))
+            fh.write(comp.flush())
+
+
+def write_keys(dir_, bits):
+    """ Write a new private/public key pair of given size
+    """
+    pub_key, priv_key = rsa.newkeys(bits)
+
+    priv_file = os.path.join(dir_, 'private_%d.pem' % bits)
+    with open(priv_file, 'w') as fh:
+        fh.write(priv_key.save_pkcs1())
+
+    pub_file = os.path.join(dir_, 'public_%d.pem' % bits)
+    with open(pub_file, 'w') as fh:
+        fh.write(pub_key.save_pkcs1())
+
+    return priv_file, pub_file
+
+
+#=================================================================
+def peak_rss_kb():
+    """ Peak RSS of the current process, in KB
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on OS X, KB elsewhere
+    if sys.platform == 'darwin':  # pragma: no cover
+        rss //= 1024
+    return rss
+
+
+def run_op(args):
+    """ Run one operation over all files in a fresh worker process,
+    return per-file latencies and peak RSS
+    """
+    op, files, priv_file, pub_file, buff_size = args
+
+    signer = RSASigner(private_key_file=priv_file,
+                       public_key_file=pub_file,
+                       buff_size=buff_size)
+
+    base_rss = peak_rss_kb()
+    latencies = []
+
+    for filename in files:
+        size = os.path.getsize(filename)
+        start = time.time()
+
+        if op == 'sign':
+            assert signer.sign(filename)
+
+        elif op == 'verify':
+            assert signer.verify(filename)
+
+        elif op == 'verify_size':
+            with open(filename, 'rb') as fh:
+                assert signer.verify(fh, size=size)
+
+        elif op == 'unsigned_stream':
+            with open(filename, 'rb') as fh:
+                stream = signer.get_unsigned_stream(fh, size)
+                while stream.read(buff_size):
+                    pass
+
+        latencies.append(time.time() - start)
+
+    return latencies, base_rss, peak_rss_kb()
+
+
+def measure(op, files, priv_file, pub_file, buff_size):
+    # a new process per measurement, for an independent peak RSS
+    pool = Pool(1, maxtasksperchild=1)
+    try:
+        return pool.apply(run_op, ((op, files, priv_file,
+                                    pub_file, buff_size),))
+    finally:
+        pool.close()
+        pool.join()
+
+
+#=================================================================
+def run_benchmarks(size, records, num_files, key_sizes, buff_sizes,
+                   repeat=1, ops=OPERATIONS, temp_dir=None):
+    """ Run all benchmarks, return results as a dict
+    """
+    temp_dir = tempfile.mkdtemp(dir=temp_dir)
+
+    try:
+        sources = []
+        for num in xrange(num_files):
+            filename = os.path.join(temp_dir, 'source-%d.warc.gz' % num)
+            write_warc(filename, size, records, seed=num)
+            sources.append(filename)
+
+        files = [source + '.test' for source in sources]
+
+        results = []
+
+        for bits in key_sizes:
+            priv_file, pub_file = write_keys(temp_dir, bits)
+
+            for buff_size in buff_sizes:
+                for op in ops:
+                    best = None
+
+                    for i in xrange(repeat):
+                        for source, filename in zip(sources, files):
+                            shutil.copyfile(source, filename)
+
+                        # all ops but sign operate on signed files
+                        if op != 'sign':
+                            measure('sign', files, priv_file, pub_file,
+                                    buff_size)
+
+                        res = measure(op, files, priv_file, pub_file,
+                                      buff_size)
+
+                        if not best or sum(res[0]) < sum(best[0]):
+                            best = res
+
+                    latencies, base_rss, rss = best
+                    total_bytes = sum(os.path.getsize(f) for f in files)
+
+                    results.append(dict(op=op,
+                                        key_bits=bits,
+                                        buff_size=buff_size,
+                                        files=num_files,
+                                        total_bytes=total_bytes,
+                                        seconds=sum(latencies),
+                                        mb_per_sec=_mb_per_sec(total_bytes,
+                                                               sum(latencies)),
+                                        latency_ms=[t * 1000
+                                                    for t in latencies],
+                                        base_rss_kb=base_rss,
+                                        peak_rss_kb=rss))
+
+                    print >> sys.stderr, _format_result(results[-1])
+
+    finally:
+        shutil.rmtree(temp_dir)
+
+    return dict(info=_run_info(size, records, num_files, repeat),
+                results=results)
+
+
+def _mb_per_sec(total_bytes, seconds):
+    if not seconds:
+        return None
+
+    return total_bytes / float(MB) / seconds
+
+
+def _run_info(size, records, num_files, repeat):
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                         stderr=open(os.devnull, 'w'),
+                                         cwd=os.path.dirname(__file__))
+        commit = commit.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return dict(commit=commit,
+                time=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                python=platform.python_version(),
+                platform=platform.platform(),
+                file_size=size,
+                records=records,
+                files=num_files,
+                repeat=repeat)
+
+
+def _result_key(result):
+    return (result['op'], result['key_bits'], result['buff_size'])
+
+
+def _format_result(result):
+    return ('%-16s key=%-5d buff=%-9d %8.1f MB/s  %8.1f ms/file  '
+            'peak rss=%d KB' % (result['op'],
+                                result['key_bits'],
+                                result['buff_size'],
+                                result['mb_per_sec'] or 0,
+                                result['seconds'] * 1000 / result['files'],
+                                result['peak_rss_kb']))
+
+
+#=================================================================
+def compare(before, after):
+    """ Yield a line comparing the throughput and peak RSS of each
+    result in after to the same result in before
+    """
+    before = dict((_result_key(res), res) for res in before['results'])
+
+    for res in after['results']:
+        old = before.get(_result_key(res))
+        if not old or not old['mb_per_sec'] or not res['mb_per_sec']:
+            continue
+
+        speedup = res['mb_per_sec'] / old['mb_per_sec']
+        yield ('%-16s key=%-5d buff=%-9d %8.1f -> %8.1f MB/s (%+.1f%%)  '
+               'rss %d -> %d KB' % (res['op'], res['key_bits'],
+                                    res['buff_size'],
+                                    old['mb_per_sec'], res['mb_per_sec'],
+                                    (speedup - 1) * 100,
+                                    old['peak_rss_kb'], res['peak_rss_kb']))
+
+
+#=================================================================
+def main(args=None):
+    parser = ArgumentParser(description='benchmark warc signing ' +
+                                        'and verification')
+
+    parser.add_argument('--size', type=float, default=64,
+                        help='size of each synthetic warc, in MB ' +
+                             '(default: %(default)s)')
+
+    parser.add_argument('--records', type=int, default=1000,
+                        help='number of records (gzip members) per warc ' +
+                             '(default: %(default)s)')
+
+    parser.add_argument('--files', type=int, default=3,
+                        help='number of warcs (default: %(default)s)')
+
+    parser.add_argument('--key-sizes', type=int, nargs='+',
+                        default=[1024, 2048],
+                        help='rsa key sizes in bits (default: %(default)s)')
+
+    parser.add_argument('--buff-sizes', type=int, nargs='+',
+                        default=[64 * 1024, 1024 * 1024, 8 * 1024 * 1024],
+                        help='buffer sizes (default: %(default)s)')
+
+    parser.add_argument('--ops', nargs='+', choices=OPERATIONS,
+                        default=list(OPERATIONS),
+                        help='operations to benchmark (default: all)')
+
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='repeat each measurement, keeping the ' +
+                             'fastest (default: %(default)s)')
+
+    parser.add_argument('--temp-dir',
+                        help='directory for the synthetic warcs')
+
+    parser.add_argument('-o', '--output',
+                        help='write JSON results to file (default: stdout)')
+
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='compare two JSON results files')
+
+    cmd = parser.parse_args(args=args)
+
+    if cmd.compare:
+        with open(cmd.compare[0]) as fh:
+            before = json.load(fh)
+
+        with open(cmd.compare[1]) as fh:
+            after = json.load(fh)
+
+        for line in compare(before, after):
+            print line
+
+        return 0
+
+    results = run_benchmarks(int(cmd.size * MB), cmd.records, cmd.files,
+                             cmd.key_sizes, cmd.buff_sizes, cmd.repeat,
+                             cmd.ops, cmd.temp_dir)
+
+    if cmd.output:
+        with open(cmd.output, 'w') as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+    else:
+        print json.dumps(results, indent=2, sort_keys=True)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
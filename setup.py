@@ -34,6 +34,9 @@ setup(
     packages=find_packages(),
     provides=['warcsigner'],
     install_requires=['rsa'],
+    extras_require={
+        'cryptography': ['cryptography'],
+       },
     tests_require=[
         'pytest',
         'pytest-cov',
@@ -44,6 +47,9 @@ setup(
         [console_scripts]
         warc-sign = warcsigner.warcsigner:sign_cli
         warc-verify = warcsigner.warcsigner:verify_cli
+        warc-scan = warcsigner.scanner:scan_cli
+        warc-sign-daemon = warcsigner.daemon:daemon_cli
+        warc-scrub = warcsigner.scrub:scrub_cli
         """,
     zip_safe=False,
     classifiers=[
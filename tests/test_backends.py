@@ -0,0 +1,161 @@
+from warcsigner.warcsigner import RSASigner, sign_cli, verify_cli
+from warcsigner.hashing import new_hash
+
+from test_warcsigner import TEST_WARC, PRIVATE_KEY, PUBLIC_KEY
+from test_warcsigner import PUBLIC_WRONG_KEY
+
+from pytest import raises, importorskip
+
+import os
+import shutil
+import tempfile
+
+from io import BytesIO
+
+
+class TestBackends(object):
+    def setup(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_warc = os.path.join(self.temp_dir, 'test.warc.gz')
+        shutil.copyfile(TEST_WARC, self.temp_warc)
+
+    def teardown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _ed25519_keys(self):
+        ed25519 = importorskip('cryptography.hazmat.primitives.asymmetric.ed25519')
+        from cryptography.hazmat.primitives import serialization
+
+        priv_key = ed25519.Ed25519PrivateKey.generate()
+
+        priv_file = os.path.join(self.temp_dir, 'ed_private.pem')
+        with open(priv_file, 'wb') as fh:
+            fh.write(priv_key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption()))
+
+        pub_file = os.path.join(self.temp_dir, 'ed_public.pem')
+        with open(pub_file, 'wb') as fh:
+            fh.write(priv_key.public_key().public_bytes(
+                serialization.Encoding.PEM,
+                serialization.PublicFormat.SubjectPublicKeyInfo))
+
+        return priv_file, pub_file
+
+    def test_invalid_backend(self):
+        with raises(ValueError):
+            RSASigner(public_key_file=PUBLIC_KEY, backend='other')
+
+    def test_native_rsa_compat(self):
+        importorskip('cryptography')
+
+        native = RSASigner(private_key_file=PRIVATE_KEY,
+                           public_key_file=PUBLIC_KEY,
+                           backend='cryptography')
+
+        signer = RSASigner(private_key_file=PRIVATE_KEY,
+                           public_key_file=PUBLIC_KEY)
+
+        assert native.key_id == signer.key_id
+
+        # same signatures for either backend
+        for hash_type in ('SHA-1', 'SHA-256'):
+            digest = new_hash(hash_type).digest()
+            assert (native.sign_digest(digest, hash_type).signature ==
+                    signer.sign_digest(digest, hash_type).signature)
+
+        for sign_with, verify_with in ((native, signer), (signer, native)):
+            for kwargs in ({}, {'key_id': True}, {'checkpoint': True}):
+                shutil.copyfile(TEST_WARC, self.temp_warc)
+                assert sign_with.sign(self.temp_warc, **kwargs) == True
+                assert verify_with.verify(self.temp_warc) == True
+
+        wrong = RSASigner(public_key_file=PUBLIC_WRONG_KEY,
+                          backend='cryptography')
+        assert wrong.verify(self.temp_warc) == False
+
+    def test_ed25519_sign_verify(self):
+        priv_file, pub_file = self._ed25519_keys()
+
+        signer = RSASigner(private_key_file=priv_file,
+                           backend='cryptography')
+        verifier = RSASigner(public_key_file=pub_file,
+                             backend='cryptography')
+
+        assert signer.sign(self.temp_warc, 'SHA-256') == True
+
+        assert verifier.verify(self.temp_warc) == True
+
+        # not verified by rsa keys, and vice versa
+        assert RSASigner(public_key_file=PUBLIC_KEY).verify(self.temp_warc) == False
+
+        # streaming verify
+        with open(self.temp_warc, 'rb') as fh:
+            size = os.path.getsize(self.temp_warc)
+            assert verifier.verify(fh, size=size, hash_type='SHA-256') == True
+
+        with open(self.temp_warc, 'rb') as fh:
+            assert verifier.verify(fh, size=size, hash_type='SHA-1') == False
+
+        # unsigned stream
+        with open(self.temp_warc, 'rb') as fh:
+            stream = verifier.get_unsigned_stream(fh, size)
+            assert stream.read(size) == open(TEST_WARC, 'rb').read()
+
+        assert verifier.verify(self.temp_warc, remove=True) == True
+        assert open(self.temp_warc, 'rb').read() == open(TEST_WARC, 'rb').read()
+        assert verifier.verify(self.temp_warc) == False
+
+        rsa_signer = RSASigner(private_key_file=PRIVATE_KEY)
+        assert rsa_signer.sign(self.temp_warc) == True
+        assert verifier.verify(self.temp_warc) == False
+
+    def test_ed25519_info(self):
+        priv_file, pub_file = self._ed25519_keys()
+
+        signer = RSASigner(private_key_file=priv_file,
+                           public_key_file=pub_file,
+                           backend='cryptography')
+
+        assert signer.sign(self.temp_warc, 'SHA-256', info=True) == True
+        assert signer.verify(self.temp_warc, quick=True) == True
+        assert signer.verify(self.temp_warc) == True
+
+        assert RSASigner(public_key_file=PUBLIC_KEY).verify(self.temp_warc) == False
+
+        with raises(ValueError):
+            signer.sign(self.temp_warc, tree=True, info=True)
+
+    def test_ed25519_tampered(self):
+        priv_file, pub_file = self._ed25519_keys()
+
+        signer = RSASigner(private_key_file=priv_file,
+                           backend='cryptography')
+
+        buff = BytesIO(open(TEST_WARC, 'rb').read())
+        assert signer.sign(buff) == True
+
+        data = buff.getvalue()
+        assert signer.verify(BytesIO(data)) == True
+
+        # modify the hash type stored with the signature
+        data = data.replace('SHA-1\000', 'MD5\000\000\000')
+        assert signer.verify(BytesIO(data)) == False
+
+        data = 'X' + buff.getvalue()[1:]
+        assert signer.verify(BytesIO(data)) == False
+
+        with raises(ValueError):
+            signer.sign(BytesIO(data), tree=True)
+
+    def test_cli_ed25519(self):
+        priv_file, pub_file = self._ed25519_keys()
+
+        assert sign_cli(['--backend', 'cryptography',
+                         priv_file, self.temp_warc]) == 0
+
+        assert verify_cli(['--backend', 'cryptography',
+                           pub_file, self.temp_warc]) == 0
+
+        assert verify_cli([PUBLIC_KEY, self.temp_warc]) == 1
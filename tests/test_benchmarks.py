@@ -0,0 +1,37 @@
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                '..', 'benchmarks'))
+
+import bench_sign_verify
+
+
+def test_benchmark_smoke():
+    temp_dir = tempfile.mkdtemp()
+    output = os.path.join(temp_dir, 'results.json')
+
+    try:
+        assert bench_sign_verify.main(['--size', '0.1', '--records', '5',
+                                       '--files', '2', '--key-sizes', '512',
+                                       '--buff-sizes', '4096',
+                                       '--temp-dir', temp_dir,
+                                       '-o', output]) == 0
+
+        with open(output) as fh:
+            results = json.load(fh)
+
+        ops = [res['op'] for res in results['results']]
+        assert ops == list(bench_sign_verify.OPERATIONS)
+
+        for res in results['results']:
+            assert len(res['latency_ms']) == 2
+            assert res['peak_rss_kb'] > 0
+
+        lines = list(bench_sign_verify.compare(results, results))
+        assert len(lines) == len(ops)
+    finally:
+        os.remove(output)
+        os.rmdir(temp_dir)
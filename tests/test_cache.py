@@ -0,0 +1,96 @@
+from warcsigner.warcsigner import RSASigner, verify_cli
+from warcsigner.cache import VerifyCache
+
+from test_warcsigner import TEST_WARC, PRIVATE_KEY, PUBLIC_KEY
+from test_warcsigner import PUBLIC_WRONG_KEY
+
+import os
+import shutil
+import tempfile
+
+
+class TestVerifyCache(object):
+    def setup(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.temp_dir, 'cache.db')
+
+        self.warc = os.path.join(self.temp_dir, 'test.warc.gz')
+        shutil.copyfile(TEST_WARC, self.warc)
+
+        RSASigner(private_key_file=PRIVATE_KEY).sign(self.warc)
+
+        self.signer = RSASigner(public_key_file=PUBLIC_KEY,
+                                cache=self.cache_path)
+        self.verified = []
+
+        # track actual verifications
+        verify_stream = self.signer.verify_stream
+
+        def track_verify(fh, remove=False, quick=False, checker=None):
+            self.verified.append(fh.name)
+            return verify_stream(fh, remove, quick, checker)
+
+        self.signer.verify_stream = track_verify
+
+    def teardown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_cached_result(self):
+        assert self.signer.verify(self.warc) == True
+        assert self.signer.verify(self.warc) == True
+        assert self.verified == [self.warc]
+
+        # new signer, persistent cache
+        signer = RSASigner(public_key_file=PUBLIC_KEY, cache=self.cache_path)
+        signer.verify_stream = None
+        assert signer.verify(self.warc) == True
+
+        # different key, not cached
+        wrong_signer = RSASigner(public_key_file=PUBLIC_WRONG_KEY,
+                                 cache=self.signer.cache)
+        assert wrong_signer.verify(self.warc) == False
+        assert self.signer.verify(self.warc) == True
+
+        # quick check is never cached
+        assert self.signer.verify(self.warc, quick=True) == True
+        assert self.verified == [self.warc, self.warc]
+
+        # remove is never cached
+        assert self.signer.verify(self.warc, remove=True) == True
+        assert self.verified == [self.warc, self.warc, self.warc]
+
+    def test_modified_invalidates(self):
+        assert self.signer.verify(self.warc) == True
+
+        with open(self.warc, 'r+b') as fh:
+            fh.seek(100)
+            fh.write('X')
+
+        assert self.signer.verify(self.warc) == False
+        assert self.signer.verify(self.warc) == False
+        assert self.verified == [self.warc, self.warc]
+
+    def test_lru_eviction(self):
+        cache = VerifyCache(self.cache_path, max_entries=2)
+        files = []
+        for i in xrange(3):
+            path = os.path.join(self.temp_dir, 'test-%d' % i)
+            open(path, 'w').close()
+            files.append(os.stat(path))
+
+        cache.put(files[0], 'key', 'SHA-1', True)
+        cache.put(files[1], 'key', 'SHA-1', False)
+
+        # use first, evicting second
+        assert cache.get(files[0], 'key', 'SHA-1') == True
+        cache.put(files[2], 'key', 'SHA-1', True)
+
+        assert cache.get(files[0], 'key', 'SHA-1') == True
+        assert cache.get(files[1], 'key', 'SHA-1') == None
+        assert cache.get(files[2], 'key', 'SHA-1') == True
+
+    def test_cli_cache(self):
+        assert verify_cli(['--cache', self.cache_path,
+                           PUBLIC_KEY, self.warc]) == 0
+        assert self.signer.verify(self.warc) == True
+        assert self.verified == []
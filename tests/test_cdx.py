@@ -0,0 +1,113 @@
+from warcsigner.warcsigner import RSASigner, sign_cli, verify_cli
+from warcsigner.warccheck import WarcChecker
+from warcsigner.cdx import CdxIndex, CDX_HEADER
+
+from test_warcsigner import TEST_WARC, TEST_WARC_RECORDS
+from test_warcsigner import PRIVATE_KEY, PUBLIC_KEY
+
+import os
+import shutil
+import tempfile
+
+from io import BytesIO
+from pytest import raises
+
+
+EXAMPLE = 'http://example.com?example=1'
+
+# (url, date) of each record of TEST_WARC
+TEST_WARC_URLS = [('-', '20140103030322'),
+                  (EXAMPLE, '20140103030321'),
+                  (EXAMPLE, '20140103030321'),
+                  (EXAMPLE, '20140103030341'),
+                  (EXAMPLE, '20140103030341'),
+                  ('http://www.iana.org/domains/example', '20140128051539')]
+
+
+#=================================================================
+class TestCdxIndex(object):
+    def setup(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_warc = os.path.join(self.temp_dir, 'test.warc.gz')
+        shutil.copyfile(TEST_WARC, self.temp_warc)
+
+        self.signer = RSASigner(private_key_file=PRIVATE_KEY,
+                                public_key_file=PUBLIC_KEY)
+
+        self.expected = sorted((url, date, offset, length)
+                               for (url, date), (offset, length)
+                               in zip(TEST_WARC_URLS, TEST_WARC_RECORDS))
+
+    def teardown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def load(self, filename):
+        with open(filename, 'rb') as fh:
+            return CdxIndex.load(fh)
+
+    def test_sign_cdx(self):
+        for kwargs in ({}, {'tree': True}, {'index': True}):
+            shutil.copyfile(TEST_WARC, self.temp_warc)
+
+            assert self.signer.sign(self.temp_warc, cdx=True, **kwargs)
+            assert self.signer.verify(self.temp_warc) == True
+
+            index = self.load(self.temp_warc + '.cdx')
+            assert index.filename == 'test.warc.gz'
+            assert sorted(index.entries) == self.expected
+
+        # sorted lines
+        lines = open(self.temp_warc + '.cdx', 'rb').read().splitlines()
+        assert lines[0] == CDX_HEADER
+        assert lines[1:] == sorted(lines[1:])
+        assert lines[1] == '- 20140103030322 333 0 test.warc.gz'
+
+        # stream, to stream
+        buff = BytesIO(open(TEST_WARC, 'rb').read())
+        cdx = BytesIO()
+        assert self.signer.sign(buff, cdx=cdx) == True
+        cdx.seek(0)
+        assert CdxIndex.load(cdx).filename == '-'
+
+        # no cdx filename for a stream, nothing written
+        buff = BytesIO(open(TEST_WARC, 'rb').read())
+        with raises(ValueError):
+            self.signer.sign(buff, cdx=True)
+
+        assert buff.getvalue() == open(TEST_WARC, 'rb').read()
+
+        # not valid, not signed
+        with open(self.temp_warc, 'wb') as fh:
+            fh.write('X' + open(TEST_WARC, 'rb').read())
+
+        os.remove(self.temp_warc + '.cdx')
+        assert self.signer.sign(self.temp_warc, cdx=True) == False
+        assert self.signer.verify(self.temp_warc) == False
+        assert not os.path.exists(self.temp_warc + '.cdx')
+
+    def test_verify_cdx(self):
+        assert self.signer.sign(self.temp_warc) == True
+
+        checker = WarcChecker(index=True)
+        assert self.signer.verify(self.temp_warc, checker=checker) == True
+        assert sorted(checker.cdx_index().entries) == self.expected
+
+        # only with index set
+        checker = WarcChecker()
+        assert self.signer.verify(self.temp_warc, checker=checker) == True
+        assert checker.cdx_index() == None
+
+    def test_cli_cdx(self):
+        cdx_file = self.temp_warc + '.cdx'
+
+        assert sign_cli(['--cdx', PRIVATE_KEY, self.temp_warc]) == 0
+        assert sorted(self.load(cdx_file).entries) == self.expected
+
+        os.remove(cdx_file)
+        assert verify_cli(['--cdx', PUBLIC_KEY, self.temp_warc]) == 0
+        assert sorted(self.load(cdx_file).entries) == self.expected
+
+        # not written if not verified
+        os.remove(cdx_file)
+        assert verify_cli(['--cdx', PUBLIC_KEY, TEST_WARC]) == 1
+        assert not os.path.exists(TEST_WARC + '.cdx')
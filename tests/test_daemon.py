@@ -0,0 +1,116 @@
+from warcsigner.warcsigner import RSASigner, sign_cli, verify_cli
+from warcsigner.daemon import SigningServer, RemoteBackend
+from warcsigner.hashing import new_hash
+
+from test_warcsigner import TEST_WARC, PRIVATE_KEY, PUBLIC_KEY
+
+from pytest import raises
+
+import os
+import shutil
+import stat
+import tempfile
+import threading
+
+
+class TestDaemon(object):
+    def setup(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.temp_dir, 'signer.sock')
+        self.temp_warc = os.path.join(self.temp_dir, 'test.warc.gz')
+        shutil.copyfile(TEST_WARC, self.temp_warc)
+
+        self.server = self._start()
+
+    def teardown(self):
+        self._stop(self.server)
+        shutil.rmtree(self.temp_dir)
+
+    def _start(self):
+        server = SigningServer(self.socket_path, PRIVATE_KEY)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return server
+
+    def _stop(self, server):
+        server.shutdown()
+        server.server_close()
+
+    def test_remote_sign(self):
+        signer = RSASigner(remote=self.socket_path)
+        local = RSASigner(private_key_file=PRIVATE_KEY,
+                          public_key_file=PUBLIC_KEY)
+
+        assert signer.priv_key is None
+        assert signer.key_id == local.key_id
+
+        # same signature as signing locally
+        digest = new_hash('SHA-256').digest()
+        assert (signer.sign_digest(digest, 'SHA-256').signature ==
+                local.sign_digest(digest, 'SHA-256').signature)
+
+        for kwargs in ({}, {'key_id': True}, {'checkpoint': True},
+                       {'info': True}):
+            shutil.copyfile(TEST_WARC, self.temp_warc)
+            assert signer.sign(self.temp_warc, **kwargs) == True
+            assert local.verify(self.temp_warc) == True
+
+            # verified with the public key of the server
+            assert signer.verify(self.temp_warc) == True
+
+        assert signer.append(self.temp_warc, 'ABC') == False
+
+        assert oct(stat.S_IMODE(os.stat(self.socket_path).st_mode)) == '0600'
+
+    def test_batch_and_errors(self):
+        backend = RemoteBackend(self.socket_path)
+        local = RSASigner(private_key_file=PRIVATE_KEY)
+
+        digests = [new_hash('SHA-1').digest(), 'A' * 20, 'B' * 20]
+        signatures = backend.sign_hashes(digests, 'SHA-1')
+        assert signatures == [local.backend.sign_hash(digest, 'SHA-1')
+                              for digest in digests]
+
+        with raises(ValueError):
+            backend.sign_hash('A' * 20, 'SHA-2')
+
+        with raises(ValueError):
+            backend._request(dict(op='other'))
+
+        # digests of the wrong size for the hash type
+        with raises(ValueError):
+            backend.sign_hash('A' * 32, 'SHA-1')
+
+        with raises(ValueError):
+            backend.sign_hashes(['A' * 20, 'B' * 19], 'SHA-1')
+
+        # reconnects to a restarted server
+        self._stop(self.server)
+        self.server = self._start()
+        assert backend.sign_hash(digests[0], 'SHA-1') == signatures[0]
+
+        backend.close()
+
+    def test_socket_mode_on_bind(self):
+        class CheckedServer(SigningServer):
+            def server_activate(self):
+                st = os.stat(self.server_address)
+                self.bound_mode = stat.S_IMODE(st.st_mode)
+                SigningServer.server_activate(self)
+
+        path = os.path.join(self.temp_dir, 'checked.sock')
+
+        umask = os.umask(0)
+        try:
+            server = CheckedServer(path, PRIVATE_KEY)
+        finally:
+            os.umask(umask)
+
+        # not accessible to others before listening
+        assert server.bound_mode == 0600
+        server.server_close()
+
+    def test_cli_remote_sign(self):
+        assert sign_cli([self.socket_path, '--info', self.temp_warc]) == 0
+        assert verify_cli([PUBLIC_KEY, self.temp_warc]) == 0
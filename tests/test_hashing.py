@@ -0,0 +1,95 @@
+from warcsigner.hashing import hash_file, hash_stream, new_hash
+from warcsigner.hashing import hash_sequential
+from warcsigner import hashing
+
+import hashlib
+import tempfile
+
+from io import BytesIO
+
+
+DATA = ''.join(chr(i % 251) for i in xrange(100000))
+
+
+def sha1_of(func, fh, *args, **kwargs):
+    hasher = new_hash('SHA-1')
+    count = func(fh, [hasher], *args, **kwargs)
+    return count, hasher.digest()
+
+
+class TestHashing(object):
+    def test_hash_stream_buffers(self):
+        expected = hashlib.sha1(DATA).digest()
+
+        for buff_size in (1, 7, 4096, 1024 * 1024):
+            res = sha1_of(hash_stream, BytesIO(DATA), buff_size=buff_size)
+            assert res == (len(DATA), expected)
+
+    def test_hash_stream_limit_no_readinto(self):
+        class ReadOnly(object):
+            def __init__(self, data):
+                self.buff = BytesIO(data)
+
+            def read(self, length):
+                return self.buff.read(length)
+
+        expected = hashlib.sha1(DATA[:1000]).digest()
+        res = sha1_of(hash_stream, ReadOnly(DATA), 1000, buff_size=300)
+        assert res == (1000, expected)
+
+    def test_hash_file_mmap(self):
+        with tempfile.TemporaryFile() as temp:
+            # unflushed write must still be hashed
+            temp.write(DATA)
+
+            res = sha1_of(hash_file, temp, buff_size=4096)
+            assert res == (len(DATA), hashlib.sha1(DATA).digest())
+            assert temp.tell() == len(DATA)
+
+            res = sha1_of(hash_file, temp, 5000, buff_size=4096)
+            assert res == (5000, hashlib.sha1(DATA[:5000]).digest())
+            assert temp.tell() == 5000
+
+    def test_hash_file_empty_and_stream(self):
+        with tempfile.TemporaryFile() as temp:
+            assert sha1_of(hash_file, temp) == (0, hashlib.sha1().digest())
+
+        # non-file stream, falls back to reading
+        buff = BytesIO(DATA)
+        buff.seek(100)
+        res = sha1_of(hash_file, buff, 50)
+        assert res == (50, hashlib.sha1(DATA[:50]).digest())
+
+    def test_hash_sequential(self, monkeypatch):
+        advice = []
+
+        def fadvise(fd, offset, length, advice_):
+            advice.append((offset, length, advice_))
+
+        monkeypatch.setattr(hashing, 'posix_fadvise', fadvise)
+
+        with tempfile.TemporaryFile() as temp:
+            # unflushed write must still be hashed
+            temp.write(DATA)
+
+            res = sha1_of(hash_sequential, temp, buff_size=4096 * 8)
+            assert res == (len(DATA), hashlib.sha1(DATA).digest())
+            assert temp.tell() == len(DATA)
+
+            # read ahead, then each read dropped
+            assert advice[0] == (0, len(DATA), hashing.POSIX_FADV_SEQUENTIAL)
+            assert advice[1:] == [(offset, min(32768, len(DATA) - offset),
+                                   hashing.POSIX_FADV_DONTNEED)
+                                  for offset in xrange(0, len(DATA), 32768)]
+
+            # reads rounded up to the page size
+            del advice[:]
+            sha1_of(hash_sequential, temp, buff_size=1000)
+            assert advice[1][1] % hashing.mmap.PAGESIZE == 0
+
+            res = sha1_of(hash_sequential, temp, 5000, start=1000)
+            assert res == (4000, hashlib.sha1(DATA[1000:5000]).digest())
+            assert temp.tell() == 5000
+
+        res = sha1_of(hash_sequential, BytesIO(DATA), 5000, start=1000)
+        assert res == (4000, hashlib.sha1(DATA[1000:5000]).digest())
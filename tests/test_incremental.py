@@ -0,0 +1,79 @@
+from warcsigner.warcsigner import RSASigner
+from warcsigner.incremental import StreamVerifier
+from warcsigner.stats import Stats
+
+from test_warcsigner import TEST_WARC, PRIVATE_KEY, PUBLIC_KEY
+from test_warcsigner import PUBLIC_WRONG_KEY
+
+from pytest import raises
+
+from io import BytesIO
+
+
+class TestStreamVerifier(object):
+    def setup(self):
+        self.signer = RSASigner(private_key_file=PRIVATE_KEY,
+                                public_key_file=PUBLIC_KEY)
+
+        self.orig = open(TEST_WARC, 'rb').read()
+
+        buff = BytesIO(self.orig)
+        assert self.signer.sign(buff, 'SHA-256') == True
+        self.signed = buff.getvalue()
+
+    def _verify(self, data, chunk_size, signer=None, hash_type=None):
+        verifier = StreamVerifier(signer or self.signer, hash_type)
+        for offset in xrange(0, len(data), chunk_size):
+            verifier.feed(data[offset:offset + chunk_size])
+
+        assert verifier.length == len(data)
+        return verifier.close()
+
+    def test_verify_chunks(self):
+        sig_header = self.signer.get_rsa_metadata()[0]
+
+        for chunk_size in (1, 7, sig_header - 1, sig_header,
+                           sig_header + 1, 1000, len(self.signed)):
+            assert self._verify(self.signed, chunk_size) == True
+
+    def test_verify_buffers(self):
+        sig_header = self.signer.get_rsa_metadata()[0]
+
+        for chunk_size in (7, sig_header, 1000):
+            for buff in (memoryview(self.signed), bytearray(self.signed)):
+                assert self._verify(buff, chunk_size) == True
+
+        # held data is a copy, not of the buffer of the caller
+        verifier = StreamVerifier(self.signer)
+        verifier.feed(memoryview(self.signed))
+        assert type(verifier.held) == str
+
+    def test_not_verified(self):
+        assert self._verify(self.orig, 100) == False
+        assert self._verify('X' + self.signed[1:], 100) == False
+        assert self._verify(self.signed[:-1], 100) == False
+        assert self._verify(self.signed[:10], 100) == False
+        assert self._verify('', 100) == False
+
+        wrong_signer = RSASigner(public_key_file=PUBLIC_WRONG_KEY)
+        assert self._verify(self.signed, 100, wrong_signer) == False
+
+        # hash type not a candidate
+        assert self._verify(self.signed, 100, hash_type='SHA-1') == False
+        assert self._verify(self.signed, 100, hash_type='SHA-256') == True
+
+    def test_closed(self):
+        verifier = StreamVerifier(self.signer)
+        verifier.feed(self.signed)
+        assert verifier.close() == True
+        assert verifier.close() == True
+
+        with raises(ValueError):
+            verifier.feed('ABC')
+
+    def test_stats(self):
+        stats = Stats()
+        signer = RSASigner(public_key_file=PUBLIC_KEY, stats=stats)
+
+        assert self._verify(self.signed, 500, signer) == True
+        assert stats.bytes_read == len(self.orig)
@@ -0,0 +1,156 @@
+from warcsigner.warcsigner import RSASigner, sign_cli, verify_cli
+from warcsigner.keyring import Keyring
+
+from test_warcsigner import TEST_WARC, PRIVATE_KEY, PUBLIC_KEY
+from test_warcsigner import PUBLIC_WRONG_KEY
+
+import os
+import rsa
+import shutil
+import tempfile
+
+from io import BytesIO
+
+
+class TestKeyring(object):
+    def setup(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+        self.key_dir = os.path.join(self.temp_dir, 'keys')
+        os.makedirs(self.key_dir)
+
+        shutil.copyfile(PUBLIC_KEY, os.path.join(self.key_dir, 'a.pem'))
+        shutil.copyfile(PUBLIC_WRONG_KEY, os.path.join(self.key_dir, 'b.pem'))
+
+        # additional key, of a different size
+        pub_key, priv_key = rsa.newkeys(512)
+        other_key = os.path.join(self.temp_dir, 'other_private.pem')
+        with open(other_key, 'w') as fh:
+            fh.write(priv_key.save_pkcs1())
+
+        with open(os.path.join(self.key_dir, 'c.pem'), 'w') as fh:
+            fh.write(pub_key.save_pkcs1())
+
+        self.signer = RSASigner(private_key_file=PRIVATE_KEY,
+                                chunk_size=1000)
+        self.other_signer = RSASigner(private_key_file=other_key)
+
+        self.keyring = Keyring([self.key_dir])
+
+        # track which signers verify
+        self.verified = []
+        for signer in self.keyring.signers.values():
+            self._track(signer)
+
+    def _track(self, signer):
+        verify_stream = signer.verify_stream
+
+        def track_verify(fh, remove=False, quick=False, checker=None):
+            self.verified.append(signer.key_id)
+            return verify_stream(fh, remove, quick, checker)
+
+        signer.verify_stream = track_verify
+
+    def teardown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_identify_key(self):
+        for signer in (self.signer, self.other_signer):
+            for kwargs in ({}, {'key_id': True}, {'tree': True},
+                           {'checkpoint': True}, {'info': True}):
+                self.verified = []
+
+                with tempfile.TemporaryFile() as temp:
+                    temp.write(open(TEST_WARC, 'rb').read())
+                    assert signer.sign(temp, **kwargs) == True
+
+                    assert self.keyring.identify(temp) == signer.key_id
+
+                # only one key used to verify (hash) the file
+                assert self.verified == [signer.key_id]
+
+    def test_key_id_metadata(self):
+        buff = BytesIO()
+        buff.write('ABC')
+        assert self.signer.sign(buff, key_id=True) == True
+
+        # key id is stored with signature
+        assert self.signer.key_id[:16].decode('hex') in buff.getvalue()
+        assert self.signer.verify(buff) == True
+
+        wrong_signer = RSASigner(public_key_file=PUBLIC_WRONG_KEY)
+        assert wrong_signer.verify(buff) == False
+
+        # remove signature
+        assert self.keyring.verify(buff, remove=True) == True
+        assert buff.getvalue() == 'ABC'
+
+    def test_not_signed_unknown_key(self):
+        keyring = Keyring([PUBLIC_WRONG_KEY])
+
+        path = os.path.join(self.temp_dir, 'test.warc.gz')
+        shutil.copyfile(TEST_WARC, path)
+
+        assert keyring.verify(path) == False
+        assert self.keyring.verify(path) == False
+
+        for kwargs in ({}, {'key_id': True}):
+            shutil.copyfile(TEST_WARC, path)
+            assert self.signer.sign(path, **kwargs) == True
+
+            assert keyring.verify(path) == False
+            assert keyring.identify(path) == None
+
+            assert self.keyring.verify(path) == True
+
+        assert self.keyring.verify(path + '.missing') == False
+
+        # modified
+        with open(path, 'r+b') as fh:
+            fh.write('X')
+
+        assert self.keyring.verify(path) == False
+
+    def test_keyring_cache(self):
+        path = os.path.join(self.temp_dir, 'test.warc.gz')
+        shutil.copyfile(TEST_WARC, path)
+        assert self.signer.sign(path) == True
+
+        cache_path = os.path.join(self.temp_dir, 'cache.db')
+        self.keyring = Keyring([self.key_dir], cache=cache_path)
+
+        self.verified = []
+        for signer in self.keyring.signers.values():
+            self._track(signer)
+            assert signer.cache is self.keyring.cache
+
+        assert self.keyring.identify(path) == self.signer.key_id
+        assert self.keyring.identify(path) == self.signer.key_id
+        assert self.verified == [self.signer.key_id]
+
+        # not cached for streams
+        with open(path, 'rb') as fh:
+            assert self.keyring.verify(fh) == True
+
+        assert len(self.verified) == 2
+
+        # from the cli
+        assert verify_cli(['--cache', cache_path, self.key_dir, path]) == 0
+
+        keyring = Keyring([self.key_dir], cache=cache_path)
+        for signer in keyring.signers.values():
+            signer.verify_stream = None
+
+        assert keyring.verify(path) == True
+
+    def test_cli_keyring(self):
+        path = os.path.join(self.temp_dir, 'test.warc.gz')
+        shutil.copyfile(TEST_WARC, path)
+        assert self.other_signer.sign(path, key_id=True) == True
+
+        assert verify_cli([self.key_dir, path]) == 0
+        assert verify_cli(['-j', '2', self.key_dir, path, TEST_WARC]) == 1
+
+        shutil.copyfile(TEST_WARC, path)
+        assert sign_cli(['--key-id', PRIVATE_KEY, path]) == 0
+        assert self.keyring.identify(path) == self.signer.key_id
@@ -0,0 +1,112 @@
+from warcsigner.warcsigner import RSASigner, sign_cli, verify_cli
+
+from test_warcsigner import TEST_WARC, PRIVATE_KEY, PUBLIC_KEY
+from test_warcsigner import PUBLIC_WRONG_KEY
+
+import os
+import shutil
+import tempfile
+
+from io import BytesIO
+
+
+class TestManifest(object):
+    def setup(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.manifest = os.path.join(self.temp_dir, 'manifest.gz')
+
+        self.files = []
+        for name in ('a.warc.gz', 'b c.warc.gz', 'sub/d.warc.gz'):
+            filename = os.path.join(self.temp_dir, name)
+            if not os.path.isdir(os.path.dirname(filename)):
+                os.makedirs(os.path.dirname(filename))
+
+            with open(filename, 'wb') as fh:
+                fh.write(open(TEST_WARC, 'rb').read() + name)
+
+            self.files.append(filename)
+
+        self.signer = RSASigner(private_key_file=PRIVATE_KEY,
+                                public_key_file=PUBLIC_KEY, threads=2)
+
+    def teardown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_sign_verify_manifest(self):
+        assert self.signer.sign_manifest(self.files, self.manifest,
+                                         'SHA-256') == True
+
+        # files are unchanged
+        assert self.signer.verify(self.files[0]) == False
+
+        manifest = self.signer.load_manifest(self.manifest)
+        assert manifest.names() == ['a.warc.gz', 'b c.warc.gz',
+                                    'sub/d.warc.gz']
+
+        results = self.signer.verify_manifest(self.manifest)
+        assert results == [(filename, True) for filename in self.files]
+
+        # moved along with the manifest
+        moved_dir = self.temp_dir + '-moved'
+        shutil.move(self.temp_dir, moved_dir)
+        try:
+            results = self.signer.verify_manifest(
+                          os.path.join(moved_dir, 'manifest.gz'))
+            assert all(result for filename, result in results)
+        finally:
+            shutil.move(moved_dir, self.temp_dir)
+
+        # modified file
+        with open(self.files[1], 'r+b') as fh:
+            fh.write('X')
+
+        results = self.signer.verify_manifest(manifest,
+                                              [self.files[1], self.files[2],
+                                               TEST_WARC])
+        assert results == [(self.files[1], False), (self.files[2], True),
+                           (TEST_WARC, False)]
+
+        # appended file
+        with open(self.files[2], 'ab') as fh:
+            fh.write('X')
+
+        assert self.signer.verify_manifest(manifest, [self.files[2]]) == [
+            (self.files[2], False)]
+
+        # wrong key
+        wrong = RSASigner(public_key_file=PUBLIC_WRONG_KEY)
+        assert wrong.verify_manifest(self.manifest) is None
+
+        # missing file
+        assert self.signer.sign_manifest(self.files + ['missing'],
+                                         self.manifest) == False
+
+    def test_manifest_stream(self):
+        buff = BytesIO()
+        assert self.signer.sign_manifest(self.files, buff) == True
+
+        results = self.signer.verify_manifest(BytesIO(buff.getvalue()))
+        assert results == [(filename, True) for filename in self.files]
+
+        data = buff.getvalue()
+        assert self.signer.verify_manifest(BytesIO(data[:-1] + 'X')) is None
+
+    def test_cli_manifest(self):
+        assert sign_cli(['-m', self.manifest, PRIVATE_KEY] + self.files) == 0
+        assert verify_cli(['-m', self.manifest, PUBLIC_KEY]) == 0
+        assert verify_cli(['-m', self.manifest, PUBLIC_KEY,
+                           self.files[0]]) == 0
+
+        # key directory
+        key_dir = os.path.join(self.temp_dir, 'keys')
+        os.makedirs(key_dir)
+        shutil.copyfile(PUBLIC_KEY, os.path.join(key_dir, 'a.pem'))
+        assert verify_cli(['-m', self.manifest, key_dir]) == 0
+
+        assert verify_cli(['-m', self.manifest, PUBLIC_WRONG_KEY]) == 1
+        assert verify_cli(['-m', self.manifest + '.x', key_dir]) == 1
+
+        with open(self.files[0], 'ab') as fh:
+            fh.write('X')
+
+        assert verify_cli(['-m', self.manifest, PUBLIC_KEY]) == 1
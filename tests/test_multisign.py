@@ -0,0 +1,132 @@
+from warcsigner.warcsigner import RSASigner, sign_cli, verify_cli
+from warcsigner.multisign import MultiSigner
+from warcsigner.keyring import Keyring
+from warcsigner.stats import Stats
+
+from test_warcsigner import TEST_WARC, PRIVATE_KEY, PUBLIC_KEY
+from test_warcsigner import PUBLIC_WRONG_KEY
+
+from pytest import raises
+
+import os
+import rsa
+import shutil
+import tempfile
+
+from io import BytesIO
+
+
+class TestMultiSign(object):
+    def setup(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_warc = os.path.join(self.temp_dir, 'test.warc.gz')
+        shutil.copyfile(TEST_WARC, self.temp_warc)
+
+        pub_key, priv_key = rsa.newkeys(512)
+
+        self.other_private = os.path.join(self.temp_dir, 'other_private.pem')
+        with open(self.other_private, 'w') as fh:
+            fh.write(priv_key.save_pkcs1())
+
+        self.other_public = os.path.join(self.temp_dir, 'other_public.pem')
+        with open(self.other_public, 'w') as fh:
+            fh.write(pub_key.save_pkcs1())
+
+        self.orig = open(TEST_WARC, 'rb').read()
+
+    def teardown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_sign_verify(self):
+        signer = MultiSigner([PRIVATE_KEY, self.other_private])
+        assert signer.sign(self.temp_warc, 'SHA-256') == True
+
+        stats = Stats()
+        verifier = MultiSigner(public_key_files=[PUBLIC_KEY,
+                                                 self.other_public],
+                               stats=stats)
+
+        assert verifier.verify(self.temp_warc) == True
+
+        # hashed once for both keys
+        assert stats.bytes_read == len(self.orig)
+
+        assert verifier.identify(self.temp_warc) == [s.key_id for s in
+                                                     signer.signers]
+
+        # each key verified alone
+        for public_key in (PUBLIC_KEY, self.other_public):
+            verifier = RSASigner(public_key_file=public_key)
+            assert verifier.verify(self.temp_warc) == True
+
+        verifier = RSASigner(public_key_file=PUBLIC_WRONG_KEY)
+        assert verifier.verify(self.temp_warc) == False
+
+        # all keys required by default
+        verifier = MultiSigner(public_key_files=[PUBLIC_KEY, PUBLIC_WRONG_KEY])
+        assert verifier.verify(self.temp_warc) == False
+
+        verifier.required = 1
+        assert verifier.verify(self.temp_warc) == True
+
+        # keyring finds either key
+        keyring = Keyring([self.other_public])
+        assert keyring.identify(self.temp_warc) == signer.signers[1].key_id
+
+        # remove
+        verifier = MultiSigner(public_key_files=[PUBLIC_KEY,
+                                                 self.other_public])
+        assert verifier.verify(self.temp_warc, remove=True) == True
+        assert open(self.temp_warc, 'rb').read() == self.orig
+        assert verifier.verify(self.temp_warc) == False
+
+    def test_tree_and_tampered(self):
+        signer = MultiSigner([PRIVATE_KEY, self.other_private],
+                             chunk_size=1000)
+
+        buff = BytesIO(self.orig)
+        assert signer.sign(buff, tree=True) == True
+        assert signer.read_signatures(buff)[1].chunk_size == 1000
+
+        verifier = MultiSigner(public_key_files=[PUBLIC_KEY,
+                                                 self.other_public])
+        assert verifier.verify(buff) == True
+
+        buff = BytesIO('X' + buff.getvalue()[1:])
+        assert verifier.verify(buff) == False
+        assert verifier.identify(buff) == []
+
+        assert verifier.verify(BytesIO(self.orig)) == False
+        assert verifier.verify(os.path.join(self.temp_dir, 'x')) == False
+
+        with raises(ValueError):
+            MultiSigner()
+
+        with raises(ValueError):
+            MultiSigner([PRIVATE_KEY], [PUBLIC_KEY])
+
+    def test_cli_multi(self):
+        assert sign_cli([PRIVATE_KEY, '-k', self.other_private,
+                         self.temp_warc]) == 0
+
+        assert verify_cli(['-k', self.other_public, PUBLIC_KEY,
+                           self.temp_warc]) == 0
+        assert verify_cli([PUBLIC_KEY, '-k', self.other_public,
+                           self.temp_warc]) == 0
+
+        assert verify_cli(['-k', PUBLIC_WRONG_KEY, PUBLIC_KEY,
+                           self.temp_warc]) == 1
+
+        assert verify_cli(['-k', PUBLIC_WRONG_KEY, '--require', '1',
+                           PUBLIC_KEY, self.temp_warc]) == 0
+
+        assert verify_cli([PUBLIC_KEY, self.temp_warc]) == 0
+
+        with raises(SystemExit):
+            sign_cli([PRIVATE_KEY, '-k', self.other_private, '--info',
+                      self.temp_warc])
+
+        # --cache is not supported for several keys
+        with raises(SystemExit):
+            verify_cli(['-k', self.other_public, '--cache',
+                        self.temp_warc + '.db', PUBLIC_KEY, self.temp_warc])
@@ -0,0 +1,150 @@
+from warcsigner.warcsigner import RSASigner, verify_cli
+from warcsigner.packed import verify_tar, verify_framed, write_frame
+
+from test_warcsigner import TEST_WARC, PRIVATE_KEY, PUBLIC_KEY
+from test_warcsigner import PUBLIC_WRONG_KEY
+
+from pytest import raises
+
+import os
+import shutil
+import tarfile
+import tempfile
+
+from io import BytesIO
+
+
+#=================================================================
+class NoSeekReader(object):
+    """ A pipe-like stream, which can only be read
+    """
+    def __init__(self, buff):
+        self.fh = BytesIO(buff)
+
+    def read(self, *args):
+        return self.fh.read(*args)
+
+    def readline(self, *args):
+        return self.fh.readline(*args)
+
+
+class TestPacked(object):
+    def setup(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+        self.signer = RSASigner(private_key_file=PRIVATE_KEY,
+                                public_key_file=PUBLIC_KEY,
+                                buff_size=256)
+
+        orig = open(TEST_WARC, 'rb').read()
+
+        signed = BytesIO(orig)
+        assert self.signer.sign(signed, 'SHA-256') == True
+
+        # signed with SHA-1, plain, and unsigned
+        signed_sha1 = BytesIO(orig)
+        assert self.signer.sign(signed_sha1) == True
+
+        self.members = [('a.warc.gz', signed.getvalue(), True),
+                        ('b.warc.gz', orig, False),
+                        ('c/d.warc.gz', signed_sha1.getvalue(), True),
+                        ('e.txt', 'text', False),
+                        ('f.warc.gz', 'X' + signed.getvalue()[1:], False),
+                        ('g.warc.gz', '', False)]
+
+    def teardown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _expected(self):
+        return [(name, result) for name, data, result in self.members]
+
+    def _tar(self, mode='w'):
+        buff = BytesIO()
+        tar = tarfile.open(fileobj=buff, mode=mode)
+
+        info = tarfile.TarInfo('c')
+        info.type = tarfile.DIRTYPE
+        tar.addfile(info)
+
+        for name, data, result in self.members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, BytesIO(data))
+
+        tar.close()
+        return buff.getvalue()
+
+    def _framed(self):
+        buff = BytesIO()
+        for name, data, result in self.members:
+            write_frame(buff, name, len(data))
+            buff.write(data)
+
+        return buff.getvalue()
+
+    def test_verify_tar(self):
+        results = list(verify_tar(self.signer, NoSeekReader(self._tar())))
+        assert results == self._expected()
+
+        # compressed
+        results = list(verify_tar(self.signer,
+                                  NoSeekReader(self._tar('w:gz'))))
+        assert results == self._expected()
+
+        wrong_signer = RSASigner(public_key_file=PUBLIC_WRONG_KEY)
+        results = verify_tar(wrong_signer, NoSeekReader(self._tar()))
+        assert not any(result for name, result in results)
+
+        with raises(tarfile.TarError):
+            list(verify_tar(self.signer, NoSeekReader('not a tar')))
+
+    def test_verify_framed(self):
+        framed = self._framed()
+
+        results = list(verify_framed(self.signer, NoSeekReader(framed)))
+        assert results == self._expected()
+
+        # only candidate hash type
+        results = verify_framed(self.signer, NoSeekReader(framed), 'SHA-1')
+        assert [result for name, result in results] == [False, False, True,
+                                                         False, False, False]
+
+        # truncated
+        results = list(verify_framed(self.signer,
+                                     NoSeekReader(framed[:-30])))
+        assert results == self._expected()[:4] + [('f.warc.gz', False)]
+
+        with raises(ValueError):
+            list(verify_framed(self.signer, NoSeekReader('abc def\n')))
+
+        with raises(ValueError):
+            write_frame(BytesIO(), 'a\nb', 1)
+
+    def test_cli_packed(self, capsys):
+        tar_file = os.path.join(self.temp_dir, 'delivery.tar')
+        with open(tar_file, 'wb') as fh:
+            fh.write(self._tar())
+
+        framed_file = os.path.join(self.temp_dir, 'delivery.framed')
+        with open(framed_file, 'wb') as fh:
+            fh.write(self._framed())
+
+        assert verify_cli(['--tar', PUBLIC_KEY, tar_file]) == 1
+        out = capsys.readouterr()[0]
+        assert 'Verified  ' + tar_file + ':a.warc.gz' in out
+        assert 'NOT VERIFIED  ' + tar_file + ':b.warc.gz' in out
+
+        assert verify_cli(['--framed', '--stats', PUBLIC_KEY,
+                           framed_file]) == 1
+        lines = capsys.readouterr()[0].splitlines()
+        assert len(lines) == len(self.members) + 1
+
+        self.members = self.members[:1]
+        with open(tar_file, 'wb') as fh:
+            fh.write(self._tar())
+
+        assert verify_cli(['--tar', PUBLIC_KEY, tar_file]) == 0
+
+        # not a tar, or missing
+        assert verify_cli(['--tar', PUBLIC_KEY, framed_file]) == 1
+        assert verify_cli(['--tar', PUBLIC_KEY, tar_file + '.x']) == 1
@@ -0,0 +1,147 @@
+from warcsigner.warcsigner import RSASigner
+from warcsigner import ranges
+from warcsigner.ranges import SignedRanges, send_range
+
+from test_warcsigner import TEST_WARC, PRIVATE_KEY, PUBLIC_KEY
+
+import os
+import shutil
+import socket
+import tempfile
+import threading
+
+from io import BytesIO
+
+
+class TestRanges(object):
+    def setup(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.signer = RSASigner(private_key_file=PRIVATE_KEY,
+                                public_key_file=PUBLIC_KEY,
+                                buff_size=100)
+
+        with open(TEST_WARC, 'rb') as fh:
+            self.orig = fh.read()
+
+        self.filename = os.path.join(self.temp_dir, 'signed.warc.gz')
+        shutil.copyfile(TEST_WARC, self.filename)
+        assert self.signer.sign(self.filename) == True
+
+    def teardown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_signed_length(self):
+        assert self.signer.get_signed_length(self.filename) == len(self.orig)
+        assert self.signer.get_signed_length(TEST_WARC) == None
+        assert self.signer.get_signed_length('/not-a-file') == None
+
+    def test_signed_length_checkpoint(self):
+        shutil.copyfile(TEST_WARC, self.filename)
+        signer = RSASigner(private_key_file=PRIVATE_KEY, chunk_size=1000)
+        assert signer.sign(self.filename, checkpoint=True) == True
+
+        assert self.signer.get_signed_length(self.filename) == len(self.orig)
+
+    def test_clamp(self):
+        with SignedRanges(self.signer, self.filename) as signed:
+            assert signed.signed
+            assert signed.length == len(self.orig)
+
+            assert signed.clamp() == (0, len(self.orig))
+            assert signed.clamp(10, 20) == (10, 20)
+            assert signed.clamp(-5, 20) == (0, 20)
+
+            # never past the signed data
+            end = len(self.orig)
+            assert signed.clamp(end - 10, 1000) == (end - 10, 10)
+            assert signed.clamp(len(self.orig) + 10, 5) == (len(self.orig), 0)
+
+    def test_read(self):
+        with SignedRanges(self.signer, self.filename) as signed:
+            assert signed.read() == self.orig
+            assert signed.read(150, 250) == self.orig[150:400]
+            assert signed.read(len(self.orig) - 10, 1000) == self.orig[-10:]
+
+            chunks = list(signed.iter_range(50, 250))
+            assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+            assert ''.join(chunks) == self.orig[50:300]
+
+    def test_unsigned(self):
+        with SignedRanges(self.signer, TEST_WARC) as signed:
+            assert not signed.signed
+            assert signed.read() == self.orig
+
+    def test_send_file(self):
+        out_name = os.path.join(self.temp_dir, 'out')
+
+        with SignedRanges(self.signer, self.filename) as signed:
+            with open(out_name, 'wb') as out:
+                out.write('prefix')
+                assert signed.send(out, 100) == len(self.orig) - 100
+                assert signed.send(out, 0, 10) == 10
+
+        with open(out_name, 'rb') as fh:
+            assert fh.read() == 'prefix' + self.orig[100:] + self.orig[:10]
+
+    def test_send_stream(self):
+        out = BytesIO()
+        with SignedRanges(self.signer, self.filename) as signed:
+            assert signed.send(out, 20, 1000000) == len(self.orig) - 20
+
+        assert out.getvalue() == self.orig[20:]
+
+    def test_send_socket(self):
+        sock, peer = socket.socketpair()
+        received = []
+
+        def recv_all():
+            while True:
+                buff = peer.recv(4096)
+                if not buff:
+                    break
+                received.append(buff)
+
+        thread = threading.Thread(target=recv_all)
+        thread.start()
+
+        with SignedRanges(self.signer, self.filename) as signed:
+            assert signed.send(sock) == len(self.orig)
+
+        sock.close()
+        thread.join()
+        peer.close()
+
+        assert ''.join(received) == self.orig
+
+    def test_send_fallback(self, monkeypatch):
+        monkeypatch.setattr(ranges, 'sendfile', None)
+        monkeypatch.setattr(ranges, 'copy_file_range', None)
+
+        out_name = os.path.join(self.temp_dir, 'out')
+
+        with open(self.filename, 'rb') as in_fh:
+            with open(out_name, 'wb') as out:
+                assert send_range(in_fh, out, 5, 500, 64) == 500
+
+        with open(out_name, 'rb') as fh:
+            assert fh.read() == self.orig[5:505]
+
+    def test_send_not_supported(self, monkeypatch):
+        def not_supported(*args):
+            raise OSError(ranges.errno.EINVAL, 'not supported')
+
+        monkeypatch.setattr(ranges, 'sendfile', not_supported)
+        monkeypatch.setattr(ranges, 'copy_file_range', None)
+
+        out = BytesIO()
+        with open(self.filename, 'rb') as in_fh:
+            # BytesIO has no fileno, always buffered
+            assert send_range(in_fh, out, 0, 100) == 100
+
+        sock, peer = socket.socketpair()
+        with open(self.filename, 'rb') as in_fh:
+            assert send_range(in_fh, sock, 0, 100) == 100
+
+        sock.close()
+        assert peer.recv(1000) == self.orig[:100]
+        peer.close()
@@ -0,0 +1,105 @@
+from warcsigner.warcsigner import RSASigner
+from warcsigner.keyring import Keyring
+from warcsigner.scanner import TailScanner, scan_cli
+from warcsigner.gzipmeta import read_tail
+
+from test_warcsigner import TEST_WARC, PRIVATE_KEY, PUBLIC_KEY
+
+import json
+import os
+import shutil
+import tempfile
+
+
+class TestScanner(object):
+    def setup(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+        signer = RSASigner(private_key_file=PRIVATE_KEY, chunk_size=10)
+        self.key_id = signer.key_id
+
+        self.files = {}
+        for name, kwargs in (('a/plain.warc.gz', {}),
+                             ('a/b/key.warc.gz', {'key_id': True}),
+                             ('a/b/tree.warc.gz', {'tree': True}),
+                             ('checkpoint.warc.gz', {'checkpoint': True}),
+                             ('unsigned.warc.gz', None)):
+            filename = os.path.join(self.temp_dir, name)
+            if not os.path.isdir(os.path.dirname(filename)):
+                os.makedirs(os.path.dirname(filename))
+
+            shutil.copyfile(TEST_WARC, filename)
+            if kwargs is not None:
+                assert signer.sign(filename, **kwargs) == True
+
+            self.files[filename] = kwargs
+
+        with open(os.path.join(self.temp_dir, 'a', 'other.txt'), 'w') as fh:
+            fh.write('text')
+
+    def teardown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _scan(self, scanner, **kwargs):
+        results = scanner.scan([self.temp_dir], **kwargs)
+        return dict((res['file'], res) for res in results)
+
+    def test_scan(self):
+        results = self._scan(TailScanner(threads=4), pattern='*.warc.gz')
+        assert len(results) == 5
+
+        types = dict((os.path.basename(name), res.get('type'))
+                     for name, res in results.iteritems())
+
+        assert types == {'plain.warc.gz': 'RS',
+                         'key.warc.gz': 'RK',
+                         'tree.warc.gz': 'RT',
+                         'checkpoint.warc.gz': 'RC',
+                         'unsigned.warc.gz': None}
+
+        for name, kwargs in self.files.iteritems():
+            res = results[name]
+            assert res['signed'] == (kwargs is not None)
+            assert res['size'] == os.path.getsize(name)
+
+            if kwargs == {'key_id': True}:
+                assert res['key_id'] == self.key_id[:16]
+            elif kwargs is not None:
+                assert res['key_id'] is None
+
+        # all files
+        assert len(self._scan(TailScanner(threads=1))) == 6
+
+    def test_scan_keyring(self):
+        scanner = TailScanner(Keyring([PUBLIC_KEY]))
+        for res in self._scan(scanner, pattern='*.gz').values():
+            if res['signed']:
+                assert res['key_id'] == self.key_id
+
+    def test_scan_small_tail(self):
+        # checkpoint signature, larger than the tail, is read again
+        results = self._scan(TailScanner(tail_size=200))
+        for name, kwargs in self.files.iteritems():
+            assert results[name]['signed'] == (kwargs is not None)
+
+        with open(TEST_WARC, 'rb') as fh:
+            tail = read_tail(fh, 10000).getvalue()
+
+        assert len(tail) == os.path.getsize(TEST_WARC)
+
+    def test_scan_cli(self, capsys):
+        assert scan_cli(['-p', '*.warc.gz', self.temp_dir]) == 1
+
+        lines = capsys.readouterr()[0].splitlines()
+        assert len(lines) == 5
+
+        assert scan_cli(['-u', '-k', PUBLIC_KEY, self.temp_dir,
+                         os.path.join(self.temp_dir, 'missing')]) == 1
+
+        results = map(json.loads, capsys.readouterr()[0].splitlines())
+        assert len(results) == 3
+        assert all(not res['signed'] for res in results)
+        assert any('error' in res for res in results)
+
+        plain = os.path.join(self.temp_dir, 'a', 'plain.warc.gz')
+        assert scan_cli([plain]) == 0
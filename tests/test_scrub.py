@@ -0,0 +1,158 @@
+from warcsigner.warcsigner import RSASigner
+from warcsigner.scrub import Scrubber, RateLimiter, scrub_cli
+
+from test_warcsigner import TEST_WARC, PRIVATE_KEY, PUBLIC_KEY
+
+import json
+import os
+import shutil
+import tempfile
+import time
+
+
+class TestScrub(object):
+    def setup(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.warc_dir = os.path.join(self.temp_dir, 'warcs')
+        os.makedirs(self.warc_dir)
+
+        self.queue = os.path.join(self.temp_dir, 'queue.db')
+        self.log = os.path.join(self.temp_dir, 'scrub.log')
+
+        signer = RSASigner(private_key_file=PRIVATE_KEY)
+
+        self.files = []
+        for name in ('a.warc.gz', 'b.warc.gz', 'c.warc.gz', 'd.warc.gz'):
+            filename = os.path.join(self.warc_dir, name)
+            shutil.copyfile(TEST_WARC, filename)
+            if name != 'd.warc.gz':
+                assert signer.sign(filename) == True
+
+            self.files.append(filename)
+
+    def teardown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _scrubber(self, **kwargs):
+        return Scrubber(self.queue, dict(public_key_file=PUBLIC_KEY),
+                        log=self.log, **kwargs)
+
+    def test_scrub_pass(self):
+        scrubber = self._scrubber(threads=2)
+        assert scrubber.add([self.warc_dir], '*.warc.gz') == 4
+        assert scrubber.add([self.files[0]]) == 0
+
+        assert scrubber.status() == dict(files=4, due=4, failed=0)
+
+        results = dict((res['file'], res['verified'])
+                       for res in scrubber.run())
+
+        assert results == {self.files[0]: True, self.files[1]: True,
+                           self.files[2]: True, self.files[3]: False}
+
+        assert scrubber.status() == dict(files=4, due=4, failed=1)
+
+        # appended log
+        with open(self.log) as fh:
+            lines = [json.loads(line) for line in fh]
+
+        assert len(lines) == 4
+        assert all(line['bytes_read'] > 0 for line in lines
+                   if line['verified'])
+
+    def test_resume_and_priority(self):
+        scrubber = self._scrubber(min_age=3600)
+        scrubber.add([self.warc_dir])
+
+        # interrupted after two files
+        first = [res['file'] for res in scrubber.run(limit=2)]
+        assert first == self.files[:2]
+        scrubber.close()
+
+        # not yet checked first
+        scrubber = self._scrubber(min_age=3600)
+        assert scrubber.due() == self.files[2:]
+        rest = [res['file'] for res in scrubber.run()]
+        assert rest == self.files[2:]
+
+        # none due within min_age
+        assert list(scrubber.run()) == []
+        assert scrubber.status()['due'] == 0
+
+        # oldest first, once min_age has passed
+        scrubber.min_age = 0
+        assert scrubber.due() == self.files
+
+        os.remove(self.files[0])
+        results = list(scrubber.run())
+        assert results[0]['file'] == self.files[0]
+        assert results[0]['missing'] == True
+        assert len(results) == 4
+
+    def test_resume_interrupted_pass(self):
+        scrubber = self._scrubber()
+        scrubber.add([self.warc_dir])
+
+        # interrupted after two files, once per pass with min_age 0
+        results = scrubber.run()
+        first = [next(results)['file'], next(results)['file']]
+        results.close()
+        scrubber.close()
+
+        assert first == self.files[:2]
+
+        time.sleep(0.01)
+
+        scrubber = self._scrubber()
+        assert scrubber.pass_start() is not None
+
+        rest = [res['file'] for res in scrubber.run()]
+        assert rest == self.files[2:]
+        assert scrubber.pass_start() == None
+
+        # stopped at limit, resumed
+        first = [res['file'] for res in scrubber.run(limit=3)]
+        assert first == self.files[:3]
+        assert [res['file'] for res in scrubber.run()] == self.files[3:]
+
+        # next pass checks all files again
+        assert len(list(scrubber.run())) == 4
+
+    def test_rate_limit(self):
+        limiter = RateLimiter(10000)
+
+        start = time.time()
+        limiter.consume(10000)
+        assert time.time() - start < 0.1
+
+        limiter.consume(3000)
+        assert time.time() - start >= 0.25
+
+        scrubber = self._scrubber(rate=5000)
+        scrubber.add([self.warc_dir])
+
+        start = time.time()
+        results = list(scrubber.run())
+        total = sum(res['bytes_read'] for res in results)
+
+        assert total > 5000
+        assert time.time() - start >= (total - 5000) / 5000.0 * 0.9
+
+    def test_cli_scrub(self, capsys):
+        assert scrub_cli([PUBLIC_KEY, self.queue, self.files[0],
+                          '--log', self.log]) == 0
+        assert json.loads(capsys.readouterr()[0])['verified'] == True
+
+        assert scrub_cli([PUBLIC_KEY, self.queue, '--status',
+                          self.warc_dir]) == 0
+        assert json.loads(capsys.readouterr()[0]) == dict(files=4, due=4,
+                                                          failed=0)
+
+        key_dir = os.path.join(self.temp_dir, 'keys')
+        os.makedirs(key_dir)
+        shutil.copyfile(PUBLIC_KEY, os.path.join(key_dir, 'a.pem'))
+
+        assert scrub_cli([key_dir, self.queue,
+                          '-c', '2', '--rate', '100']) == 1
+        lines = capsys.readouterr()[0].splitlines()
+        assert len(lines) == 4
@@ -0,0 +1,99 @@
+from warcsigner.warcsigner import RSASigner, sign_cli, verify_cli
+from warcsigner.stats import Stats
+
+from test_warcsigner import TEST_WARC, PRIVATE_KEY, PUBLIC_KEY
+
+import json
+import os
+import shutil
+import tempfile
+
+from io import BytesIO
+
+
+class TestStats(object):
+    def setup(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_warc = os.path.join(self.temp_dir, 'test.warc.gz')
+        shutil.copyfile(TEST_WARC, self.temp_warc)
+
+        self.size = os.path.getsize(TEST_WARC)
+
+    def teardown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_sign_verify_stats(self):
+        progress = []
+        stats = Stats(progress=progress.append, progress_interval=1000)
+
+        signer = RSASigner(private_key_file=PRIVATE_KEY,
+                           public_key_file=PUBLIC_KEY,
+                           buff_size=500, stats=stats)
+
+        assert signer.sign(self.temp_warc) == True
+        assert stats.bytes_read == self.size
+        assert stats.rsa_time > 0
+        assert stats.hash_time > 0
+        assert len(progress) == 3
+
+        stats.reset()
+        assert signer.verify(self.temp_warc) == True
+        assert stats.bytes_read == self.size
+
+        # stream without seeking, reads are timed
+        stats.reset()
+        with open(self.temp_warc, 'rb') as fh:
+            total_len = os.path.getsize(self.temp_warc)
+            assert signer.verify(fh, size=total_len) == True
+
+        assert stats.bytes_read == self.size
+        assert stats.read_time > 0
+
+        stats.reset()
+        assert signer.verify(BytesIO(open(self.temp_warc).read())) == True
+        assert stats.bytes_read == self.size
+
+    def test_tree_stats(self):
+        progress = []
+        stats = Stats(progress=progress.append, progress_interval=1)
+
+        signer = RSASigner(private_key_file=PRIVATE_KEY,
+                           chunk_size=1000, threads=2, stats=stats)
+
+        assert signer.sign(self.temp_warc, tree=True) == True
+        assert stats.bytes_read == self.size
+        assert progress == [1000, 2000, 3000, self.size]
+
+        stats.reset()
+        buff = BytesIO(open(self.temp_warc).read())
+        assert signer.verify(buff) == True
+        assert stats.bytes_read == self.size
+
+    def test_cli_stats(self, capsys):
+        assert sign_cli(['--stats', PRIVATE_KEY, self.temp_warc]) == 0
+
+        lines = capsys.readouterr()[0].splitlines()
+        assert len(lines) == 2
+
+        file_stats = json.loads(lines[0])
+        assert file_stats['file'] == self.temp_warc
+        assert file_stats['signed'] == True
+        assert file_stats['bytes_read'] == self.size
+        assert file_stats['total_time'] > 0
+
+        other_warc = self.temp_warc + '.other'
+        shutil.copyfile(TEST_WARC, other_warc)
+
+        assert verify_cli(['--stats', '-j', '2', PUBLIC_KEY,
+                           self.temp_warc, other_warc]) == 1
+
+        lines = capsys.readouterr()[0].splitlines()
+        results = dict((res.get('file'), res) for res in map(json.loads, lines))
+
+        assert results[self.temp_warc]['verified'] == True
+        assert results[other_warc]['verified'] == False
+
+        total = results[None]
+        assert total['total'] == True
+        assert total['files'] == 2
+        assert total['bytes_read'] == self.size
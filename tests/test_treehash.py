@@ -0,0 +1,65 @@
+from warcsigner.treehash import HashTree, TreeHasher
+from warcsigner.treehash import hash_tree, hash_tree_file
+from warcsigner.treehash import leaf_hash, node_hash
+
+import tempfile
+
+from io import BytesIO
+
+
+DATA = ''.join(chr(i % 251) for i in xrange(10000))
+
+
+def mth(leaves):
+    """ RFC 6962 Merkle Tree Hash, computed recursively
+    """
+    if len(leaves) == 1:
+        return leaves[0]
+
+    split = 1
+    while split * 2 < len(leaves):
+        split *= 2
+
+    return node_hash('SHA-1', mth(leaves[:split]), mth(leaves[split:]))
+
+
+class TestTreeHash(object):
+    def test_tree_matches_mth(self):
+        leaves = [leaf_hash('SHA-1', str(i)) for i in xrange(20)]
+
+        tree = HashTree('SHA-1')
+        for i, leaf in enumerate(leaves):
+            # root with a last leaf, without adding it
+            assert tree.root(leaf) == mth(leaves[:i + 1])
+
+            tree.add(leaf)
+            assert tree.root() == mth(leaves[:i + 1])
+            assert len(tree.peaks) == bin(i + 1).count('1')
+
+    def test_hasher_file_stream_match(self):
+        for chunk_size in (1, 100, 1024, 9999, 10000, 20000):
+            expected = hash_tree('SHA-256', DATA, chunk_size)
+
+            hasher = TreeHasher('SHA-256', chunk_size)
+            for i in xrange(0, len(DATA), 333):
+                hasher.update(memoryview(DATA[i:i + 333]))
+
+            assert hasher.digest() == expected
+
+            buff = BytesIO(DATA)
+            assert hash_tree_file(buff, 'SHA-256', None, chunk_size) == expected
+
+            with tempfile.TemporaryFile() as temp:
+                temp.write(DATA)
+                for threads in (1, 4):
+                    assert hash_tree_file(temp, 'SHA-256', None,
+                                          chunk_size, threads) == expected
+                    assert temp.tell() == len(DATA)
+
+                assert (hash_tree_file(temp, 'SHA-256', 5000, chunk_size, 3) ==
+                        hash_tree('SHA-256', DATA[:5000], chunk_size))
+
+    def test_empty(self):
+        with tempfile.TemporaryFile() as temp:
+            assert (hash_tree_file(temp, 'SHA-1', None, 10) ==
+                    TreeHasher('SHA-1', 10).digest())
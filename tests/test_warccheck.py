@@ -0,0 +1,229 @@
+from warcsigner.warcsigner import RSASigner, verify_cli
+from warcsigner.warccheck import WarcChecker
+from warcsigner.gzipmeta import MAGIC_HEADER
+from warcsigner.keyring import Keyring
+from warcsigner.multisign import MultiSigner
+
+from test_warcsigner import TEST_WARC, TEST_WARC_RECORDS
+from test_warcsigner import PRIVATE_KEY, PUBLIC_KEY
+
+import gzip
+import os
+import shutil
+import struct
+import tempfile
+
+from io import BytesIO
+
+
+#=================================================================
+def record(content):
+    return ('WARC/1.0\r\nWARC-Type: resource\r\n' +
+            'Content-Length: %d\r\n\r\n%s\r\n\r\n' % (len(content), content))
+
+
+def member(data, level=6):
+    buff = BytesIO()
+    gz = gzip.GzipFile(fileobj=buff, mode='wb', compresslevel=level)
+    gz.write(data)
+    gz.close()
+    return buff.getvalue()
+
+
+def check(data, buff_size=100, **kwargs):
+    checker = WarcChecker(threads=2, **kwargs)
+    for start in xrange(0, len(data), buff_size):
+        checker.update(memoryview(data)[start:start + buff_size])
+
+    return checker.close(), checker
+
+
+def set_crc(data, offset, length, crc):
+    end = offset + length
+    return data[:end - 8] + struct.pack('<I', crc) + data[end - 4:]
+
+
+#=================================================================
+class TestWarcChecker(object):
+    def setup(self):
+        self.data = open(TEST_WARC, 'rb').read()
+
+    def test_valid(self):
+        for buff_size, batch_size in ((100, 500), (4096, 10),
+                                      (1000000, 1000000)):
+            res, checker = check(self.data, buff_size,
+                                 batch_size=batch_size)
+            assert res == True
+            assert checker.error == None
+            assert checker.members == len(TEST_WARC_RECORDS)
+            assert checker.records == len(TEST_WARC_RECORDS)
+
+        # several records per member, and none
+        data = member(record('abc') + record('')) + member('')
+        assert check(data, 3, batch_size=1)[1].records == 2
+
+        assert check('')[0] == True
+
+    def test_large_members(self):
+        # stored, with magic bytes in the compressed data
+        content = (MAGIC_HEADER + 'X' * 997) * 100
+        data = (member(record(content), 0) + self.data +
+                member(record(content), 0))
+
+        for batch_size, max_batch_size in ((1000, 1000), (500, 3000)):
+            res, checker = check(data, 4096, batch_size=batch_size,
+                                 max_batch_size=max_batch_size)
+            assert res == True
+            assert checker.members == len(TEST_WARC_RECORDS) + 2
+
+    def test_invalid(self):
+        offset, length = TEST_WARC_RECORDS[2]
+
+        # bad crc
+        data = set_crc(self.data, offset, length, 0)
+        res, checker = check(data, batch_size=500)
+        assert res == False
+        assert checker.error == offset
+        assert 'incorrect data check' in checker.reason
+
+        # only first invalid member reported
+        data = set_crc(data, *TEST_WARC_RECORDS[4], crc=0)
+        assert check(data, batch_size=500)[1].error == offset
+
+        # bad length
+        end = offset + length
+        data = self.data[:end - 1] + 'X' + self.data[end:]
+        res, checker = check(data, batch_size=500)
+        assert checker.error == offset
+        assert 'incorrect length check' in checker.reason
+
+        # truncated
+        res, checker = check(self.data[:-10], batch_size=500)
+        assert res == False
+        assert checker.error == TEST_WARC_RECORDS[-1][0]
+        assert checker.reason == 'Incomplete gzip member'
+
+        # not gzip
+        assert check('not gzip')[1].error == 0
+        assert check(self.data + 'X')[1].error == len(self.data)
+
+        # not a warc record
+        data = self.data + member('HTTP/1.0 200 OK\r\n\r\n')
+        res, checker = check(data, batch_size=500)
+        assert checker.error == len(self.data)
+        assert checker.reason == "Invalid WARC record: 'HTTP/'"
+
+        # incomplete record
+        data = self.data + member(record('abc')[:-2])
+        assert check(data)[1].reason == 'Incomplete WARC record'
+
+        # no update after close
+        checker.update(self.data)
+        assert checker.close() == False
+
+
+#=================================================================
+class TestDeepVerify(object):
+    def setup(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_warc = os.path.join(self.temp_dir, 'test.warc.gz')
+
+        self.signer = RSASigner(private_key_file=PRIVATE_KEY,
+                                public_key_file=PUBLIC_KEY,
+                                chunk_size=1000)
+
+        data = open(TEST_WARC, 'rb').read()
+        offset, length = TEST_WARC_RECORDS[3]
+        self.offset = offset
+        self.corrupt = set_crc(data, offset, length, 0)
+
+    def teardown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write(self, data, **kwargs):
+        with open(self.temp_warc, 'wb') as fh:
+            fh.write(data)
+
+        assert self.signer.sign(self.temp_warc, **kwargs) == True
+
+    def test_verify_deep(self):
+        for kwargs in ({}, {'tree': True}, {'info': True}):
+            shutil.copyfile(TEST_WARC, self.temp_warc)
+            assert self.signer.sign(self.temp_warc, **kwargs) == True
+
+            checker = WarcChecker()
+            assert self.signer.verify(self.temp_warc, checker=checker)
+            assert checker.closed == True
+            assert checker.members == len(TEST_WARC_RECORDS)
+
+            # signed, but not valid
+            self._write(self.corrupt, **kwargs)
+            assert self.signer.verify(self.temp_warc) == True
+
+            checker = WarcChecker()
+            assert self.signer.verify(self.temp_warc, quick=True,
+                                      checker=checker) == False
+            assert checker.error == self.offset
+
+            # signature not removed
+            size = os.path.getsize(self.temp_warc)
+            assert self.signer.verify(self.temp_warc, remove=True,
+                                      checker=WarcChecker()) == False
+            assert os.path.getsize(self.temp_warc) == size
+
+        # stream of known size
+        assert self.signer.sign(self.temp_warc) == True
+        with open(self.temp_warc, 'rb') as fh:
+            checker = WarcChecker()
+            assert self.signer.verify(fh, size=size,
+                                      checker=checker) == False
+            assert checker.error == self.offset
+
+        # unsigned
+        checker = WarcChecker()
+        assert self.signer.verify(TEST_WARC, checker=checker) == False
+        assert checker.closed == True
+
+    def test_keyring_multi(self):
+        self._write(self.corrupt)
+
+        keyring = Keyring([PUBLIC_KEY])
+        assert keyring.verify(self.temp_warc) == True
+        assert keyring.verify(self.temp_warc, checker=WarcChecker()) == False
+
+        signer = MultiSigner([PRIVATE_KEY])
+        verifier = MultiSigner(public_key_files=[PUBLIC_KEY])
+
+        shutil.copyfile(TEST_WARC, self.temp_warc)
+        assert signer.sign(self.temp_warc) == True
+        assert verifier.verify(self.temp_warc, checker=WarcChecker()) == True
+
+        with open(self.temp_warc, 'wb') as fh:
+            fh.write(self.corrupt)
+
+        assert signer.sign(self.temp_warc) == True
+        assert verifier.verify(self.temp_warc) == True
+
+        checker = WarcChecker()
+        assert verifier.verify(self.temp_warc, checker=checker) == False
+        assert checker.error == self.offset
+
+    def test_cli_deep(self, capsys):
+        shutil.copyfile(TEST_WARC, self.temp_warc)
+        assert self.signer.sign(self.temp_warc) == True
+        assert verify_cli(['--deep', PUBLIC_KEY, self.temp_warc]) == 0
+
+        self._write(self.corrupt)
+        capsys.readouterr()
+
+        assert verify_cli(['--deep', '-t', '2', PUBLIC_KEY,
+                           self.temp_warc]) == 1
+
+        out = capsys.readouterr()[0]
+        assert out.startswith('NOT VERIFIED  ' + self.temp_warc +
+                              ' (invalid member at %d: ' % self.offset)
+
+        assert verify_cli(['--deep', '--stats', PUBLIC_KEY,
+                           self.temp_warc]) == 1
+
+        assert '"invalid_member": %d' % self.offset in capsys.readouterr()[0]
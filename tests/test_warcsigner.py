@@ -1,8 +1,18 @@
 from warcsigner.warcsigner import RSASigner, sign_cli, verify_cli
+from warcsigner.warcsigner import SignedInfoMetadata, RSATreeMetadata
+from warcsigner.gzipmeta import write_metadata
+from warcsigner.stats import Stats
+from warcsigner.members import MemberScanner
+from warcsigner.hashing import SIGN_HASH_TYPES
 from pytest import raises
 
+import rsa
+
+import hashlib
+import io
 import shutil
 import os
+import struct
 import tempfile
 
 from io import BytesIO
@@ -12,6 +22,7 @@ def abs_path(filename):
 
 TEST_WARC = abs_path('test_warc.warc.gz')
 TEMP_SIGNED_WARC = abs_path('test_warc.warc.gz.signed')
+TEMP_INDEX = TEMP_SIGNED_WARC + '.sigidx'
 EMPTY_FILE = abs_path('empty.warc.gz')
 
 
@@ -19,6 +30,10 @@ PRIVATE_KEY = abs_path('test_private_key.pem')
 PUBLIC_KEY = abs_path('test_public_key.pem')
 PUBLIC_WRONG_KEY = abs_path('test_wrong_key.pem')
 
+# (offset, length) of each gzip member in TEST_WARC
+TEST_WARC_RECORDS = [(0, 333), (333, 1043), (1376, 488),
+                     (1864, 553), (2417, 490), (2907, 577)]
+
 
 class TestWarcSigner(object):
     def setup(self):
@@ -68,6 +83,460 @@ class TestWarcSigner(object):
 
         # not signed
         assert verify_cli([PUBLIC_KEY, TEST_WARC]) == 1
+
+        # options between the key and the files
+        assert verify_cli([PUBLIC_KEY, '--deep', TEMP_SIGNED_WARC]) == 0
+        assert verify_cli([PUBLIC_KEY, '-j', '2', TEMP_SIGNED_WARC,
+                           '--quick', TEST_WARC]) == 1
+
+        with raises(SystemExit):
+            verify_cli([PUBLIC_KEY, '-r', TEMP_SIGNED_WARC, '--other'])
+
+        assert verify_cli([PUBLIC_KEY, '-r', TEMP_SIGNED_WARC]) == 0
+        assert verify_cli([PUBLIC_KEY, TEMP_SIGNED_WARC]) == 1
+        os.remove(TEMP_SIGNED_WARC)
+
+    def test_cli_sign_hash(self):
+        shutil.copyfile(TEST_WARC, TEMP_SIGNED_WARC)
+        assert sign_cli(['--hash', 'SHA-256', PRIVATE_KEY, TEMP_SIGNED_WARC]) == 0
+        assert verify_cli([PUBLIC_KEY, TEMP_SIGNED_WARC]) == 0
+
+        with open(TEMP_SIGNED_WARC) as fh:
+            size = os.path.getsize(TEMP_SIGNED_WARC)
+            assert self.signer.verify(fh, size=size) == True
+
+        os.remove(TEMP_SIGNED_WARC)
+
+    def test_cli_jobs(self):
+        temp_dir = tempfile.mkdtemp()
+        inputs = [os.path.join(temp_dir, 'test-%d.warc.gz' % i)
+                  for i in xrange(4)]
+
+        for input_ in inputs:
+            shutil.copyfile(TEST_WARC, input_)
+
+        assert sign_cli(['-j', '2', PRIVATE_KEY] + inputs) == 0
+        assert verify_cli(['--jobs', '2', PUBLIC_KEY] + inputs) == 0
+
+        # still signed, signature not removed without -r
+        assert all(self.signer.verify(input_) for input_ in inputs)
+
+        # wrong key
+        assert verify_cli(['-j', '3', PUBLIC_WRONG_KEY] + inputs) == 1
+
+        # one unsigned file fails whole run
+        assert verify_cli(['-j', '2', PUBLIC_KEY, TEST_WARC] + inputs) == 1
+
+        # verify and remove, in parallel
+        assert verify_cli(['-r', '-j', '2', PUBLIC_KEY] + inputs) == 0
+        assert verify_cli(['-j', '2', PUBLIC_KEY] + inputs) == 1
+
+        shutil.rmtree(temp_dir)
+
+    def test_member_scanner(self):
+        scanner = MemberScanner(max_out=100)
+        with open(TEST_WARC, 'rb') as fh:
+            buff = fh.read()
+
+        # feed in odd sized chunks
+        for i in xrange(0, len(buff), 77):
+            scanner.update(buff[i:i + 77])
+
+        assert scanner.close() == True
+        assert [m[:2] for m in scanner.members] == TEST_WARC_RECORDS
+
+        # truncated
+        scanner = MemberScanner()
+        scanner.update(buff[:-5])
+        assert scanner.close() == False
+        assert scanner.error == 2907
+
+        # not gzip
+        scanner = MemberScanner()
+        scanner.update(buff[:333] + 'ABCDEFGHIJ')
+        assert scanner.close() == False
+        assert scanner.error == 333
+
+    def test_sign_verify_record(self):
+        shutil.copyfile(TEST_WARC, TEMP_SIGNED_WARC)
+
+        assert self.signer.sign(TEMP_SIGNED_WARC, index=True) == True
+        assert self.signer.verify(TEMP_SIGNED_WARC) == True
+
+        for offset, length in TEST_WARC_RECORDS:
+            assert self.signer.verify_record(TEMP_SIGNED_WARC,
+                                             offset, length) == True
+
+        # not a record
+        assert self.signer.verify_record(TEMP_SIGNED_WARC, 0, 334) == False
+        assert self.signer.verify_record(TEMP_SIGNED_WARC, 1, 333) == False
+
+        # index not signed by wrong key
+        assert self.wrong_signer.verify_record(TEMP_SIGNED_WARC,
+                                               0, 333) == False
+
+        # load index once, verify modified record
+        index = self.signer.load_record_index(TEMP_INDEX)
+        with open(TEMP_SIGNED_WARC, 'r+b') as fh:
+            fh.seek(1400)
+            fh.write('X')
+
+            assert self.signer.verify_record(fh, 1376, 488, index) == False
+            assert self.signer.verify_record(fh, 1864, 553, index) == True
+
+        # stream requires an explicit index
+        with open(TEMP_SIGNED_WARC, 'rb') as fh:
+            assert self.signer.verify_record(fh, 0, 333) == False
+            assert self.signer.verify_record(fh, 0, 333, TEMP_INDEX) == True
+
+        # modified index
+        with open(TEMP_INDEX, 'r+b') as fh:
+            fh.seek(20)
+            fh.write('X')
+
+        assert self.signer.load_record_index(TEMP_INDEX) == None
+        assert self.signer.verify_record(TEMP_SIGNED_WARC, 0, 333) == False
+
+        os.remove(TEMP_INDEX)
+        assert self.signer.verify_record(TEMP_SIGNED_WARC, 0, 333) == False
+
+        # not gzip, not signed with index
+        with tempfile.TemporaryFile() as temp:
+            temp.write('ABCDEF')
+            assert self.signer.sign(temp, index=BytesIO()) == False
+            assert self.signer.verify(temp) == False
+
+            # no index filename for a stream, nothing written
+            with raises(ValueError):
+                self.signer.sign(temp, index=True)
+
+            temp.seek(0, 2)
+            assert temp.tell() == 6
+
+        os.remove(TEMP_SIGNED_WARC)
+
+    def test_verify_record_other_file(self):
+        shutil.copyfile(TEST_WARC, TEMP_SIGNED_WARC)
+        assert self.signer.sign(TEMP_SIGNED_WARC, index=True) == True
+
+        index = self.signer.load_record_index(TEMP_INDEX)
+        assert index.total_len == os.path.getsize(TEST_WARC)
+
+        data = open(TEST_WARC, 'rb').read()
+
+        # same records, in a different signed file
+        for other in (data[:2907] + 'X' + data[2908:], data[:2907]):
+            with tempfile.TemporaryFile() as temp:
+                temp.write(other)
+                assert self.signer.sign(temp) == True
+                assert self.signer.verify_record(temp, 0, 333,
+                                                 index) == False
+
+        # same file, signed differently: the first index is only of the
+        # signatures of the same digest, not of a tree root
+        for kwargs, same_digest in (({'tree': True}, False),
+                                    ({'info': True}, True),
+                                    ({'key_id': True}, True)):
+            shutil.copyfile(TEST_WARC, TEMP_SIGNED_WARC)
+            assert self.signer.sign(TEMP_SIGNED_WARC, index=True,
+                                    **kwargs) == True
+            assert self.signer.verify_record(TEMP_SIGNED_WARC,
+                                             333, 1043) == True
+
+            assert self.signer.verify_record(TEMP_SIGNED_WARC, 333, 1043,
+                                             index) == same_digest
+
+        os.remove(TEMP_INDEX)
+        os.remove(TEMP_SIGNED_WARC)
+
+    def test_cli_sign_index(self):
+        shutil.copyfile(TEST_WARC, TEMP_SIGNED_WARC)
+        assert sign_cli(['--index', PRIVATE_KEY, TEMP_SIGNED_WARC]) == 0
+        assert self.signer.verify_record(TEMP_SIGNED_WARC, 2907, 577) == True
+        os.remove(TEMP_INDEX)
+        os.remove(TEMP_SIGNED_WARC)
+
+    def test_sign_verify_tree(self):
+        signer = RSASigner(private_key_file=PRIVATE_KEY,
+                           chunk_size=1000, threads=2)
+
+        shutil.copyfile(TEST_WARC, TEMP_SIGNED_WARC)
+        orig_size = os.path.getsize(TEMP_SIGNED_WARC)
+
+        assert signer.sign(TEMP_SIGNED_WARC, tree=True) == True
+
+        # chunk size read from signature, not from verifying signer
+        assert self.signer.verify(TEMP_SIGNED_WARC) == True
+        assert self.wrong_signer.verify(TEMP_SIGNED_WARC) == False
+
+        # signature appended, not changed by verifying
+        signed_size = os.path.getsize(TEMP_SIGNED_WARC)
+        assert signed_size > orig_size
+        assert self.signer.verify(TEMP_SIGNED_WARC) == True
+        assert os.path.getsize(TEMP_SIGNED_WARC) == signed_size
+
+        # tree and index, in one pass
+        with tempfile.TemporaryFile() as temp:
+            temp.write(open(TEST_WARC, 'rb').read())
+            index = BytesIO()
+            assert signer.sign(temp, 'SHA-256', index=index, tree=True)
+            assert self.signer.verify(temp) == True
+
+            index.seek(0)
+            assert self.signer.verify_record(temp, 333, 1043, index) == True
+
+        # modified
+        with open(TEMP_SIGNED_WARC, 'r+b') as fh:
+            fh.seek(2500)
+            fh.write('X')
+
+        assert self.signer.verify(TEMP_SIGNED_WARC) == False
+
+        os.remove(TEMP_SIGNED_WARC)
+
+        # tree signature over stream, remove
+        with tempfile.TemporaryFile() as temp:
+            temp.write('ABCDEF' * 1000)
+            assert signer.sign(temp, tree=True) == True
+            assert self.signer.verify(temp, remove=True) == True
+            assert self.signer.verify(temp) == False
+
+            temp.seek(0, 2)
+            assert temp.tell() == 6000
+
+    def test_cli_sign_tree(self):
+        shutil.copyfile(TEST_WARC, TEMP_SIGNED_WARC)
+        assert sign_cli(['--tree', '--chunk-size', '512', '-t', '3',
+                         PRIVATE_KEY, TEMP_SIGNED_WARC]) == 0
+        assert verify_cli(['-t', '2', PUBLIC_KEY, TEMP_SIGNED_WARC]) == 0
+        assert verify_cli([PUBLIC_WRONG_KEY, TEMP_SIGNED_WARC]) == 1
+        os.remove(TEMP_SIGNED_WARC)
+
+    def test_invalid_chunk_size(self):
+        for chunk_size in (0, -5):
+            with raises(ValueError):
+                RSASigner(private_key_file=PRIVATE_KEY, chunk_size=chunk_size)
+
+        shutil.copyfile(TEST_WARC, TEMP_SIGNED_WARC)
+
+        for chunk_size in ('0', '-5', 'x'):
+            for args in ([], ['--io', 'sequential']):
+                with raises(SystemExit):
+                    sign_cli(['--tree', '--chunk-size', chunk_size] + args +
+                             [PRIVATE_KEY, TEMP_SIGNED_WARC])
+
+        # metadata which can not be written leaves no partial trailer
+        with open(TEMP_SIGNED_WARC, 'a+b') as fh:
+            with raises(struct.error):
+                write_metadata(fh, RSATreeMetadata('X' * 128, chunk_size=-5))
+
+        assert open(TEMP_SIGNED_WARC, 'rb').read() == open(TEST_WARC,
+                                                           'rb').read()
+        os.remove(TEMP_SIGNED_WARC)
+
+    def test_checkpoint_append(self):
+        signer = RSASigner(private_key_file=PRIVATE_KEY, chunk_size=1000)
+        data = open(TEST_WARC, 'rb').read()
+
+        shutil.copyfile(TEST_WARC, TEMP_SIGNED_WARC)
+        assert signer.sign(TEMP_SIGNED_WARC, 'SHA-256', checkpoint=True)
+        assert self.signer.verify(TEMP_SIGNED_WARC) == True
+
+        # append string, stream and nothing
+        for append in ('ABC', BytesIO(data), '', 'X' * 2000):
+            assert signer.append(TEMP_SIGNED_WARC, append) == True
+            assert self.signer.verify(TEMP_SIGNED_WARC) == True
+
+        data = data + 'ABC' + data + 'X' * 2000
+
+        # same result as signing all at once
+        with tempfile.TemporaryFile() as temp:
+            temp.write(data)
+            signer.sign(temp, 'SHA-256', checkpoint=True)
+            temp.seek(0)
+            assert temp.read() == open(TEMP_SIGNED_WARC, 'rb').read()
+
+        # remove checkpoint signature
+        assert self.signer.unsign(TEMP_SIGNED_WARC).tree.count == 8
+        assert open(TEMP_SIGNED_WARC, 'rb').read() == data
+        assert self.signer.unsign(TEMP_SIGNED_WARC) == None
+
+        # not a checkpoint signature
+        assert signer.sign(TEMP_SIGNED_WARC) == True
+        assert signer.append(TEMP_SIGNED_WARC, 'ABC') == False
+        assert self.signer.verify(TEMP_SIGNED_WARC, remove=True) == True
+
+        # last, incomplete chunk modified, can't append
+        assert signer.sign(TEMP_SIGNED_WARC, checkpoint=True) == True
+        with open(TEMP_SIGNED_WARC, 'r+b') as fh:
+            fh.seek(len(data) - 10)
+            fh.write('Y')
+
+        size = os.path.getsize(TEMP_SIGNED_WARC)
+        assert signer.append(TEMP_SIGNED_WARC, 'ABC') == False
+        assert os.path.getsize(TEMP_SIGNED_WARC) == size
+
+        # complete chunk modified, append succeeds but does not verify
+        with open(TEMP_SIGNED_WARC, 'r+b') as fh:
+            fh.seek(len(data) - 10)
+            fh.write('X')
+            fh.seek(10)
+            fh.write('Y')
+
+        assert signer.append(TEMP_SIGNED_WARC, 'ABC') == True
+        assert self.signer.verify(TEMP_SIGNED_WARC) == False
+
+        os.remove(TEMP_SIGNED_WARC)
+
+        # wrong key
+        with tempfile.TemporaryFile() as temp:
+            temp.write('ABCDEF')
+            assert signer.sign(temp, checkpoint=True) == True
+            assert self.wrong_signer.verify(temp) == False
+            assert self.wrong_signer.unsign_stream(temp) == None
+
+    def test_cli_sign_checkpoint(self):
+        shutil.copyfile(TEST_WARC, TEMP_SIGNED_WARC)
+        assert sign_cli(['--checkpoint', '--chunk-size', '1024',
+                         PRIVATE_KEY, TEMP_SIGNED_WARC]) == 0
+        assert verify_cli([PUBLIC_KEY, TEMP_SIGNED_WARC]) == 0
+        assert self.signer.append(TEMP_SIGNED_WARC, 'ABC') == True
+        assert verify_cli([PUBLIC_KEY, TEMP_SIGNED_WARC]) == 0
+        os.remove(TEMP_SIGNED_WARC)
+
+    def test_sign_verify_info(self):
+        orig = open(TEST_WARC, 'rb').read()
+        stats = Stats()
+        signer = RSASigner(private_key_file=PRIVATE_KEY,
+                           public_key_file=PUBLIC_KEY,
+                           quick_size=100, stats=stats)
+
+        buff = BytesIO(orig)
+        assert signer.sign(buff, 'SHA-256', info=True) == True
+
+        sig_header, rsa_meta = signer.read_signature(buff)
+        assert isinstance(rsa_meta, SignedInfoMetadata)
+        assert rsa_meta.hash_type == 'SHA-256'
+        assert rsa_meta.length == len(orig)
+        assert rsa_meta.quick_size == 100
+        assert rsa_meta.key_id == signer.key_id[:16]
+        assert rsa_meta.timestamp > 0
+
+        assert signer.verify(buff) == True
+        assert self.wrong_signer.verify(buff) == False
+
+        # quick check only reads the head and tail
+        stats.reset()
+        assert signer.verify(buff, quick=True) == True
+        assert stats.bytes_read == 200
+
+        signed = buff.getvalue()
+
+        # modified between head and tail, only found when hashing all
+        buff = BytesIO(signed[:1000] + 'X' + signed[1001:])
+        assert signer.verify(buff, quick=True) == True
+        assert signer.verify(buff) == False
+
+        # modified head
+        buff = BytesIO('X' + signed[1:])
+        assert signer.verify(buff, quick=True) == False
+        assert signer.verify(buff) == False
+
+        # wrong length, rejected without reading the data
+        for data in (signed[1:], 'X' + signed):
+            stats.reset()
+            assert signer.verify(BytesIO(data)) == False
+            assert stats.bytes_read == 0
+
+        # modified signed fields
+        timestamp = struct.pack('<Q', rsa_meta.timestamp)
+        buff = BytesIO(signed.replace(timestamp, struct.pack('<Q', 1)))
+        assert signer.verify(buff, quick=True) == False
+
+        # remove always verifies all data
+        buff = BytesIO(signed)
+        assert signer.verify(buff, remove=True, quick=True) == True
+        assert buff.getvalue() == orig
+
+    def test_sign_verify_info_tree(self):
+        signer = RSASigner(private_key_file=PRIVATE_KEY,
+                           public_key_file=PUBLIC_KEY, chunk_size=1000)
+
+        buff = BytesIO(open(TEST_WARC, 'rb').read())
+        assert signer.sign(buff, tree=True, info=True) == True
+        assert signer.read_signature(buff)[1].chunk_size == 1000
+        assert signer.verify(buff) == True
+
+        # checkpoint is not supported
+        with raises(ValueError):
+            signer.sign(buff, checkpoint=True, info=True)
+
+        # with info, empty data
+        buff = BytesIO()
+        assert signer.sign(buff, info=True) == True
+        assert signer.verify(buff, quick=True) == True
+        assert signer.verify(buff) == True
+
+    def test_cli_sign_info(self):
+        shutil.copyfile(TEST_WARC, TEMP_SIGNED_WARC)
+        assert sign_cli(['--info', PRIVATE_KEY, TEMP_SIGNED_WARC]) == 0
+        assert verify_cli(['--quick', PUBLIC_KEY, TEMP_SIGNED_WARC]) == 0
+        assert verify_cli([PUBLIC_KEY, TEMP_SIGNED_WARC]) == 0
+        assert verify_cli(['-q', PUBLIC_WRONG_KEY, TEMP_SIGNED_WARC]) == 1
+        os.remove(TEMP_SIGNED_WARC)
+
+    def test_sequential_io(self):
+        orig = open(TEST_WARC, 'rb').read()
+        stats = Stats()
+        signer = RSASigner(private_key_file=PRIVATE_KEY,
+                           public_key_file=PUBLIC_KEY,
+                           chunk_size=1000, quick_size=100, stats=stats,
+                           io_mode='sequential')
+
+        mmap_signer = RSASigner(private_key_file=PRIVATE_KEY,
+                                chunk_size=1000)
+
+        for kwargs in (dict(), dict(tree=True), dict(checkpoint=True),
+                       dict(key_id=True), dict(info=True, tree=True)):
+            # same signature as with mmap
+            shutil.copyfile(TEST_WARC, TEMP_SIGNED_WARC)
+            assert signer.sign(TEMP_SIGNED_WARC, 'SHA-256', **kwargs)
+            signed = open(TEMP_SIGNED_WARC, 'rb').read()
+
+            with tempfile.TemporaryFile() as temp:
+                temp.write(orig)
+                assert mmap_signer.sign(temp, 'SHA-256', **kwargs)
+                temp.seek(0)
+                if not kwargs.get('info'):
+                    assert temp.read() == signed
+
+            # and the head and tail, with info
+            stats.reset()
+            assert signer.verify(TEMP_SIGNED_WARC) == True
+            assert stats.bytes_read == len(orig) + (200 if 'info' in kwargs
+                                                    else 0)
+
+            assert self.wrong_signer.verify(TEMP_SIGNED_WARC) == False
+
+            assert signer.verify(TEMP_SIGNED_WARC, remove=True) == True
+            assert open(TEMP_SIGNED_WARC, 'rb').read() == orig
+
+        # append to checkpoint, from the last complete chunk
+        assert signer.sign(TEMP_SIGNED_WARC, checkpoint=True) == True
+        assert signer.append(TEMP_SIGNED_WARC, 'X' * 2000) == True
+        assert self.signer.verify(TEMP_SIGNED_WARC) == True
+
+        os.remove(TEMP_SIGNED_WARC)
+
+        with raises(ValueError):
+            RSASigner(public_key_file=PUBLIC_KEY, io_mode='direct')
+
+    def test_cli_sequential_io(self):
+        shutil.copyfile(TEST_WARC, TEMP_SIGNED_WARC)
+        assert sign_cli(['--io', 'sequential', '--tree', PRIVATE_KEY,
+                         TEMP_SIGNED_WARC]) == 0
+        assert verify_cli(['--io', 'sequential', PUBLIC_KEY,
+                           TEMP_SIGNED_WARC]) == 0
         os.remove(TEMP_SIGNED_WARC)
 
     def test_empty_sign(self):
@@ -97,6 +566,62 @@ class TestWarcSigner(object):
             assert self.signer.sign(temp) == True
             assert self.signer.verify(temp) == True
 
+    def test_sign_small_buff_rsa_compat(self):
+        signer = RSASigner(private_key_file=PRIVATE_KEY,
+                           public_key_file=PUBLIC_KEY,
+                           buff_size=100)
+
+        with tempfile.TemporaryFile() as temp:
+            temp.write('ABCDEF' * 1000)
+            assert signer.sign(temp, hash_type='SHA-256') == True
+            assert self.signer.verify(temp) == True
+
+            # signature is a standard rsa signature
+            temp.seek(0, 2)
+            total_len = temp.tell()
+            sig_header, rsa_meta = signer.get_rsa_metadata()
+            temp.seek(-sig_header, 2)
+            temp.seek(sig_header - rsa_meta.size() - 10, 1)
+            signature = temp.read(rsa_meta.size())
+
+            pub_key = rsa.PublicKey.load_pkcs1(open(PUBLIC_KEY).read())
+            assert rsa.verify('ABCDEF' * 1000, signature, pub_key) == True
+
+            temp.seek(0)
+            assert signer.verify(temp, size=total_len,
+                                 hash_type='SHA-256') == True
+
+    def test_rsa_malformed_padding(self):
+        priv_key = rsa.PrivateKey.load_pkcs1(open(PRIVATE_KEY).read())
+        blocksize = rsa.common.byte_size(priv_key.n)
+        digest = hashlib.sha256('ABCDEF').digest()
+        cleartext = rsa.pkcs1.HASH_ASN1['SHA-256'] + digest
+
+        def raw_sign(block):
+            payload = rsa.transform.bytes2int(block)
+            encrypted = rsa.core.encrypt_int(payload, priv_key.d, priv_key.n)
+            return rsa.transform.int2bytes(encrypted, blocksize)
+
+        pad_len = blocksize - len(cleartext) - 3
+        valid = raw_sign('\x00\x01' + '\xff' * pad_len + '\x00' + cleartext)
+
+        backend = self.signer.backend
+        assert backend.verify_hash(valid, digest, 'SHA-256') == True
+        assert backend.find_hash(valid) == ('SHA-256', digest)
+
+        # padding not all 0xFF, or separator moved, or trailing data
+        for block in ('\x00\x01' + '\x42' * pad_len + '\x00' + cleartext,
+                      '\x00\x01' + '\xff' * (pad_len - 8) + '\x00' +
+                      cleartext + 'X' * 8,
+                      '\x00\x01' + '\xff' * (pad_len - 1) + '\x00\x00' +
+                      cleartext,
+                      '\x00\x02' + '\xff' * pad_len + '\x00' + cleartext):
+            forged = raw_sign(block)
+            assert backend.verify_hash(forged, digest, 'SHA-256') == False
+
+            with raises(rsa.pkcs1.VerificationError):
+                backend.find_hash(forged)
+
     def test_stream_noseek(self):
         with tempfile.TemporaryFile() as temp:
             temp.write('ABCDEF')
@@ -138,6 +663,33 @@ class TestWarcSigner(object):
             temp.seek(0)
             assert self.signer.verify(temp, size=total_len) == False
 
+    def test_stream_noseek_detect_hash(self):
+        for hash_type in SIGN_HASH_TYPES:
+            with tempfile.TemporaryFile() as temp:
+                temp.write('ABCDEF' * 100)
+                assert self.signer.sign(temp, hash_type=hash_type) == True
+
+                temp.seek(0, 2)
+                total_len = temp.tell()
+
+                # all candidates hashed in one pass
+                temp.seek(0)
+                assert self.signer.verify(temp, size=total_len) == True
+
+                temp.seek(0)
+                assert self.signer.verify(temp, size=total_len,
+                                          hash_type=[hash_type, 'MD5']) == True
+
+                temp.seek(0)
+                assert self.signer.verify(temp, size=total_len,
+                                          hash_type=['MD5']) == False
+
+                temp.seek(0)
+                assert self.wrong_signer.verify(temp, size=total_len) == False
+
+                # seekable verify finds hash type from signature
+                assert self.signer.verify(temp) == True
+
     def test_unsigned_stream_noseek(self):
         with tempfile.TemporaryFile() as temp:
             temp.write('ABCDEF' * 30)
@@ -155,4 +707,56 @@ class TestWarcSigner(object):
             assert uns.read() == ''
             assert buff.getvalue() == ('ABCDEF' * 30)
 
+    def test_unsigned_stream_buffered(self):
+        with tempfile.TemporaryFile() as temp:
+            temp.write('ABCDEF' * 1000)
+            assert self.signer.sign(temp) == True
+
+            temp.seek(0, 2)
+            total_len = temp.tell()
+
+            temp.seek(0)
+            uns = self.signer.get_unsigned_stream(temp, total_len=total_len)
+            reader = io.BufferedReader(uns, 100)
+            assert reader.read(10) == 'ABCDEFABCD'
+            assert reader.read() == ('ABCDEF' * 1000)[10:]
+            assert reader.read() == ''
+
+            # readinto, without signature
+            temp.seek(0)
+            uns = self.signer.get_unsigned_stream(temp, total_len=total_len)
+            buff = bytearray(4000)
+            assert uns.readinto(buff) == 4000
+            assert uns.readinto(buff) == 2000
+            assert uns.readinto(buff) == 0
+            assert str(buff[:2000]) == ('ABCDEF' * 1000)[4000:]
+
+    def test_unsigned_stream_bounded_lookahead(self):
+        sig_header, rsa_meta = self.signer.get_rsa_metadata()
+
+        class CountingStream(object):
+            # an endless stream, counting bytes read
+            count = 0
+
+            def read(self, size):
+                self.count += size
+                return 'X' * size
+
+        stream = CountingStream()
+
+        # incorrect length, stream is not followed by a signature
+        uns = self.signer.get_unsigned_stream(stream, 1000 + sig_header)
+        assert len(uns.read(800)) == 800
+        assert len(uns.read(800)) == 200
+        assert stream.count == 1000
+
+        # only the size of signature is read ahead
+        assert uns.read(10) == 'X' * 10
+        assert stream.count == 1000 + sig_header
+
+        # and then the rest of the stream, as requested
+        assert len(uns.read(sig_header)) == sig_header - 10
+        assert len(uns.read(50)) == 50
+        assert stream.count == 1050 + sig_header
+
 
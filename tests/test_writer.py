@@ -0,0 +1,81 @@
+from warcsigner.warcsigner import RSASigner
+from warcsigner.writer import SigningWriter
+
+from test_warcsigner import TEST_WARC, PRIVATE_KEY, PUBLIC_KEY
+
+import os
+import shutil
+import tempfile
+
+from io import BytesIO
+from pytest import raises
+
+
+class TestSigningWriter(object):
+    def setup(self):
+        self.signer = RSASigner(private_key_file=PRIVATE_KEY,
+                                chunk_size=1000)
+        self.verifier = RSASigner(public_key_file=PUBLIC_KEY)
+
+        self.data = open(TEST_WARC, 'rb').read()
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_write_same_as_sign(self):
+        for kwargs in ({}, {'tree': True}, {'checkpoint': True},
+                       {'hash_type': 'SHA-512'}):
+            buff = BytesIO()
+            writer = SigningWriter(self.signer, buff, close_stream=False,
+                                   **kwargs)
+
+            for i in xrange(0, len(self.data), 500):
+                writer.write(self.data[i:i + 500])
+
+            assert writer.tell() == len(self.data)
+            writer.close()
+
+            # same as signing after writing
+            expected = BytesIO()
+            expected.write(self.data)
+            self.signer.sign(expected, **kwargs)
+
+            assert buff.getvalue() == expected.getvalue()
+            assert self.verifier.verify(buff) == True
+
+            # no data after the signature
+            with raises(ValueError):
+                writer.write('ABC')
+
+            writer.close()
+            assert buff.getvalue() == expected.getvalue()
+
+    def test_rotate_files(self):
+        paths = [os.path.join(self.temp_dir, 'rotate-%d.warc.gz' % i)
+                 for i in xrange(3)]
+
+        with SigningWriter(self.signer, paths[0], checkpoint=True) as writer:
+            writer.write(self.data)
+            writer.rotate(paths[1])
+            writer.write('ABC')
+            writer.rotate(paths[2])
+
+        for path in paths:
+            assert self.verifier.verify(path) == True
+
+        # checkpoint signature can be appended to
+        assert self.signer.append(paths[1], 'DEF') == True
+        assert self.verifier.verify(paths[1]) == True
+
+    def test_error_not_signed(self):
+        path = os.path.join(self.temp_dir, 'error.warc.gz')
+
+        with raises(ValueError):
+            with SigningWriter(self.signer, path) as writer:
+                writer.write('ABC')
+                raise ValueError('write failed')
+
+        assert writer.closed
+        assert open(path, 'rb').read() == 'ABC'
+        assert self.verifier.verify(path) == False
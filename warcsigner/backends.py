@@ -0,0 +1,312 @@
+import hashlib
+import hmac
+
+import rsa
+
+from rsa.pkcs1 import VerificationError
+
+from hashing import HASH_ASN1, HASH_METHODS
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519, padding
+    from cryptography.hazmat.primitives.asymmetric.utils import Prehashed
+except ImportError:  # pragma: no cover
+    serialization = None
+
+
+DEFAULT_BACKEND = 'rsa'
+
+ED25519 = 'ed25519'
+
+ED25519_SIG_SIZE = 64
+
+# cryptography hash classes, for RSA signatures of a digest
+PREHASHED_TYPES = {
+    'MD5': 'MD5',
+    'SHA-1': 'SHA1',
+    'SHA-256': 'SHA256',
+    'SHA-384': 'SHA384',
+    'SHA-512': 'SHA512',
+}
+
+
+#=================================================================
+class RSABackend(object):
+    """
+    Default signature backend, RSA PKCS#1 v1.5 signatures using the
+    pure python rsa package. Keys are PKCS#1 PEM files.
+
+    A backend signs and verifies already computed digests:
+    - sign_hash() returns the signature of a digest of hash_type
+    - find_hash() returns the (hash_type, digest) signed by a signature,
+    or raises VerificationError. Only possible for RSA signatures
+    - verify_hash() returns true if a signature is of the given digest
+
+    Keys are loaded from PEM files, or PEM data with from_pem()
+    """
+    name = DEFAULT_BACKEND
+    key_type = 'rsa'
+
+    def __init__(self, private_key_file=None, public_key_file=None):
+        self.load(_read(private_key_file) if private_key_file else None,
+                  _read(public_key_file) if public_key_file else None)
+
+    @classmethod
+    def from_pem(cls, private_pem=None, public_pem=None):
+        """ Create the backend with keys from PEM data, rather than files
+        """
+        backend = cls.__new__(cls)
+        backend.load(private_pem, public_pem)
+        return backend
+
+    def load(self, private_pem, public_pem):
+        if private_pem:
+            self.priv_key = rsa.PrivateKey.load_pkcs1(private_pem)
+        else:
+            self.priv_key = None
+
+        if public_pem:
+            self.pub_key = rsa.PublicKey.load_pkcs1(public_pem)
+        elif self.priv_key:
+            # public key from private key, eg. to read checkpoints
+            self.pub_key = rsa.PublicKey(self.priv_key.n, self.priv_key.e)
+        else:
+            self.pub_key = None
+
+    def sig_size(self):
+        """ Size of each signature, in bytes
+        """
+        return rsa.common.byte_size(self.pub_key.n)
+
+    def key_fingerprint(self):
+        """ Hex SHA-256 digest of the DER encoding of the public key
+        """
+        return hashlib.sha256(self.pub_key.save_pkcs1('DER')).hexdigest()
+
+    def public_pem(self):
+        """ The public key, as PEM data loaded by from_pem()
+        """
+        return self.pub_key.save_pkcs1()
+
+    def sign_hash(self, digest, hash_type):
+        return _rsa_sign_hash(digest, self.priv_key, hash_type)
+
+    def find_hash(self, signature):
+        return _rsa_find_hash(signature, self.pub_key)
+
+    def verify_hash(self, signature, digest, hash_type):
+        try:
+            signed_type, signed_digest = self.find_hash(signature)
+        except VerificationError:
+            return False
+
+        return signed_type == hash_type and signed_digest == digest
+
+
+#=================================================================
+class CryptographyBackend(RSABackend):
+    """
+    Native signature backend, using the optional cryptography package,
+    for RSA or Ed25519 keys, in PKCS#1 or PKCS#8 PEM files.
+
+    RSA signatures are the same as those of RSABackend, but computed
+    with OpenSSL. For Ed25519 keys, the signed message is the hash type
+    and digest, and the hash type can not be found from the signature,
+    so it is stored along with it, see Ed25519Metadata
+    """
+    name = 'cryptography'
+
+    def load(self, private_pem, public_pem):
+        if not serialization:  # pragma: no cover
+            raise ImportError('the cryptography package is required ' +
+                              'for the cryptography backend')
+
+        if private_pem:
+            self.priv_key = serialization.load_pem_private_key(
+                private_pem, None, default_backend())
+        else:
+            self.priv_key = None
+
+        if public_pem:
+            self.pub_key = serialization.load_pem_public_key(
+                public_pem, default_backend())
+        elif self.priv_key:
+            self.pub_key = self.priv_key.public_key()
+        else:
+            self.pub_key = None
+
+        key = self.pub_key or self.priv_key
+        if isinstance(key, (ed25519.Ed25519PublicKey,
+                            ed25519.Ed25519PrivateKey)):
+            self.key_type = ED25519
+
+    def sig_size(self):
+        if self.key_type == ED25519:
+            return ED25519_SIG_SIZE
+
+        return (self.pub_key.key_size + 7) // 8
+
+    def key_fingerprint(self):
+        if self.key_type == ED25519:
+            key_format = serialization.PublicFormat.SubjectPublicKeyInfo
+        else:
+            # same as the rsa package DER encoding
+            key_format = serialization.PublicFormat.PKCS1
+
+        der = self.pub_key.public_bytes(serialization.Encoding.DER,
+                                        key_format)
+        return hashlib.sha256(der).hexdigest()
+
+    def public_pem(self):
+        return self.pub_key.public_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PublicFormat.SubjectPublicKeyInfo)
+
+    def sign_hash(self, digest, hash_type):
+        if hash_type not in HASH_ASN1:
+            raise ValueError('Invalid hash method: %s' % hash_type)
+
+        if self.key_type == ED25519:
+            return self.priv_key.sign(_ed25519_message(digest, hash_type))
+
+        # not all hash types can be signed by OpenSSL, eg. BLAKE2b
+        algorithm = getattr(hashes, PREHASHED_TYPES.get(hash_type, ''), None)
+        if not algorithm:
+            raise ValueError('Hash method not supported for native ' +
+                             'RSA signatures: %s' % hash_type)
+
+        return self.priv_key.sign(digest, padding.PKCS1v15(),
+                                  Prehashed(algorithm()))
+
+    def find_hash(self, signature):
+        if self.key_type == ED25519:
+            raise VerificationError('Hash type not stored in signature')
+
+        try:
+            method_hash = self.pub_key.recover_data_from_signature(
+                signature, padding.PKCS1v15(), None)
+        except (InvalidSignature, ValueError):
+            raise VerificationError('Verification failed')
+
+        return _find_method_hash(method_hash)
+
+    def verify_hash(self, signature, digest, hash_type):
+        if self.key_type != ED25519:
+            return super(CryptographyBackend, self).verify_hash(signature,
+                                                                digest,
+                                                                hash_type)
+
+        try:
+            self.pub_key.verify(signature, _ed25519_message(digest,
+                                                            hash_type))
+            return True
+        except InvalidSignature:
+            return False
+
+
+BACKENDS = {
+    RSABackend.name: RSABackend,
+    CryptographyBackend.name: CryptographyBackend,
+}
+
+
+#=================================================================
+def load_backend(backend, private_key_file=None, public_key_file=None):
+    """ Create the backend with the given name (default: 'rsa')
+    and load its keys. backend may also be an already created backend,
+    eg. a daemon.RemoteBackend
+    """
+    if backend is not None and not isinstance(backend, basestring):
+        return backend
+
+    try:
+        backend_cls = BACKENDS[backend or DEFAULT_BACKEND]
+    except KeyError:
+        raise ValueError('Invalid signature backend: %s' % backend)
+
+    return backend_cls(private_key_file, public_key_file)
+
+
+#=================================================================
+def _read(filename):
+    with open(filename, 'rb') as fh:
+        return fh.read()
+
+
+def _ed25519_message(digest, hash_type):
+    return hash_type + ':' + digest
+
+
+#=================================================================
+def _find_method_hash(method_hash):
+    """ rsa.pkcs1._find_method_hash(), using the HASH_ASN1 of hashing
+    """
+    for (hash_type, asn1code) in HASH_ASN1.items():
+        if method_hash.startswith(asn1code):
+            return (hash_type, method_hash[len(asn1code):])
+
+    raise VerificationError('Verification failed')
+
+
+#=================================================================
+def _rsa_find_hash(signature, pub_key):
+    """ Decrypt the signature with the public key, returning the
+    hash type and the signed hash, or raising VerificationError.
+
+    The whole decrypted block must be exactly the PKCS#1 v1.5 block
+    of a digest of a known hash type, 00 01 FF..FF 00 ASN.1 digest,
+    not only start with 00 01 (as in rsa < 3.3, see CVE-2016-1494)
+    """
+    blocksize = rsa.common.byte_size(pub_key.n)
+    encrypted = rsa.transform.bytes2int(signature)
+    decrypted = rsa.core.decrypt_int(encrypted, pub_key.e, pub_key.n)
+    clearsig = rsa.transform.int2bytes(decrypted, blocksize)
+
+    for hash_type in HASH_ASN1:
+        if hash_type not in HASH_METHODS:
+            continue
+
+        digest = clearsig[-HASH_METHODS[hash_type]().digest_size:]
+        expected = _rsa_signature_block(digest, hash_type, blocksize)
+
+        if expected and hmac.compare_digest(clearsig, expected):
+            return hash_type, digest
+
+    raise VerificationError('Verification failed')
+
+
+def _rsa_signature_block(digest, hash_type, blocksize):
+    """ The padded PKCS#1 v1.5 block of a digest, of blocksize bytes,
+    or None if the digest does not fit
+    """
+    cleartext = HASH_ASN1[hash_type] + digest
+    pad_len = blocksize - len(cleartext) - 3
+
+    if pad_len < 8:
+        return None
+
+    return '\x00\x01' + '\xff' * pad_len + '\x00' + cleartext
+
+
+#=================================================================
+def _rsa_sign_hash(message_hash, priv_key, hash_type):
+    """ Sign an already computed hash of type hash_type
+    """
+    if hash_type not in HASH_ASN1:
+        raise ValueError('Invalid hash method: %s' % hash_type)
+
+    # Below is copy of rsa.sign(), after computing the message hash
+    # ------------------------------------------------------------
+    cleartext = HASH_ASN1[hash_type] + message_hash
+    keylength = rsa.common.byte_size(priv_key.n)
+    padded = rsa.pkcs1._pad_for_signing(cleartext, keylength)
+
+    payload = rsa.transform.bytes2int(padded)
+    encrypted = rsa.core.encrypt_int(payload, priv_key.d, priv_key.n)
+    block = rsa.transform.int2bytes(encrypted, keylength)
+
+    # end rsa.sign() ----------------------------------------------
+    return block
@@ -0,0 +1,109 @@
+import sqlite3
+import time
+
+
+DEFAULT_MAX_ENTRIES = 100000
+
+
+#=================================================================
+def file_identity(st):
+    """
+    Return identity of a file from its os.stat() result, as
+    (device, inode, size, mtime_ns, ctime_ns). Any change to the file
+    changes its size, mtime or ctime
+    """
+    mtime_ns = getattr(st, 'st_mtime_ns', None)
+    if mtime_ns is None:
+        mtime_ns = int(st.st_mtime * 1000000000)
+
+    ctime_ns = getattr(st, 'st_ctime_ns', None)
+    if ctime_ns is None:
+        ctime_ns = int(st.st_ctime * 1000000000)
+
+    return (st.st_dev, st.st_ino, st.st_size, mtime_ns, ctime_ns)
+
+
+#=================================================================
+class VerifyCache(object):
+    """
+    Persistent cache of verification results, stored in an sqlite db.
+
+    Results are keyed by file identity, see file_identity(),
+    the fingerprint of the verifying key and the hash type.
+    Only one result is kept per file (device and inode) and key, so a
+    modified file replaces its previous entry.
+
+    The least recently used entries are removed when the cache
+    has more than max_entries entries.
+    """
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS verify_cache (
+                dev INTEGER, ino INTEGER,
+                key_id TEXT, hash_type TEXT,
+                size INTEGER, mtime_ns INTEGER, ctime_ns INTEGER,
+                result INTEGER,
+                last_used REAL,
+                PRIMARY KEY (dev, ino, key_id, hash_type)
+            )""")
+
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS verify_cache_lru
+            ON verify_cache (last_used)""")
+
+    def get(self, st, key_id, hash_type):
+        """
+        Return cached result for file with stat st, or None
+        if not cached or the file has changed
+        """
+        dev, ino, size, mtime_ns, ctime_ns = file_identity(st)
+
+        row = self.conn.execute("""
+            SELECT result FROM verify_cache
+            WHERE dev = ? AND ino = ? AND key_id = ? AND hash_type = ?
+            AND size = ? AND mtime_ns = ? AND ctime_ns = ?""",
+            (dev, ino, key_id, hash_type,
+             size, mtime_ns, ctime_ns)).fetchone()
+
+        if not row:
+            return None
+
+        self.conn.execute("""
+            UPDATE verify_cache SET last_used = ?
+            WHERE dev = ? AND ino = ? AND key_id = ? AND hash_type = ?""",
+            (time.time(), dev, ino, key_id, hash_type))
+
+        return bool(row[0])
+
+    def put(self, st, key_id, hash_type, result):
+        """ Store result for file with stat st
+        """
+        dev, ino, size, mtime_ns, ctime_ns = file_identity(st)
+
+        self.conn.execute("""
+            INSERT OR REPLACE INTO verify_cache
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (dev, ino, key_id, hash_type,
+             size, mtime_ns, ctime_ns,
+             int(result), time.time()))
+
+        self._evict()
+
+    def _evict(self):
+        count = self.conn.execute('SELECT COUNT(*) FROM verify_cache')
+        count = count.fetchone()[0]
+
+        if count <= self.max_entries:
+            return
+
+        self.conn.execute("""
+            DELETE FROM verify_cache WHERE rowid IN
+            (SELECT rowid FROM verify_cache ORDER BY last_used LIMIT ?)""",
+            (count - self.max_entries,))
+
+    def close(self):
+        self.conn.close()
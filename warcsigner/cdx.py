@@ -0,0 +1,105 @@
+import os
+
+
+CDX_INDEX_EXT = '.cdx'
+
+# fields of each line: original url, date, compressed length and offset
+# of the record, and file name
+CDX_HEADER = ' CDX a b S V g'
+
+
+#=================================================================
+class CdxIndex(object):
+    """
+    CDX-like index of the records of a WARC: the url (WARC-Target-URI)
+    and date (WARC-Date) of each record, and the offset and length of
+    its gzip member, as found when signing or verifying the WARC with
+    a WarcChecker(index=True), without reading it again.
+
+    The index is stored as text, a header line followed by one line
+    per record, sorted as by LC_ALL=C sort, ie. by url and date:
+
+     CDX a b S V g
+    <url> <14-digit date> <length> <offset> <file name>
+    ...
+
+    Records without a url, eg. warcinfo, are indexed with url '-'
+
+    >>> from io import BytesIO
+    >>> index = CdxIndex([('http://example.com/', '2014-01-03T03:03:21Z',
+    ...                    333, 1043), (None, '2014-01-03', 0, 333)],
+    ...                  'a.warc.gz')
+    >>> buff = BytesIO()
+    >>> index.write(buff)
+    >>> print buff.getvalue(),
+     CDX a b S V g
+    - 20140103 333 0 a.warc.gz
+    http://example.com/ 20140103030321 1043 333 a.warc.gz
+
+    >>> CdxIndex.load(BytesIO(buff.getvalue())).entries[1]
+    ('http://example.com/', '20140103030321', 333, 1043)
+
+    >>> CdxIndex.load(BytesIO('not an index'))
+    """
+    def __init__(self, entries, filename=None):
+        self.entries = [(url or '-', _timestamp(date), offset, length)
+                        for url, date, offset, length in entries]
+
+        self.filename = filename or '-'
+
+    def lines(self):
+        """ Return the sorted lines of the index, without the header
+        """
+        return sorted('%s %s %d %d %s\n' % (url, timestamp, length, offset,
+                                            self.filename)
+                      for url, timestamp, offset, length in self.entries)
+
+    def write(self, fh):
+        fh.write(CDX_HEADER + '\n')
+        for line in self.lines():
+            fh.write(line)
+
+    def write_to(self, target):
+        """ Write the index to a filename or stream
+        """
+        if hasattr(target, 'write'):
+            return self.write(target)
+
+        with open(target, 'wb') as fh:
+            self.write(fh)
+
+    @staticmethod
+    def load(fh):
+        """ Load index from stream, return None if not a valid index
+        """
+        try:
+            lines = fh.read().splitlines()
+            assert lines[0] == CDX_HEADER
+
+            entries = []
+            filename = None
+            for line in lines[1:]:
+                url, timestamp, length, offset, filename = line.split(' ')
+                entries.append((url, timestamp, int(offset), int(length)))
+
+            return CdxIndex(entries, filename)
+
+        except Exception:
+            return None
+
+
+#=================================================================
+def cdx_filename(fh):
+    """ File name of the WARC of stream fh, in the index, if known
+    """
+    name = getattr(fh, 'name', None)
+    if not isinstance(name, basestring):
+        return None
+
+    return os.path.basename(name)
+
+
+def _timestamp(date):
+    """ Digits of a WARC-Date, up to 14 (YYYYMMDDhhmmss)
+    """
+    return ''.join(c for c in (date or '') if c.isdigit())[:14] or '-'
@@ -0,0 +1,285 @@
+import json
+import os
+import socket
+import stat
+import sys
+import threading
+
+from argparse import ArgumentParser
+
+from backends import load_backend, BACKENDS
+from hashing import HASH_METHODS
+
+try:
+    import SocketServer as socketserver
+except ImportError:  # pragma: no cover
+    import socketserver
+
+
+# maximum size of a request line, bounding the size of a batch
+MAX_REQUEST_SIZE = 1024 * 1024
+
+DEFAULT_SOCKET_MODE = 0600
+
+
+#=================================================================
+class SigningServer(socketserver.ThreadingUnixStreamServer):
+    """
+    A signing service, listening on a local unix socket, which loads
+    the private key once and signs digests for RemoteBackend clients,
+    so that the private key is only held by this process.
+
+    Each request and response is a line of JSON, on a connection
+    kept open by the client for any number of requests:
+
+    - {"op": "info"} returns the key_type, key_id, sig_size, backend
+    and public_key (PEM) of the key
+    - {"op": "sign", "hash_type": ..., "digests": [<hex>, ...]} returns
+    the "signatures" of a batch of digests, as hex
+
+    An invalid request returns {"error": <message>}
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, private_key_file, backend=None,
+                 mode=DEFAULT_SOCKET_MODE):
+        self.backend = load_backend(backend, private_key_file)
+
+        self.info = dict(key_type=self.backend.key_type,
+                         key_id=self.backend.key_fingerprint(),
+                         sig_size=self.backend.sig_size(),
+                         backend=self.backend.name,
+                         public_key=self.backend.public_pem())
+
+        self.mode = mode
+
+        # replace a stale socket of a previous server
+        if _is_socket(socket_path):
+            os.remove(socket_path)
+
+        socketserver.ThreadingUnixStreamServer.__init__(self, socket_path,
+                                                        _SigningHandler)
+
+    def server_bind(self):
+        """ Create the socket with no more than mode permissions,
+        so that it is never accessible to others, even before chmod
+        """
+        umask = os.umask(0777 & ~self.mode)
+        try:
+            socketserver.ThreadingUnixStreamServer.server_bind(self)
+        finally:
+            os.umask(umask)
+
+        os.chmod(self.server_address, self.mode)
+
+    def handle_request_line(self, line):
+        """ Return the response to a request line, as a dict
+        """
+        try:
+            request = json.loads(line)
+            op = request.get('op')
+
+            if op == 'info':
+                return self.info
+
+            if op == 'sign':
+                hash_type = str(request['hash_type'])
+                if hash_type not in HASH_METHODS:
+                    raise ValueError('Invalid hash method: %s' % hash_type)
+
+                digest_size = HASH_METHODS[hash_type]().digest_size
+
+                digests = [str(digest).decode('hex')
+                           for digest in request['digests']]
+
+                if any(len(digest) != digest_size for digest in digests):
+                    raise ValueError('Invalid digest size for %s' %
+                                     hash_type)
+
+                signatures = [self.backend.sign_hash(digest, hash_type)
+                              for digest in digests]
+
+                return dict(signatures=[signature.encode('hex')
+                                        for signature in signatures])
+
+            raise ValueError('Invalid op: %s' % op)
+
+        except Exception as e:
+            return dict(error='%s: %s' % (type(e).__name__, e))
+
+    def server_close(self):
+        socketserver.ThreadingUnixStreamServer.server_close(self)
+        if _is_socket(self.server_address):
+            os.remove(self.server_address)
+
+
+class _SigningHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_SIZE + 1)
+            if not line:
+                return
+
+            if len(line) > MAX_REQUEST_SIZE:
+                response = dict(error='Request too large')
+            else:
+                response = self.server.handle_request_line(line)
+
+            self.wfile.write(json.dumps(response) + '\n')
+            self.wfile.flush()
+
+            if len(line) > MAX_REQUEST_SIZE:
+                return
+
+
+#=================================================================
+class RemoteBackend(object):
+    """
+    Signature backend which signs digests with the key of a SigningServer,
+    over its unix socket. Data is still hashed locally, and only digests
+    are sent, so signing a file takes one round trip, and the private key
+    is never loaded.
+
+    Signatures are verified locally, with the public key of the server.
+    A single connection is kept open, and may be shared by threads
+    """
+    name = 'remote'
+
+    def __init__(self, socket_path, timeout=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.priv_key = None
+
+        self._lock = threading.Lock()
+        self._sock = None
+        self._rfile = None
+
+        info = self._request(dict(op='info'))
+
+        self.key_type = info['key_type']
+        self._key_id = info['key_id']
+        self._sig_size = info['sig_size']
+
+        # verify with the public key of the server
+        self.local = BACKENDS[info['backend']].from_pem(
+                            public_pem=str(info['public_key']))
+
+        self.pub_key = self.local.pub_key
+
+    def sig_size(self):
+        return self._sig_size
+
+    def key_fingerprint(self):
+        return self._key_id
+
+    def sign_hash(self, digest, hash_type):
+        return self.sign_hashes([digest], hash_type)[0]
+
+    def sign_hashes(self, digests, hash_type):
+        """ Sign a batch of digests of hash_type, with one request
+        """
+        response = self._request(dict(op='sign', hash_type=hash_type,
+                                      digests=[digest.encode('hex')
+                                               for digest in digests]))
+
+        return [str(signature).decode('hex')
+                for signature in response['signatures']]
+
+    def find_hash(self, signature):
+        return self.local.find_hash(signature)
+
+    def verify_hash(self, signature, digest, hash_type):
+        return self.local.verify_hash(signature, digest, hash_type)
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _request(self, request):
+        """ Send a request and return its response, reconnecting once
+        if the connection was closed, eg. after a server restart.
+        Raise ValueError for an error returned by the server
+        """
+        line = json.dumps(request) + '\n'
+
+        with self._lock:
+            for retry in (True, False):
+                try:
+                    if not self._sock:
+                        self._connect()
+
+                    self._sock.sendall(line)
+                    response = self._rfile.readline()
+                    if not response:
+                        raise socket.error('Connection closed')
+                    break
+
+                except socket.error:
+                    self._close()
+                    if not retry:
+                        raise
+
+        response = json.loads(response)
+        if 'error' in response:
+            raise ValueError(response['error'])
+
+        return response
+
+    def _connect(self):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(self.timeout)
+        self._sock.connect(self.socket_path)
+        self._rfile = self._sock.makefile('rb')
+
+    def _close(self):
+        if self._sock:
+            self._rfile.close()
+            self._sock.close()
+
+        self._sock = None
+        self._rfile = None
+
+
+#=================================================================
+def _is_socket(path):
+    try:
+        return stat.S_ISSOCK(os.stat(path).st_mode)
+    except (OSError, TypeError):
+        return False
+
+
+#=================================================================
+def daemon_cli(args=None):
+    parser = ArgumentParser(description='sign digests for warc-sign ' +
+                                        'clients, over a unix socket')
+
+    parser.add_argument('private_key',
+                        help='a privatekey.pem file in PEM format')
+
+    parser.add_argument('socket',
+                        help='path of the unix socket to listen on')
+
+    parser.add_argument('--backend', choices=sorted(BACKENDS),
+                        help='signature backend, cryptography is native ' +
+                             'and supports Ed25519 keys (default: rsa)')
+
+    parser.add_argument('--mode', default='%o' % DEFAULT_SOCKET_MODE,
+                        help='permissions of the socket, in octal ' +
+                             '(default: %(default)s)')
+
+    cmd = parser.parse_args(args=args)
+
+    server = SigningServer(cmd.socket, cmd.private_key, cmd.backend,
+                           int(cmd.mode, 8))
+
+    print >> sys.stderr, 'Signing with key %s on %s' % (server.info['key_id'],
+                                                        cmd.socket)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    return 0
@@ -1,6 +1,7 @@
 import struct
 import time
 import io
+import os
 import gzip
 
 MAGIC_HEADER = '\037\213\010'
@@ -8,6 +9,13 @@ FLAGS = '\004'
 XFL_OS = '\000\003'
 EMPTY_DATA = '\003\000'
 
+# bytes read from the end of a file by read_tail(), enough for
+# signatures of any type, except of large sized metadata, eg.
+# checkpoints of very large trees, which are read again whole
+DEFAULT_TAIL_SIZE = 4096
+
+pread = getattr(os, 'pread', None)
+
 
 #=================================================================
 class LengthMetadata:
@@ -56,27 +64,33 @@ def write_length_metadata(fh, length):
 
 #=================================================================
 def write_metadata(fh, metadata):
-    fh.write(MAGIC_HEADER)
-    fh.write(FLAGS)
+    """ Append metadata, as an empty gzip member, written at once,
+    so that nothing is written if the metadata can not be
+    """
+    buff = io.BytesIO()
+    buff.write(MAGIC_HEADER)
+    buff.write(FLAGS)
 
     #timestamp
-    write32(fh, 0)
+    write32(buff, 0)
 
-    fh.write(XFL_OS)
+    buff.write(XFL_OS)
 
     # total length
-    write16(fh, metadata.size() + 4)
-    fh.write(metadata.id()[:2])
+    write16(buff, metadata.size() + 4)
+    buff.write(metadata.id()[:2])
     # length of metadata
-    write16(fh, metadata.size())
+    write16(buff, metadata.size())
 
-    metadata.write(fh)
+    metadata.write(buff)
 
     # empty data
-    fh.write(EMPTY_DATA)
+    buff.write(EMPTY_DATA)
 
-    write32(fh, 0)
-    write32(fh, 0)
+    write32(buff, 0)
+    write32(buff, 0)
+
+    fh.write(buff.getvalue())
 
 
 #=================================================================
@@ -84,6 +98,171 @@ def size_of_header(metadata):
     return 26 + metadata.size()
 
 
+#=================================================================
+def read_tail_size(fh):
+    r"""
+    For metadata which ends with its own size, as a 16-bit value,
+    read that size from the metadata at the end of seekable stream fh.
+    Return None if it can not be read
+
+    >>> buff = io.BytesIO()
+    >>> write_length_metadata(buff, 0x1234 << 48)
+    >>> hex(read_tail_size(buff))
+    '0x1234'
+
+    >>> read_tail_size(io.BytesIO('\x00'))
+    """
+    try:
+        fh.seek(-12, 2)
+        return read16(fh)
+    except Exception:
+        return None
+
+
+#=================================================================
+def read_tail(fh, size=DEFAULT_TAIL_SIZE):
+    r"""
+    Read the last size bytes of seekable stream fh, with a single read
+    (positional, if supported), and return them as a BytesIO, from which
+    metadata at the end of fh can be read as from fh itself.
+    Larger metadata ending with its own size, see read_tail_size(),
+    is read whole, with a second read
+
+    >>> buff = io.BytesIO()
+    >>> write_length_metadata(buff, 1234)
+    >>> len(read_tail(buff, 16).getvalue())
+    16
+
+    >>> buff = io.BytesIO()
+    >>> write_length_metadata(buff, 0x1234 << 48)
+    >>> len(read_tail(buff, 16).getvalue())
+    34
+    """
+    fh.seek(0, 2)
+    length = fh.tell()
+
+    tail = io.BytesIO(_read_at(fh, length - min(size, length), size))
+
+    sized = read_tail_size(tail)
+    if sized and sized + 26 > size and size < length:
+        needed = min(sized + 26, length)
+        tail = io.BytesIO(_read_at(fh, length - needed, needed))
+
+    return tail
+
+
+def _read_at(fh, offset, size):
+    try:
+        fd = fh.fileno()
+    except (AttributeError, IOError, ValueError):
+        fd = None
+
+    if pread and fd is not None:
+        fh.flush()
+        data = pread(fd, size, offset)
+
+        # short reads, eg. of network filesystems, until end of file
+        while len(data) < size:
+            buff = pread(fd, size - len(data), offset + len(data))
+            if not buff:
+                break
+
+            data += buff
+
+        return data
+
+    fh.seek(offset)
+    return fh.read(size)
+
+
+#=================================================================
+def find_metadata(buff):
+    r"""
+    Find metadata of any type and size at the end of string buff,
+    eg. the tail of a file, without knowing its type.
+    Return (id, data) of the metadata, or None if not found
+
+    >>> buff = io.BytesIO()
+    >>> write_length_metadata(buff, 1234)
+    >>> find_metadata('\037\213\010\004' + buff.getvalue())
+    ('LN', '\xd2\x04\x00\x00\x00\x00\x00\x00')
+
+    >>> find_metadata(buff.getvalue()[1:])
+    >>> find_metadata('abc')
+    """
+    header = MAGIC_HEADER + FLAGS
+    if len(buff) < 26 or not buff.endswith(EMPTY_DATA + '\000' * 8):
+        return None
+
+    # candidate headers, from the end, must have room for empty metadata
+    end = len(buff) - 26 + len(header)
+
+    while True:
+        start = buff.rfind(header, 0, end)
+        if start < 0:
+            return None
+
+        size = len(buff) - start - 26
+        xlen = struct.unpack('<H', buff[start + 10:start + 12])[0]
+        meta_len = struct.unpack('<H', buff[start + 14:start + 16])[0]
+
+        if xlen == size + 4 and meta_len == size:
+            return buff[start + 12:start + 14], buff[start + 16:-10]
+
+        end = start + len(header) - 1
+
+
+#=================================================================
+def pack_fields(fields):
+    r"""
+    Pack (tag, value) pairs of two-byte tags and string values,
+    each as the tag, the 16-bit length of the value, and the value
+
+    >>> pack_fields([('AB', 'xyz'), ('CD', '')])
+    'AB\x03\x00xyzCD\x00\x00'
+    """
+    buff = io.BytesIO()
+    for tag, value in fields:
+        assert len(tag) == 2
+        buff.write(tag)
+        write16(buff, len(value))
+        buff.write(value)
+
+    return buff.getvalue()
+
+
+def unpack_fields(buff):
+    r"""
+    Unpack the (tag, value) pairs of pack_fields(), raising ValueError
+    if buff is not a valid sequence of fields
+
+    >>> unpack_fields(pack_fields([('AB', 'xyz'), ('CD', '')]))
+    [('AB', 'xyz'), ('CD', '')]
+
+    >>> unpack_fields('AB\x04\x00xyz')
+    Traceback (most recent call last):
+    ValueError: Invalid fields
+    """
+    fields = []
+    offset = 0
+
+    while offset < len(buff):
+        if offset + 4 > len(buff):
+            raise ValueError('Invalid fields')
+
+        tag = buff[offset:offset + 2]
+        length = struct.unpack('<H', buff[offset + 2:offset + 4])[0]
+        offset += 4
+
+        if offset + length > len(buff):
+            raise ValueError('Invalid fields')
+
+        fields.append((tag, buff[offset:offset + length]))
+        offset += length
+
+    return fields
+
+
 #=================================================================
 def write16(fh, value):
     fh.write(struct.pack(b'<H', int(value)))
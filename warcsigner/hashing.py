@@ -0,0 +1,275 @@
+import ctypes
+import ctypes.util
+import hashlib
+import io
+import mmap
+import os
+import stat
+import sys
+
+import rsa
+
+try:
+    from hashlib import blake2b
+except ImportError:  # pragma: no cover
+    try:
+        from pyblake2 import blake2b
+    except ImportError:
+        blake2b = None
+
+
+DEFAULT_BUFF_SIZE = 1024 * 1024
+
+# how files are read when hashing: memory-mapped (default), or read
+# sequentially, see hash_sequential()
+MMAP_IO = 'mmap'
+SEQUENTIAL_IO = 'sequential'
+
+IO_MODES = (MMAP_IO, SEQUENTIAL_IO)
+
+
+#=================================================================
+# hash constructors, using the hash type names of rsa.pkcs1
+HASH_METHODS = {
+    'MD5': hashlib.md5,
+    'SHA-1': hashlib.sha1,
+    'SHA-256': hashlib.sha256,
+    'SHA-384': hashlib.sha384,
+    'SHA-512': hashlib.sha512,
+}
+
+# ASN.1 DigestInfo prefix for each hash type, for PKCS#1 signatures
+HASH_ASN1 = dict(rsa.pkcs1.HASH_ASN1)
+
+# BLAKE2b-512, if available (hashlib on python 3.6+, or pyblake2),
+# with the id-blake2b512 OID of RFC 7693
+if blake2b:
+    HASH_METHODS['BLAKE2b'] = blake2b
+    HASH_ASN1['BLAKE2b'] = ('\x30\x53\x30\x0f\x06\x0b\x2b\x06\x01\x04\x01'
+                            '\x8d\x3a\x0c\x02\x01\x10\x05\x00\x04\x40')
+
+# hash types offered for signing, and the candidate hash types when
+# verifying a stream whose signature is only read after hashing
+SIGN_HASH_TYPES = [hash_type for hash_type in
+                   ('SHA-1', 'SHA-256', 'SHA-512', 'BLAKE2b')
+                   if hash_type in HASH_METHODS]
+
+
+#=================================================================
+def _libc_fadvise():
+    """ posix_fadvise() of libc, on linux with python 2, or None
+    """
+    if not sys.platform.startswith('linux'):
+        return None, 0, 0
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        func = libc.posix_fadvise64
+    except (OSError, AttributeError):
+        return None, 0, 0
+
+    func.argtypes = [ctypes.c_int, ctypes.c_int64, ctypes.c_int64,
+                     ctypes.c_int]
+
+    def fadvise(fd, offset, length, advice):
+        # returns the error number, rather than setting errno
+        err = func(fd, offset, length, advice)
+        if err:
+            raise OSError(err, os.strerror(err))
+
+    # linux values, except for DONTNEED on s390x
+    return fadvise, 2, 6 if os.uname()[4] == 's390x' else 4
+
+
+try:
+    from os import posix_fadvise
+    from os import POSIX_FADV_SEQUENTIAL, POSIX_FADV_DONTNEED
+except ImportError:  # pragma: no cover
+    posix_fadvise, POSIX_FADV_SEQUENTIAL, POSIX_FADV_DONTNEED = \
+        _libc_fadvise()
+
+
+def fadvise(fd, offset, length, advice):
+    """ posix_fadvise(), if available, ignoring any error,
+    as the advice is only a hint
+    """
+    if not posix_fadvise:
+        return
+
+    try:
+        posix_fadvise(fd, offset, length, advice)
+    except (OSError, IOError):
+        pass
+
+
+#=================================================================
+def new_hash(hash_type):
+    """
+    Create a new hashlib object for the given hash type
+
+    >>> new_hash('SHA-1').digest_size
+    20
+
+    >>> new_hash('SHA-2')
+    Traceback (most recent call last):
+    ValueError: Invalid hash method: SHA-2
+    """
+    try:
+        return HASH_METHODS[hash_type]()
+    except KeyError:
+        raise ValueError('Invalid hash method: %s' % hash_type)
+
+
+#=================================================================
+def is_regular_file(fh):
+    """
+    Return true if fh is backed by a regular file on disk,
+    which can be memory-mapped
+    """
+    try:
+        return stat.S_ISREG(os.fstat(fh.fileno()).st_mode)
+    except (AttributeError, IOError, OSError, ValueError):
+        return False
+
+
+#=================================================================
+def hash_file(fh, hashers, length=None, buff_size=DEFAULT_BUFF_SIZE):
+    """
+    Update each of the hashers with the first length bytes
+    (or all bytes, if length is None) of the seekable stream fh.
+
+    Regular files are memory-mapped and hashed in buff_size windows,
+    any other stream is read with hash_stream().
+    The stream is left positioned at the end of the hashed range.
+
+    Return the number of bytes hashed
+    """
+    if not is_regular_file(fh):
+        fh.seek(0)
+        return hash_stream(fh, hashers, length, buff_size)
+
+    # ensure any buffered writes are visible to the mapping
+    fh.flush()
+
+    size = os.fstat(fh.fileno()).st_size
+    if length is None or length > size:
+        length = size
+
+    if length > 0:
+        mm = mmap.mmap(fh.fileno(), length, access=mmap.ACCESS_READ)
+        try:
+            for offset in xrange(0, length, buff_size):
+                window = buffer(mm, offset, buff_size)
+                for hasher in hashers:
+                    hasher.update(window)
+        finally:
+            mm.close()
+
+    fh.seek(length)
+    return length
+
+
+#=================================================================
+def hash_sequential(fh, hashers, length=None, buff_size=DEFAULT_BUFF_SIZE,
+                    start=0, reader=None):
+    """
+    Update each of the hashers with the bytes from offset start up to
+    length of seekable stream fh, as hash_file(), but reading a regular
+    file sequentially,
+    eg. on a network filesystem, or to keep a large file from evicting
+    other data from the page cache.
+
+    The file is read with buff_size reads (rounded up to a multiple of
+    the page size) at aligned offsets, into a single buffer. The kernel
+    is advised to read ahead (POSIX_FADV_SEQUENTIAL), and to drop the
+    pages already hashed, behind each read (POSIX_FADV_DONTNEED),
+    where posix_fadvise() is available.
+    Any other stream is read with hash_stream(). If set, reader wraps
+    the unbuffered file, eg. to time reads.
+
+    Return the number of bytes hashed
+    """
+    if not is_regular_file(fh):
+        fh.seek(start)
+        if length is not None:
+            length -= start
+
+        return hash_stream(fh, hashers, length, buff_size)
+
+    fh.flush()
+
+    fd = fh.fileno()
+
+    size = os.fstat(fd).st_size
+    if length is None or length > size:
+        length = size
+
+    buff_size = -(-buff_size // mmap.PAGESIZE) * mmap.PAGESIZE
+    view = memoryview(bytearray(buff_size))
+
+    # unbuffered, one read() per readinto()
+    raw = io.FileIO(fd, 'r', closefd=False)
+    raw.seek(start)
+
+    if reader:
+        raw = reader(raw)
+
+    fadvise(fd, start, length - start, POSIX_FADV_SEQUENTIAL)
+
+    offset = start
+
+    while offset < length:
+        count = raw.readinto(view[:min(buff_size, length - offset)])
+        if not count:
+            break
+
+        buff = view[:count]
+        for hasher in hashers:
+            hasher.update(buff)
+
+        fadvise(fd, offset, count, POSIX_FADV_DONTNEED)
+        offset += count
+
+    fh.seek(offset)
+    return offset - start
+
+
+#=================================================================
+def hash_stream(fh, hashers, limit=None, buff_size=DEFAULT_BUFF_SIZE):
+    """
+    Update each of the hashers with data read linearly from fh,
+    until EOF or until limit bytes have been read.
+
+    If the stream supports readinto(), a single buff_size buffer
+    is reused for all reads. Hashers must not retain the buffer passed
+    to update() as it is overwritten on next read.
+
+    Return the number of bytes hashed
+    """
+    readinto = getattr(fh, 'readinto', None)
+    if readinto:
+        view = memoryview(bytearray(buff_size))
+
+    total = 0
+
+    while limit is None or total < limit:
+        size = buff_size
+        if limit is not None:
+            size = min(size, limit - total)
+
+        if readinto:
+            count = readinto(view[:size])
+            buff = view[:count]
+        else:
+            buff = fh.read(size)
+            count = len(buff)
+
+        if not count:
+            break
+
+        for hasher in hashers:
+            hasher.update(buff)
+
+        total += count
+
+    return total
@@ -0,0 +1,105 @@
+from io import BytesIO
+
+from gzipmeta import read_metadata
+from hashing import new_hash
+from warcsigner import candidate_hash_types
+
+
+#=================================================================
+class StreamVerifier(object):
+    """
+    Verify a signed stream incrementally, as its data is received,
+    eg. an upload in an event loop, without a blocking read():
+
+    verifier = StreamVerifier(signer)
+    for chunk in chunks:
+        verifier.feed(chunk)
+
+    result = verifier.close()
+
+    feed() hashes each chunk immediately, except for the last bytes
+    received, of the size of a plain signature, which are held back.
+    At the end of the stream, close() reads the signature from those,
+    and returns the verification result. No I/O is done, and memory
+    is bounded by the size of the signature, so any number of streams
+    may be verified concurrently, by one thread.
+
+    As with verify_stream_data(), only plain signatures are supported,
+    and hash_type may be a list of candidate hash types, all computed,
+    by default SIGN_HASH_TYPES
+    """
+    def __init__(self, signer, hash_type=None):
+        self.signer = signer
+        self.sig_header, self.rsa_meta = signer.get_rsa_metadata()
+
+        self.hash_types = candidate_hash_types(hash_type)
+        self.hashers = [new_hash(candidate)
+                        for candidate in self.hash_types]
+
+        if signer.stats:
+            self._update = signer.stats.hasher(self.hashers).update
+        else:
+            self._update = self._update_hashers
+
+        # last sig_header bytes received, not yet hashed
+        self.held = ''
+
+        self.length = 0
+        self.result = None
+
+    def feed(self, data):
+        """ Hash the data received, except for the last sig_header bytes
+        """
+        if self.result is not None:
+            raise ValueError('Verifier is already closed')
+
+        self.length += len(data)
+
+        if len(data) >= self.sig_header:
+            if self.held:
+                self._update(self.held)
+
+            if len(data) > self.sig_header:
+                self._update(memoryview(data)[:len(data) - self.sig_header])
+
+            self.held = _to_bytes(data[len(data) - self.sig_header:])
+            return
+
+        # small chunk, held with the end of the previous ones
+        held = self.held + _to_bytes(data)
+        if len(held) > self.sig_header:
+            self._update(held[:len(held) - self.sig_header])
+            held = held[len(held) - self.sig_header:]
+
+        self.held = held
+
+    def close(self):
+        """ End of stream, return True if the data fed was signed
+        """
+        if self.result is not None:
+            return self.result
+
+        self.result = False
+
+        if (len(self.held) == self.sig_header and
+            read_metadata(BytesIO(self.held), self.rsa_meta, seek=False)):
+            self.result = self.signer.verify_candidates(self.rsa_meta,
+                                                        self.hash_types,
+                                                        self.hashers)
+
+        self.held = ''
+        return self.result
+
+    def _update_hashers(self, buff):
+        for hasher in self.hashers:
+            hasher.update(buff)
+
+
+def _to_bytes(buff):
+    """ Copy of a held str, bytearray or memoryview, as a str,
+    not keeping the buffer of the caller
+    """
+    if isinstance(buff, memoryview):
+        return buff.tobytes()
+
+    return bytes(buff)
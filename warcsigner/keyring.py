@@ -0,0 +1,133 @@
+import glob
+import os
+
+from rsa.pkcs1 import VerificationError
+
+from cache import VerifyCache
+from warcsigner import RSASigner, RSAKeyMetadata, SignedInfoMetadata
+from warcsigner import MultiSignatureMetadata, KEY_ID_LEN
+
+
+#=================================================================
+class Keyring(object):
+    """
+    A set of public keys, to verify files signed with any one of them.
+
+    The signing key is found from the signature metadata, without
+    reading the rest of the file: directly by key id if signed with
+    key_id=True or info=True, or with several keys, or otherwise by
+    decrypting the signature with each key of the same size, which does
+    not require hashing the file.
+    Each file is then hashed only once, however many keys are loaded.
+
+    public_key_files may include PEM files or directories of *.pem files.
+    Any additional args are passed to the RSASigner of each key, with
+    one VerifyCache, if cache is set, shared by all keys.
+    Ed25519 keys can only be found by key id, as their signatures can
+    not be decrypted
+    """
+    def __init__(self, public_key_files, **kwargs):
+        self.signers = {}
+        self.signers_by_size = {}
+
+        # stats, if any, are shared by the signers of all keys
+        self.stats = kwargs.get('stats')
+
+        # as is the cache, results being stored by key
+        self.cache = kwargs.get('cache')
+        if self.cache and not isinstance(self.cache, VerifyCache):
+            self.cache = VerifyCache(self.cache)
+            kwargs['cache'] = self.cache
+
+        for public_key_file in _expand_key_files(public_key_files):
+            signer = RSASigner(public_key_file=public_key_file, **kwargs)
+
+            self.signers[signer.key_id[:KEY_ID_LEN]] = signer
+
+            size = (signer.backend.key_type, signer.backend.sig_size())
+            self.signers_by_size.setdefault(size, []).append(signer)
+
+    def find_signer(self, fh):
+        """ Return the RSASigner of the key used to sign seekable stream
+        fh, by only reading the signature, or None if not found
+        """
+        for signers in self.signers_by_size.values():
+            sig_header, rsa_meta = signers[0].read_signature(fh)
+            if not rsa_meta:
+                continue
+
+            if isinstance(rsa_meta, (RSAKeyMetadata, SignedInfoMetadata)):
+                return self.signers.get(rsa_meta.key_id)
+
+            # any one of the keys of several signatures
+            if isinstance(rsa_meta, MultiSignatureMetadata):
+                for key_id, signature in rsa_meta.signatures:
+                    if key_id in self.signers:
+                        return self.signers[key_id]
+
+                return None
+
+            for signer in signers:
+                try:
+                    signer.backend.find_hash(rsa_meta.signature)
+                    return signer
+                except VerificationError:
+                    pass
+
+        return None
+
+    def verify(self, file_, remove=False, quick=False, checker=None):
+        return self.identify(file_, remove, quick, checker) is not None
+
+    def identify(self, file_, remove=False, quick=False, checker=None):
+        """ Verify a file or seekable stream, returning the fingerprint
+        of the verifying key, or None if not verified by any key.
+        If set, checker is passed the data, see RSASigner.verify()
+        """
+        try:
+            if hasattr(file_, 'read'):
+                return self.identify_stream(file_, remove, quick, checker)
+
+            if not os.path.isfile(file_):
+                return None
+
+            mod = 'r' if not remove else 'a+'
+
+            with open(file_, mod) as fh:
+                if self.cache and not remove and not quick and not checker:
+                    return self.identify_cached(fh)
+
+                return self.identify_stream(fh, remove, quick, checker)
+        finally:
+            if checker:
+                checker.close()
+
+    def identify_stream(self, fh, remove=False, quick=False, checker=None):
+        signer = self.find_signer(fh)
+        if not signer or not signer.verify_stream(fh, remove,
+                                                  quick and not checker,
+                                                  checker):
+            return None
+
+        return signer.key_id
+
+    def identify_cached(self, fh):
+        """ Verify a file, with the key found from its signature, using
+        the cached result of that key, see RSASigner.verify_cached()
+        """
+        signer = self.find_signer(fh)
+        if not signer or not signer.verify_cached(fh):
+            return None
+
+        return signer.key_id
+
+
+#=================================================================
+def _expand_key_files(public_key_files):
+    for public_key_file in public_key_files:
+        if os.path.isdir(public_key_file):
+            pattern = os.path.join(public_key_file, '*.pem')
+            for filename in sorted(glob.glob(pattern)):
+                yield filename
+        else:
+            yield public_key_file
@@ -0,0 +1,155 @@
+import gzip
+import os
+
+from io import BytesIO
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+from hashing import new_hash, hash_file, DEFAULT_BUFF_SIZE
+
+
+MANIFEST_HEADER = 'warcsigner-manifest'
+
+
+#=================================================================
+class Manifest(object):
+    """
+    List of the name, size and digest of many files, which is signed
+    once for all the files, see RSASigner.sign_manifest()
+
+    The manifest is stored as gzip-compressed text, a header line followed
+    by one line per file, with names relative to the manifest:
+
+    warcsigner-manifest <hash type>
+    <size> <hex digest> <name>
+    ...
+
+    >>> manifest = Manifest('SHA-1', [('a b.warc.gz', 4, 'ABC')])
+    >>> buff = BytesIO()
+    >>> manifest.write(buff)
+    >>> manifest = Manifest.load(BytesIO(buff.getvalue()))
+    >>> manifest.hash_type, manifest.entries
+    ('SHA-1', [('a b.warc.gz', 4, 'ABC')])
+
+    >>> Manifest.load(BytesIO('not a manifest'))
+    """
+    def __init__(self, hash_type, entries, base_dir=None):
+        self.hash_type = hash_type
+        self.entries = entries
+        self.base_dir = base_dir
+
+        self._by_name = dict((name, (size, digest))
+                             for name, size, digest in entries)
+
+    def write(self, fh):
+        buff = BytesIO()
+        buff.write('%s %s\n' % (MANIFEST_HEADER, self.hash_type))
+
+        for name, size, digest in self.entries:
+            buff.write('%d %s %s\n' % (size, digest.encode('hex'), name))
+
+        gz = gzip.GzipFile(fileobj=fh, mode='wb')
+        gz.write(buff.getvalue())
+        gz.close()
+
+    @staticmethod
+    def load(fh, base_dir=None):
+        """ Load manifest from stream, return None if not a valid manifest
+        """
+        try:
+            lines = gzip.GzipFile(fileobj=fh).read().splitlines()
+
+            header, hash_type = lines[0].split(' ')
+            assert header == MANIFEST_HEADER
+
+            entries = []
+            for line in lines[1:]:
+                size, digest, name = line.split(' ', 2)
+                entries.append((name, int(size), digest.decode('hex')))
+
+            return Manifest(hash_type, entries, base_dir)
+
+        except Exception:
+            return None
+
+    def names(self):
+        return [name for name, size, digest in self.entries]
+
+    def path(self, name):
+        """ Path of the file with the given name in the manifest
+        """
+        if self.base_dir:
+            return os.path.join(self.base_dir, name)
+
+        return name
+
+    def verify_file(self, name, buff_size=DEFAULT_BUFF_SIZE):
+        """ Verify that the file with the given name in the manifest
+        has the size and digest stored in the manifest
+        """
+        size_digest = self._by_name.get(name)
+        if not size_digest:
+            return False
+
+        filename = self.path(name)
+        if not os.path.isfile(filename):
+            return False
+
+        if os.path.getsize(filename) != size_digest[0]:
+            return False
+
+        with open(filename, 'rb') as fh:
+            hasher = new_hash(self.hash_type)
+            hash_file(fh, [hasher], buff_size=buff_size)
+
+        return hasher.digest() == size_digest[1]
+
+    def verify_files(self, names=None, threads=None,
+                     buff_size=DEFAULT_BUFF_SIZE):
+        """ Verify each file (default: all files) of the manifest,
+        yielding (name, result) in order, verifying files in parallel
+        """
+        if names is None:
+            names = self.names()
+
+        def verify(name):
+            return name, self.verify_file(name, buff_size)
+
+        return _map_threads(verify, names, threads)
+
+
+#=================================================================
+def hash_files(filenames, hash_type, threads=None,
+               buff_size=DEFAULT_BUFF_SIZE):
+    """ Hash each file, yielding (filename, size, digest) in order,
+    hashing files in parallel by a pool of threads (default one per cpu).
+    Raise IOError if a file can not be read
+    """
+    def hash_one(filename):
+        with open(filename, 'rb') as fh:
+            hasher = new_hash(hash_type)
+            size = hash_file(fh, [hasher], buff_size=buff_size)
+
+        return filename, size, hasher.digest()
+
+    return _map_threads(hash_one, filenames, threads)
+
+
+def _map_threads(func, inputs, threads=None):
+    inputs = list(inputs)
+    threads = min(threads or cpu_count(), len(inputs))
+
+    if threads <= 1:
+        for input_ in inputs:
+            yield func(input_)
+        return
+
+    pool = ThreadPool(threads)
+    try:
+        for res in pool.imap(func, inputs):
+            yield res
+
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
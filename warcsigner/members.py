@@ -0,0 +1,147 @@
+import zlib
+
+from hashing import new_hash
+
+
+# max amount of decompressed data produced per decompress() call
+DEFAULT_MAX_OUT = 1024 * 1024
+
+
+#=================================================================
+class MemberScanner(object):
+    """
+    Incrementally find the gzip member boundaries of a stream,
+    by decompressing the data passed to update(), so that a scanner
+    may be used as one of the hashers in hash_file()/hash_stream()
+
+    If hash_type is set, a digest of the (compressed) bytes of each
+    member is also computed.
+
+    Complete members are added to members as (offset, length, digest)
+    If the data is not valid gzip, error is set to the offset of the
+    invalid member, and reason to the error, and no further data
+    is scanned.
+    """
+    def __init__(self, hash_type=None, max_out=DEFAULT_MAX_OUT):
+        self.hash_type = hash_type
+        self.max_out = max_out
+
+        self.members = []
+        self.error = None
+        self.reason = None
+
+        self.offset = 0
+        self.length = 0
+
+        self._decomp = None
+        self._hasher = None
+
+    def update(self, buff):
+        if self.error is not None:
+            return
+
+        if isinstance(buff, memoryview):
+            buff = buff.tobytes()
+
+        start = 0
+
+        while start < len(buff):
+            if not self._decomp:
+                self._decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                if self.hash_type:
+                    self._hasher = new_hash(self.hash_type)
+
+            try:
+                used = self._decompress(buffer(buff, start))
+            except zlib.error as e:
+                self.error = self.offset
+                self.reason = str(e)
+                return
+
+            if self._hasher and used:
+                self._hasher.update(buffer(buff, start, used))
+
+            self.length += used
+            start += used
+
+            # any unused data belongs to the next member
+            if start < len(buff):
+                self._end_member()
+
+    def close(self):
+        """
+        Complete the last member at end of stream,
+        return True if the whole stream was valid gzip
+        """
+        if self.error is None and self._decomp:
+            if not _is_eof(self._decomp):
+                self.error = self.offset
+                self.reason = 'Incomplete gzip member'
+            else:
+                self._end_member()
+
+        return self.error is None
+
+    def flush(self):
+        """
+        Complete the current member, if all of it has been passed
+        to update(), eg. at the end of a batch of the stream.
+        Return True if no member is incomplete
+        """
+        if self.error is None and self._decomp and _is_eof(self._decomp):
+            self._end_member()
+
+        return self._decomp is None
+
+    def _decompress(self, buff):
+        decomp = self._decomp
+
+        data = decomp.decompress(buff, self.max_out)
+        self.member_data(data)
+
+        # unconsumed_tail may not be cleared at end of stream
+        while decomp.unconsumed_tail and not decomp.unused_data:
+            data = decomp.decompress(decomp.unconsumed_tail, self.max_out)
+            self.member_data(data)
+
+        return len(buff) - len(decomp.unused_data)
+
+    def _end_member(self):
+        digest = self._hasher.digest() if self._hasher else None
+
+        self.members.append((self.offset, self.length, digest))
+        self.member_end(self.offset, self.length, digest)
+
+        self.offset += self.length
+        self.length = 0
+        self._decomp = None
+        self._hasher = None
+
+    def member_data(self, data):
+        """ Called with decompressed data of the current member,
+        may be overridden by subclasses
+        """
+
+    def member_end(self, offset, length, digest):
+        """ Called when a member is complete, may be overridden
+        by subclasses
+        """
+
+
+#=================================================================
+def _is_eof(decomp):
+    """
+    Return true if decompressor reached end of its gzip member.
+    When not available as decomp.eof, check if another byte
+    would be left over as unused data
+    """
+    if hasattr(decomp, 'eof'):  # pragma: no cover
+        return decomp.eof
+
+    decomp = decomp.copy()
+    try:
+        decomp.decompress('\000')
+    except zlib.error:  # pragma: no cover
+        return False
+
+    return decomp.unused_data != ''
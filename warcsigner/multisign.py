@@ -0,0 +1,172 @@
+import os
+
+from gzipmeta import write_metadata, read_metadata, size_of_header
+from gzipmeta import read_tail_size
+from hashing import HASH_METHODS
+from warcsigner import RSASigner, MultiSignatureMetadata, DEFAULT_HASH_TYPE
+
+
+#=================================================================
+class MultiSigner(object):
+    """
+    Sign or verify with several keys at once, eg. of different parties,
+    hashing the data only once, however many keys are used.
+
+    All signatures are of the same digest, stored together as
+    MultiSignatureMetadata, so that no signature covers another, and
+    each key can also be verified alone, by RSASigner.verify()
+
+    private_key_files are the keys to sign with, public_key_files
+    the keys to verify. When verifying, required is the minimum number
+    of keys whose signatures must be verified (default: all keys).
+    Any additional args are passed to the RSASigner of each key, the
+    first of which hashes the data
+    """
+    def __init__(self, private_key_files=None, public_key_files=None,
+                 required=None, **kwargs):
+        self.stats = kwargs.get('stats')
+        self.required = required
+
+        private_key_files = private_key_files or []
+        public_key_files = public_key_files or []
+
+        if private_key_files and public_key_files:
+            raise ValueError('Only private or public keys may be given')
+
+        self.signers = [RSASigner(private_key_file=key_file, **kwargs)
+                        for key_file in private_key_files]
+
+        self.signers += [RSASigner(public_key_file=key_file, **kwargs)
+                         for key_file in public_key_files]
+
+        if not self.signers:
+            raise ValueError('No keys')
+
+    def sign(self, file_, hash_type=DEFAULT_HASH_TYPE, tree=False):
+        """ Sign a file or stream with all keys, see sign_stream()
+        """
+        if hasattr(file_, 'read'):
+            return self.sign_stream(file_, hash_type, tree)
+
+        if not os.path.isfile(file_):
+            return False
+
+        with open(file_, 'a+') as fh:
+            return self.sign_stream(fh, hash_type, tree)
+
+    def sign_stream(self, fh, hash_type, tree=False):
+        """ Sign a seekable stream, appending the signatures of all keys.
+        If tree is set, the root of a hash tree is signed instead
+        """
+        signer = self.signers[0]
+        chunk_size = signer.chunk_size if tree else None
+
+        fh.seek(0, 2)
+        digest = signer.hash_data(fh, hash_type, fh.tell(), chunk_size)
+
+        signatures = []
+        for signer in self.signers:
+            with signer._timer('rsa_time'):
+                signature = signer.backend.sign_hash(digest, hash_type)
+
+            signatures.append((signer.key_id, signature))
+
+        write_metadata(fh, MultiSignatureMetadata(signatures,
+                                                  hash_type=hash_type,
+                                                  chunk_size=chunk_size))
+        fh.flush()
+        return True
+
+    def read_signatures(self, fh):
+        """ Return (sig_header, metadata) of the MultiSignatureMetadata
+        at the end of seekable stream fh, or (0, None) if not found
+        """
+        size = read_tail_size(fh)
+        if not size:
+            return 0, None
+
+        rsa_meta = MultiSignatureMetadata(size=size)
+        sig_header = size_of_header(rsa_meta)
+
+        try:
+            fh.seek(-sig_header, 2)
+        except IOError:
+            return 0, None
+
+        if not read_metadata(fh, rsa_meta):
+            return 0, None
+
+        return sig_header, rsa_meta
+
+    def verify(self, file_, remove=False, quick=False, checker=None):
+        """ Verify a file or stream, return True if the signatures
+        of at least the required number of keys are verified.
+        All data is always verified, quick is not supported
+        """
+        return len(self.identify(file_, remove, checker)) >= self._required()
+
+    def identify(self, file_, remove=False, checker=None):
+        """ Verify a file or seekable stream, returning the fingerprints
+        of the keys whose signatures are verified. If set, checker is
+        passed the data, see RSASigner.verify()
+        """
+        try:
+            if hasattr(file_, 'read'):
+                return self.identify_stream(file_, remove, checker)
+
+            if not os.path.isfile(file_):
+                return []
+
+            mod = 'r' if not remove else 'a+'
+
+            with open(file_, mod) as fh:
+                return self.identify_stream(fh, remove, checker)
+        finally:
+            if checker:
+                checker.close()
+
+    def identify_stream(self, fh, remove=False, checker=None):
+        """ Verify the signatures of all keys, hashing the data once.
+        If remove is set, the signatures are removed if at least the
+        required number of keys are verified
+        """
+        sig_header, rsa_meta = self.read_signatures(fh)
+        if not rsa_meta or rsa_meta.hash_type not in HASH_METHODS:
+            return []
+
+        signed = [(signer, rsa_meta.find_signature(signer.key_id))
+                  for signer in self.signers]
+
+        signed = [(signer, signature) for signer, signature in signed
+                  if signature]
+
+        if len(signed) < self._required():
+            return []
+
+        fh.seek(0, 2)
+        total_len = fh.tell() - sig_header
+
+        digest = self.signers[0].hash_data(fh, rsa_meta.hash_type,
+                                           total_len, rsa_meta.chunk_size,
+                                           checker)
+
+        if checker and not checker.close():
+            return []
+
+        verified = []
+        for signer, signature in signed:
+            with signer._timer('rsa_time'):
+                if signer.backend.verify_hash(signature, digest,
+                                              rsa_meta.hash_type):
+                    verified.append(signer.key_id)
+
+        if remove and len(verified) >= self._required():
+            fh.truncate(total_len)
+
+        return verified
+
+    def _required(self):
+        if self.required is None:
+            return len(self.signers)
+
+        return max(self.required, 1)
@@ -0,0 +1,90 @@
+import tarfile
+
+from warcsigner import LimitReader
+
+
+# header line before each member of a framed stream
+FRAME_HEADER = '%d %s\n'
+
+# maximum length of a header line, including the name
+MAX_FRAME_HEADER = 4096
+
+
+#=================================================================
+def verify_tar(signer, fh, hash_type=None):
+    """
+    Verify each regular file of a tar stream, yielding (name, result)
+    for each, in a single sequential pass, without seeking or storing
+    any member. fh may be a pipe, and may be compressed.
+
+    Each member is verified as a stream of known size, see
+    RSASigner.verify_stream_data(), reading through one buffer at a time.
+    Raise tarfile.TarError if fh is not a valid tar stream
+    """
+    tar = tarfile.open(fileobj=fh, mode='r|*')
+    try:
+        for member in tar:
+            if not member.isfile():
+                continue
+
+            member_fh = tar.extractfile(member)
+            result = signer.verify_stream_data(member_fh, member.size,
+                                               hash_type)
+
+            # any rest of the member is skipped by the next header read
+            yield member.name, result
+    finally:
+        tar.close()
+
+
+#=================================================================
+def write_frame(out, name, size):
+    r"""
+    Write the header of a member of a framed stream, to be followed by
+    exactly size bytes of data. A framed stream is a concatenation
+    of members, each as a header line of its size and name, and its data
+
+    >>> from io import BytesIO
+    >>> buff = BytesIO()
+    >>> write_frame(buff, 'a.warc.gz', 3)
+    >>> buff.getvalue()
+    '3 a.warc.gz\n'
+    """
+    if '\n' in name:
+        raise ValueError('Invalid name: ' + repr(name))
+
+    out.write(FRAME_HEADER % (size, name))
+
+
+def verify_framed(signer, fh, hash_type=None):
+    """
+    Verify each member of a framed stream, see write_frame(), yielding
+    (name, result) for each, in a single sequential pass, as verify_tar().
+    Raise ValueError if a header is not valid. A truncated last member
+    is not verified, and ends the stream
+    """
+    while True:
+        line = fh.readline(MAX_FRAME_HEADER)
+        if not line:
+            return
+
+        try:
+            assert line.endswith('\n')
+            size, name = line[:-1].split(' ', 1)
+            size = int(size)
+            assert size >= 0
+        except (AssertionError, ValueError):
+            raise ValueError('Invalid frame header: ' + repr(line[:100]))
+
+        member_fh = LimitReader(fh, size)
+        result = signer.verify_stream_data(member_fh, size, hash_type)
+
+        # skip any rest of the member, eg. if not signed
+        while member_fh.read(signer.buff_size):
+            pass
+
+        if member_fh.limit > 0:
+            yield name, False
+            return
+
+        yield name, result
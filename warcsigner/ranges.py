@@ -0,0 +1,178 @@
+import errno
+import os
+
+from hashing import DEFAULT_BUFF_SIZE
+
+try:
+    from os import sendfile
+except ImportError:  # pragma: no cover
+    try:
+        # pysendfile, on python 2
+        from sendfile import sendfile
+    except ImportError:
+        sendfile = None
+
+copy_file_range = getattr(os, 'copy_file_range', None)
+
+# errors for which a zero-copy send is not possible between two fds
+_NOT_SUPPORTED = (errno.EINVAL, errno.ENOSYS, errno.EBADF, errno.EXDEV,
+                  errno.ENOTSUP, errno.EOPNOTSUPP)
+
+
+#=================================================================
+class SignedRanges(object):
+    """
+    Serve byte ranges of the signed data of a file, never including the
+    signature. The length of the signed data is found once, when opened,
+    as when verifying, see RSASigner.get_signed_length().
+    A file which is not signed is served whole, with signed set to False
+
+    Ranges are clamped to the signed data, and sent without copying
+    through python where possible, see send_range()
+    """
+    def __init__(self, signer, filename, buff_size=None):
+        self.fh = open(filename, 'rb')
+        self.buff_size = buff_size or signer.buff_size
+
+        length = signer.get_signed_length(self.fh)
+
+        self.signed = length is not None
+        if not self.signed:
+            length = os.fstat(self.fh.fileno()).st_size
+
+        self.length = length
+
+    def clamp(self, offset=0, length=None):
+        """ Return (offset, length) of a range, clamped to the signed data
+        """
+        offset = min(max(offset, 0), self.length)
+
+        if length is None or offset + length > self.length:
+            length = self.length - offset
+
+        return offset, max(length, 0)
+
+    def send(self, out, offset=0, length=None):
+        """ Send a range to out, a socket or writable file,
+        return the number of bytes sent
+        """
+        offset, length = self.clamp(offset, length)
+        return send_range(self.fh, out, offset, length, self.buff_size)
+
+    def read(self, offset=0, length=None):
+        """ Return a range as a string
+        """
+        return ''.join(self.iter_range(offset, length))
+
+    def iter_range(self, offset=0, length=None):
+        """ Yield the data of a range, in buff_size chunks,
+        eg. for a WSGI response
+        """
+        offset, length = self.clamp(offset, length)
+
+        while length > 0:
+            self.fh.seek(offset)
+            buff = self.fh.read(min(length, self.buff_size))
+            if not buff:
+                break
+
+            offset += len(buff)
+            length -= len(buff)
+            yield buff
+
+    def close(self):
+        self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+#=================================================================
+def send_range(in_fh, out, offset, length, buff_size=DEFAULT_BUFF_SIZE):
+    """
+    Copy length bytes at offset of file in_fh to out, a socket or file,
+    return the number of bytes copied.
+
+    If both have file descriptors, the data is copied by the kernel with
+    sendfile() (or copy_file_range() between files) if available, on
+    python 3 or with pysendfile. Otherwise, or if not supported for
+    these files, data is read into a single buff_size buffer and written
+    """
+    sent = 0
+
+    in_fd = _fileno(in_fh)
+    out_fd = _fileno(out)
+
+    if in_fd is not None and out_fd is not None:
+        # any buffered data must be written first
+        if hasattr(out, 'flush'):
+            out.flush()
+
+        for func in (copy_file_range, sendfile):
+            if not func:
+                continue
+
+            try:
+                sent += _copy_fds(func, out_fd, in_fd,
+                                  offset + sent, length - sent)
+                break
+            except (OSError, IOError) as e:
+                if e.errno not in _NOT_SUPPORTED:
+                    raise
+
+                # continue after any partial copy
+                sent += getattr(e, 'sent', 0)
+
+    if sent < length:
+        sent += _copy_buffered(in_fh, out, offset + sent, length - sent,
+                               buff_size)
+
+    return sent
+
+
+def _copy_fds(func, out_fd, in_fd, offset, length):
+    sent = 0
+    try:
+        while sent < length:
+            if func is copy_file_range:
+                count = func(in_fd, out_fd, length - sent, offset + sent)
+            else:
+                count = func(out_fd, in_fd, offset + sent, length - sent)
+
+            if not count:
+                break
+
+            sent += count
+    except (OSError, IOError) as e:
+        e.sent = sent
+        raise
+
+    return sent
+
+
+def _copy_buffered(in_fh, out, offset, length, buff_size):
+    write = getattr(out, 'sendall', None) or out.write
+    view = memoryview(bytearray(min(buff_size, length) or 1))
+    sent = 0
+
+    in_fh.seek(offset)
+
+    while sent < length:
+        count = in_fh.readinto(view[:min(len(view), length - sent)])
+        if not count:
+            break
+
+        write(view[:count])
+        sent += count
+
+    return sent
+
+
+def _fileno(fh):
+    try:
+        return fh.fileno()
+    except (AttributeError, IOError, ValueError, OSError):
+        return None
@@ -0,0 +1,107 @@
+import gzip
+
+from io import BytesIO
+
+from hashing import new_hash, hash_stream, DEFAULT_BUFF_SIZE
+
+
+RECORD_INDEX_EXT = '.sigidx'
+
+INDEX_HEADER = 'warcsigner-record-index'
+
+
+#=================================================================
+class RecordIndex(object):
+    """
+    Index of the digest of each gzip member (WARC record) of a file,
+    which allows a single record to be verified by its offset and length
+
+    The index is stored as gzip-compressed text, a header line followed by
+    one line per record:
+
+    warcsigner-record-index <hash type> <total length> <hex file digest>
+    <offset> <length> <hex digest>
+    ...
+
+    The file digest is the digest signed by the signature of the file
+    itself (or the root of its hash tree), and the total length the
+    length of its signed data, binding the index to that file.
+
+    The index file is itself signed, like any gzip file, see
+    RSASigner.sign_record_index()
+
+    >>> index = RecordIndex('SHA-1', 10, [(0, 4, 'ABC'), (4, 6, 'XYZ')],
+    ...                     'DEF')
+    >>> buff = BytesIO()
+    >>> index.write(buff)
+    >>> index = RecordIndex.load(BytesIO(buff.getvalue()))
+    >>> index.hash_type, index.total_len, index.records, index.digest
+    ('SHA-1', 10, [(0, 4, 'ABC'), (4, 6, 'XYZ')], 'DEF')
+
+    >>> RecordIndex.load(BytesIO('not an index'))
+    """
+    def __init__(self, hash_type, total_len, records, digest):
+        self.hash_type = hash_type
+        self.total_len = total_len
+        self.records = records
+        self.digest = digest
+
+        self._by_offset = dict((offset, (length, digest))
+                               for offset, length, digest in records)
+
+    def write(self, fh):
+        buff = BytesIO()
+        buff.write('%s %s %d %s\n' % (INDEX_HEADER,
+                                      self.hash_type,
+                                      self.total_len,
+                                      self.digest.encode('hex')))
+
+        for offset, length, digest in self.records:
+            buff.write('%d %d %s\n' % (offset, length, digest.encode('hex')))
+
+        gz = gzip.GzipFile(fileobj=fh, mode='wb')
+        gz.write(buff.getvalue())
+        gz.close()
+
+    @staticmethod
+    def load(fh):
+        """ Load index from stream, return None if not a valid index
+        """
+        try:
+            lines = gzip.GzipFile(fileobj=fh).read().splitlines()
+
+            header, hash_type, total_len, file_digest = lines[0].split(' ')
+            assert header == INDEX_HEADER
+
+            records = []
+            for line in lines[1:]:
+                offset, length, digest = line.split(' ')
+                records.append((int(offset), int(length),
+                                digest.decode('hex')))
+
+            return RecordIndex(hash_type, int(total_len), records,
+                               file_digest.decode('hex'))
+
+        except Exception:
+            return None
+
+    def verify_record(self, fh, offset, length, total_len,
+                      buff_size=DEFAULT_BUFF_SIZE):
+        """
+        Verify a single record at offset and length of fh, whose signed
+        data is total_len bytes, only the record itself is read
+        """
+        if total_len != self.total_len:
+            return False
+
+        length_digest = self._by_offset.get(offset)
+        if not length_digest or length_digest[0] != length:
+            return False
+
+        hasher = new_hash(self.hash_type)
+
+        fh.seek(offset)
+        if hash_stream(fh, [hasher], length, buff_size) != length:
+            return False
+
+        return hasher.digest() == length_digest[1]
@@ -0,0 +1,192 @@
+import fnmatch
+import json
+import os
+import sys
+
+from argparse import ArgumentParser
+from io import BytesIO
+from multiprocessing.pool import ThreadPool
+
+from gzipmeta import find_metadata, read_tail, DEFAULT_TAIL_SIZE
+from warcsigner import SignedInfoMetadata, MultiSignatureMetadata
+from warcsigner import KEY_ID_LEN
+
+try:
+    from scandir import walk
+except ImportError:  # pragma: no cover
+    # uses scandir on python 3.5+
+    from os import walk
+
+
+# metadata ids of the signatures, see warcsigner
+SIGNATURE_IDS = ('RS', 'RT', 'RC', 'RK', 'ED', 'SI', 'MS')
+
+DEFAULT_THREADS = 32
+
+
+#=================================================================
+class TailScanner(object):
+    """
+    Find which files are signed, reading only the tail of each file,
+    without verifying the signatures.
+
+    Files are read with one positional read each, of the last tail_size
+    bytes, see gzipmeta.read_tail(), by a pool of threads, as reads of
+    many files are mostly waiting for the (network) filesystem.
+
+    If a Keyring is given, the key of each signature is also found,
+    see Keyring.find_signer(). Otherwise, only key ids stored with
+    the signature (key_id=True) are reported
+    """
+    def __init__(self, keyring=None, threads=DEFAULT_THREADS,
+                 tail_size=DEFAULT_TAIL_SIZE):
+        self.keyring = keyring
+        self.threads = threads
+        self.tail_size = tail_size
+
+    def scan(self, paths, pattern=None):
+        """ Scan files and directory trees, yielding the result of
+        scan_file() for each file, in order of completion
+        """
+        files = iter_files(paths, pattern)
+
+        if self.threads <= 1:
+            for filename in files:
+                yield self.scan_file(filename)
+            return
+
+        pool = ThreadPool(self.threads)
+        try:
+            for result in pool.imap_unordered(self.scan_file, files):
+                yield result
+
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def scan_file(self, filename):
+        """ Return a dict of the file name, size, whether it is signed,
+        and if signed, the signature metadata type and key id, if known.
+        For signatures with info, also the signed length and timestamp,
+        and for signatures of several keys, the key_ids of all keys
+        """
+        result = dict(file=filename, signed=False)
+
+        try:
+            with open(filename, 'rb') as fh:
+                size = os.fstat(fh.fileno()).st_size
+
+                # a checkpoint larger than the tail is read again whole
+                tail = read_tail(fh, self.tail_size).getvalue()
+
+            metadata = find_metadata(tail)
+
+        except (IOError, OSError) as e:
+            result['error'] = str(e)
+            return result
+
+        result['size'] = size
+
+        if not metadata or metadata[0] not in SIGNATURE_IDS:
+            return result
+
+        meta_id, data = metadata
+
+        result['signed'] = True
+        result['type'] = meta_id
+        result['key_id'] = None
+
+        if meta_id == 'RK':
+            result['key_id'] = data[:KEY_ID_LEN / 2].encode('hex')
+
+        elif meta_id == 'SI':
+            info = SignedInfoMetadata(size=len(data))
+            try:
+                info.read(BytesIO(data))
+            except Exception:
+                info = None
+
+            if info:
+                result['key_id'] = info.key_id
+                result['signed_length'] = info.length
+                result['timestamp'] = info.timestamp
+
+        elif meta_id == 'MS':
+            multi = MultiSignatureMetadata(size=len(data))
+            try:
+                multi.read(BytesIO(data))
+                result['key_ids'] = [key_id for key_id, signature
+                                     in multi.signatures]
+            except Exception:
+                pass
+
+        if self.keyring:
+            signer = self.keyring.find_signer(BytesIO(tail))
+            if signer:
+                result['key_id'] = signer.key_id
+
+        return result
+
+
+#=================================================================
+def iter_files(paths, pattern=None):
+    """ Yield all files of paths, recursively for directories, only
+    those with names matching the glob pattern, if any
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+
+        for root, dirs, files in walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if not pattern or fnmatch.fnmatch(name, pattern):
+                    yield os.path.join(root, name)
+
+
+#=================================================================
+def scan_cli(args=None):
+    parser = ArgumentParser(description='find signed and unsigned warcs, ' +
+                                        'reading only the end of each file')
+
+    parser.add_argument('inputs', nargs='+',
+                        help='files or directories to scan recursively')
+
+    parser.add_argument('-p', '--pattern',
+                        help='only scan files matching a glob pattern, ' +
+                             'eg. "*.warc.gz"')
+
+    parser.add_argument('-k', '--keys',
+                        help='a public key file, or directory of *.pem ' +
+                             'public keys, to find the key of each signature')
+
+    parser.add_argument('-t', '--threads', type=int, default=DEFAULT_THREADS,
+                        help='number of concurrent reads ' +
+                             '(default: %(default)s)')
+
+    parser.add_argument('-u', '--unsigned', action='store_true',
+                        help='only output unsigned files')
+
+    cmd = parser.parse_args(args=args)
+
+    keyring = None
+    if cmd.keys:
+        from keyring import Keyring
+        keyring = Keyring([cmd.keys])
+
+    scanner = TailScanner(keyring, cmd.threads)
+
+    errs = False
+
+    for result in scanner.scan(cmd.inputs, cmd.pattern):
+        if not result['signed']:
+            errs = True
+        elif cmd.unsigned:
+            continue
+
+        print json.dumps(result, sort_keys=True)
+        sys.stdout.flush()
+
+    return 0 if not errs else 1
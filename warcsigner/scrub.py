@@ -0,0 +1,408 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from argparse import ArgumentParser
+from multiprocessing.pool import ThreadPool
+
+from warcsigner import RSASigner, _parse_inputs
+from hashing import IO_MODES, SEQUENTIAL_IO
+from scanner import iter_files
+from stats import Stats
+
+
+MB = 1024 * 1024
+
+# bytes hashed between checks of the rate limit
+THROTTLE_INTERVAL = 1024 * 1024
+
+# number of files fetched from the queue at a time
+DEFAULT_BATCH_SIZE = 1000
+
+DEFAULT_INTERVAL = 3600
+
+
+#=================================================================
+class RateLimiter(object):
+    """
+    Limit the rate of reads shared by many threads to bytes_per_sec,
+    as a token bucket allowing bursts of up to burst bytes.
+    consume() sleeps until the bytes read are within the rate
+    """
+    def __init__(self, bytes_per_sec, burst=None):
+        self.rate = float(bytes_per_sec)
+        self.burst = burst or bytes_per_sec
+        self.allowance = self.burst
+        self.last = time.time()
+        self._lock = threading.Lock()
+
+    def consume(self, count):
+        with self._lock:
+            now = time.time()
+            self.allowance = min(self.burst, self.allowance +
+                                             (now - self.last) * self.rate)
+            self.last = now
+            self.allowance -= count
+
+            wait = -self.allowance / self.rate if self.allowance < 0 else 0
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+#=================================================================
+class Scrubber(object):
+    """
+    Re-verify a corpus of signed files in the background, eg. to detect
+    bit rot, with limited I/O and resumable progress.
+
+    Files are added to a persistent queue, an sqlite db, which stores
+    the time and result of the last check of each file. Each scrub pass
+    checks the files due, never checked first, then by time since last
+    checked, and records each result as soon as it is known. The start
+    of a pass is stored too, until it is complete, so an interrupted
+    pass resumes with the files not yet checked.
+
+    - signer_kwargs are the args of the RSASigner, or of signer_cls,
+    eg. a Keyring, of each thread
+    - threads is the number of files verified concurrently
+    - rate, if set, limits the data read by all threads, in bytes/sec
+    - min_age is the time in seconds, before a file is due again
+    - log, if set, is a file to which each result is appended,
+    as a line of JSON
+    """
+    def __init__(self, path, signer_kwargs, signer_cls=None, threads=1,
+                 rate=None, min_age=0, log=None):
+        self.signer_kwargs = signer_kwargs
+        self.signer_cls = signer_cls or RSASigner
+        self.threads = threads
+        self.min_age = min_age
+        self.log = log
+
+        self.limiter = RateLimiter(rate) if rate else None
+
+        self._local = threading.local()
+
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scrub_queue (
+                path TEXT PRIMARY KEY,
+                added REAL,
+                last_checked REAL,
+                last_result INTEGER
+            )""")
+
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS scrub_queue_checked
+            ON scrub_queue (last_checked)""")
+
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scrub_pass (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                start REAL
+            )""")
+
+    def add(self, paths, pattern=None):
+        """ Add files, and all files of directories, to the queue,
+        return the number of files not already queued
+        """
+        count = 0
+        now = time.time()
+
+        self.conn.execute('BEGIN')
+        try:
+            for filename in iter_files(paths, pattern):
+                cursor = self.conn.execute("""
+                    INSERT OR IGNORE INTO scrub_queue (path, added)
+                    VALUES (?, ?)""", (os.path.abspath(filename), now))
+                count += cursor.rowcount
+        finally:
+            self.conn.execute('COMMIT')
+
+        return count
+
+    def remove(self, paths):
+        for path in paths:
+            self.conn.execute('DELETE FROM scrub_queue WHERE path = ?',
+                              (os.path.abspath(path),))
+
+    def due(self, limit=DEFAULT_BATCH_SIZE, before=None):
+        """ Return up to limit files due to be checked, last checked
+        before min_age ago (or before, if earlier), by priority
+        """
+        cutoff = time.time() - self.min_age
+        if before is not None:
+            cutoff = min(cutoff, before)
+
+        rows = self.conn.execute("""
+            SELECT path FROM scrub_queue
+            WHERE last_checked IS NULL OR last_checked <= ?
+            ORDER BY last_checked IS NOT NULL, last_checked, path
+            LIMIT ?""", (cutoff, limit))
+
+        return [row[0] for row in rows]
+
+    def status(self):
+        """ Return a dict of the number of files queued, due,
+        and which failed their last check
+        """
+        files = self.conn.execute('SELECT COUNT(*) FROM scrub_queue')
+        failed = self.conn.execute("""
+            SELECT COUNT(*) FROM scrub_queue WHERE last_result = 0""")
+
+        due = self.conn.execute("""
+            SELECT COUNT(*) FROM scrub_queue
+            WHERE last_checked IS NULL OR last_checked <= ?""",
+            (time.time() - self.min_age,))
+
+        return dict(files=files.fetchone()[0],
+                    failed=failed.fetchone()[0],
+                    due=due.fetchone()[0])
+
+    def pass_start(self):
+        """ Return the start time of the current pass, if interrupted
+        or stopped at its limit, or None
+        """
+        row = self.conn.execute('SELECT start FROM scrub_pass').fetchone()
+        return row[0] if row else None
+
+    def run(self, limit=None, batch_size=DEFAULT_BATCH_SIZE):
+        """ Run one scrub pass, checking all files due (at most limit),
+        yielding the result of each as a dict, in order of completion.
+        Files checked during the pass are not checked again, even if
+        the pass is resumed by a later run(), after being interrupted
+        or stopped at limit
+        """
+        start = self.pass_start()
+        if start is None:
+            start = time.time()
+            self.conn.execute("""
+                INSERT OR REPLACE INTO scrub_pass (id, start)
+                VALUES (0, ?)""", (start,))
+
+        count = 0
+
+        log = open(self.log, 'a') if self.log else None
+
+        pool = None
+        if self.threads > 1:
+            pool = ThreadPool(self.threads)
+
+        try:
+            while limit is None or count < limit:
+                size = batch_size
+                if limit is not None:
+                    size = min(size, limit - count)
+
+                paths = self.due(size, before=start)
+                if not paths:
+                    # pass complete
+                    self.conn.execute('DELETE FROM scrub_pass')
+                    break
+
+                if pool:
+                    results = pool.imap_unordered(self.check_file, paths)
+                else:
+                    results = (self.check_file(path) for path in paths)
+
+                for result in results:
+                    self._record(result, log)
+                    count += 1
+                    yield result
+
+            if pool:
+                pool.close()
+
+        finally:
+            if pool:
+                pool.terminate()
+                pool.join()
+
+            if log:
+                log.close()
+
+    def run_forever(self, interval=DEFAULT_INTERVAL):
+        """ Run scrub passes continuously, waiting interval seconds
+        when no files are due
+        """
+        while True:
+            checked = False
+            for result in self.run():
+                checked = True
+                yield result
+
+            if not checked:
+                time.sleep(interval)
+
+    def check_file(self, path):
+        """ Verify a file, return a dict of the file name, result,
+        time, duration and bytes read. Called by the worker threads
+        """
+        local = self._signer()
+
+        local.stats.reset()
+        local.throttled = 0
+
+        start = time.time()
+
+        if not os.path.isfile(path):
+            return dict(file=path, verified=False, missing=True,
+                        time=start, duration=0, bytes_read=0)
+
+        try:
+            verified = bool(local.signer.verify(path))
+            error = None
+        except (IOError, OSError) as e:
+            verified = False
+            error = str(e)
+
+        self._throttle(local, local.stats.bytes_read)
+
+        result = dict(file=path, verified=verified, time=start,
+                      duration=time.time() - start,
+                      bytes_read=local.stats.bytes_read)
+
+        if error:
+            result['error'] = error
+
+        return result
+
+    def close(self):
+        self.conn.close()
+
+    def _signer(self):
+        local = self._local
+        if hasattr(local, 'signer'):
+            return local
+
+        def progress(bytes_read):
+            self._throttle(local, bytes_read)
+
+        local.stats = Stats(progress, THROTTLE_INTERVAL)
+        local.throttled = 0
+
+        kwargs = dict(self.signer_kwargs, stats=local.stats)
+        local.signer = self.signer_cls(**kwargs)
+        return local
+
+    def _throttle(self, local, bytes_read):
+        if self.limiter and bytes_read > local.throttled:
+            self.limiter.consume(bytes_read - local.throttled)
+
+        local.throttled = bytes_read
+
+    def _record(self, result, log):
+        self.conn.execute("""
+            UPDATE scrub_queue SET last_checked = ?, last_result = ?
+            WHERE path = ?""",
+            (result['time'], int(result['verified']), result['file']))
+
+        if log:
+            log.write(json.dumps(result, sort_keys=True) + '\n')
+            log.flush()
+
+
+#=================================================================
+def scrub_cli(args=None):
+    parser = ArgumentParser(description='re-verify signed warcs in the ' +
+                                        'background, from a resumable queue')
+
+    parser.add_argument('public_key',
+                        help='a public_key.pem file in PEM format, ' +
+                             'or a directory of *.pem public keys')
+
+    parser.add_argument('queue',
+                        help='path of the queue db, created if needed')
+
+    parser.add_argument('inputs', nargs='*',
+                        help='files or directories to add to the queue')
+
+    parser.add_argument('-p', '--pattern',
+                        help='only add files matching a glob pattern, ' +
+                             'eg. "*.warc.gz"')
+
+    parser.add_argument('--rate', type=float,
+                        help='maximum read rate of all files, in MB/s ' +
+                             '(default: unlimited)')
+
+    parser.add_argument('-c', '--concurrency', type=int, default=1,
+                        help='number of files verified concurrently ' +
+                             '(default: %(default)s)')
+
+    parser.add_argument('--io', choices=IO_MODES, default=SEQUENTIAL_IO,
+                        help='how files are read, sequential keeps ' +
+                             'scrubbed files from evicting the page cache ' +
+                             '(default: %(default)s)')
+
+    parser.add_argument('--min-age', type=float, default=0,
+                        help='days before a file is checked again ' +
+                             '(default: %(default)s, once per pass)')
+
+    parser.add_argument('--limit', type=int,
+                        help='check at most this many files')
+
+    parser.add_argument('--log',
+                        help='append each result, as a line of JSON, ' +
+                             'to this file')
+
+    parser.add_argument('--continuous', action='store_true',
+                        help='run passes continuously, waiting for ' +
+                             'files to be due')
+
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help='with --continuous, seconds to wait when ' +
+                             'no files are due (default: %(default)s)')
+
+    parser.add_argument('--status', action='store_true',
+                        help='only output the number of files queued, ' +
+                             'due and failed')
+
+    cmd = _parse_inputs(parser, args)
+
+    signer_kwargs = dict(public_key_file=cmd.public_key, io_mode=cmd.io)
+    signer_cls = None
+
+    if os.path.isdir(cmd.public_key):
+        from keyring import Keyring
+        signer_kwargs = dict(public_key_files=[cmd.public_key],
+                             io_mode=cmd.io)
+        signer_cls = Keyring
+
+    scrubber = Scrubber(cmd.queue, signer_kwargs, signer_cls,
+                        threads=cmd.concurrency,
+                        rate=cmd.rate * MB if cmd.rate else None,
+                        min_age=cmd.min_age * 86400,
+                        log=cmd.log)
+
+    try:
+        if cmd.inputs:
+            scrubber.add(cmd.inputs, cmd.pattern)
+
+        if cmd.status:
+            print json.dumps(scrubber.status(), sort_keys=True)
+            return 0
+
+        if cmd.continuous:
+            results = scrubber.run_forever(cmd.interval)
+        else:
+            results = scrubber.run(cmd.limit)
+
+        errs = False
+        for result in results:
+            if not result['verified']:
+                errs = True
+
+            print json.dumps(result, sort_keys=True)
+            sys.stdout.flush()
+
+    except KeyboardInterrupt:
+        errs = True
+
+    finally:
+        scrubber.close()
+
+    return 0 if not errs else 1
@@ -0,0 +1,158 @@
+import time
+
+
+# default minimum number of bytes between progress callbacks
+DEFAULT_PROGRESS_INTERVAL = 64 * 1024 * 1024
+
+
+#=================================================================
+class Stats(object):
+    """
+    Counters and timers of sign/verify operations, collected when set
+    as RSASigner(stats=...)
+
+    - bytes_read: number of bytes of data hashed
+    - read_time: time reading streams. Memory-mapped files are read
+    while hashing, and tree chunks read by the hashing threads, so for
+    those, reading is included in hash_time
+    - hash_time: time hashing data
+    - rsa_time: time in signature operations of the backend
+    - total_time: time of each whole operation, if timed by the caller
+
+    If set, progress(bytes_read) is called whenever at least
+    progress_interval more bytes have been hashed, eg. for huge files
+
+    >>> stats = Stats()
+    >>> stats.add_bytes(10)
+    >>> with stats.timer('rsa_time'): pass
+    >>> other = Stats(); other.add_bytes(5)
+    >>> stats.add(other)
+    >>> stats.bytes_read
+    15
+    >>> sorted(stats.as_dict().keys())
+    ['bytes_read', 'hash_time', 'read_time', 'rsa_time', 'total_time']
+    """
+    FIELDS = ('bytes_read', 'read_time', 'hash_time', 'rsa_time',
+              'total_time')
+
+    def __init__(self, progress=None,
+                 progress_interval=DEFAULT_PROGRESS_INTERVAL):
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.reset()
+
+    def reset(self):
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+        self._next_progress = self.progress_interval
+
+    def add_bytes(self, count):
+        self.bytes_read += count
+
+        if self.progress and self.bytes_read >= self._next_progress:
+            self.progress(self.bytes_read)
+            self._next_progress = self.bytes_read + self.progress_interval
+
+    def add_time(self, field, elapsed):
+        setattr(self, field, getattr(self, field) + elapsed)
+
+    def timer(self, field):
+        """ Context manager adding its elapsed time to field
+        """
+        return _Timer(self, field)
+
+    def hasher(self, hashers):
+        """ A single hasher updating each of hashers, counting
+        bytes and hash time
+        """
+        return _StatsHasher(self, hashers)
+
+    def reader(self, fh):
+        """ A wrapper of stream fh, timing its reads
+        """
+        return _StatsReader(self, fh)
+
+    def add(self, other):
+        """ Add counters and timers of other Stats, eg. to aggregate
+        """
+        for field in self.FIELDS:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+    def as_dict(self):
+        return dict((field, getattr(self, field)) for field in self.FIELDS)
+
+    @staticmethod
+    def from_dict(values):
+        stats = Stats()
+        for field in Stats.FIELDS:
+            setattr(stats, field, values.get(field, 0))
+
+        return stats
+
+    def __getstate__(self):
+        # progress callback is not passed to worker processes
+        state = self.__dict__.copy()
+        state['progress'] = None
+        return state
+
+
+#=================================================================
+class _Timer(object):
+    def __init__(self, stats, field):
+        self.stats = stats
+        self.field = field
+
+    def __enter__(self):
+        self.start = time.time()
+
+    def __exit__(self, *exc_info):
+        self.stats.add_time(self.field, time.time() - self.start)
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+#=================================================================
+class _StatsHasher(object):
+    def __init__(self, stats, hashers):
+        self.stats = stats
+        self.hashers = hashers
+
+    def update(self, buff):
+        start = time.time()
+        for hasher in self.hashers:
+            hasher.update(buff)
+
+        self.stats.add_time('hash_time', time.time() - start)
+        self.stats.add_bytes(len(buff))
+
+
+#=================================================================
+class _StatsReader(object):
+    def __init__(self, stats, fh):
+        self.stats = stats
+        self.fh = fh
+
+        # only if supported by the stream, see hashing.hash_stream()
+        if hasattr(fh, 'readinto'):
+            self.readinto = self._readinto
+
+    def read(self, *args):
+        with self.stats.timer('read_time'):
+            return self.fh.read(*args)
+
+    def _readinto(self, buff):
+        with self.stats.timer('read_time'):
+            return self.fh.readinto(buff)
+
+    def __getattr__(self, name):
+        return getattr(self.fh, name)
@@ -0,0 +1,256 @@
+import mmap
+import os
+
+from itertools import izip
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+from hashing import new_hash, hash_stream, is_regular_file, DEFAULT_BUFF_SIZE
+
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# prefixes to distinguish leaf and node hashes, as in RFC 6962
+LEAF_PREFIX = '\000'
+NODE_PREFIX = '\001'
+
+
+#=================================================================
+def leaf_hash(hash_type, buff):
+    hasher = new_hash(hash_type)
+    hasher.update(LEAF_PREFIX)
+    hasher.update(buff)
+    return hasher.digest()
+
+
+def node_hash(hash_type, left, right):
+    hasher = new_hash(hash_type)
+    hasher.update(NODE_PREFIX)
+    hasher.update(left)
+    hasher.update(right)
+    return hasher.digest()
+
+
+#=================================================================
+class HashTree(object):
+    """
+    A Merkle tree (RFC 6962 Merkle Tree Hash) built by adding leaf
+    digests in order. Only the roots of the complete subtrees (peaks),
+    one per set bit of count, are kept.
+
+    >>> tree = HashTree('SHA-1')
+    >>> tree.root() == new_hash('SHA-1').digest()
+    True
+
+    >>> a, b, c = [leaf_hash('SHA-1', x) for x in 'abc']
+    >>> tree.add(a); tree.add(b)
+    >>> tree.root() == node_hash('SHA-1', a, b)
+    True
+
+    >>> tree.add(c)
+    >>> len(tree.peaks), tree.count
+    (2, 3)
+    >>> tree.root() == node_hash('SHA-1', node_hash('SHA-1', a, b), c)
+    True
+    """
+    def __init__(self, hash_type, count=0, peaks=None):
+        self.hash_type = hash_type
+        self.count = count
+        self.peaks = peaks or []
+
+    def add(self, digest):
+        self.peaks.append(digest)
+        self.count += 1
+
+        # merge equal sized subtrees, once per trailing zero bit of count
+        count = self.count
+        while count % 2 == 0:
+            right = self.peaks.pop()
+            left = self.peaks.pop()
+            self.peaks.append(node_hash(self.hash_type, left, right))
+            count /= 2
+
+    def root(self, last=None):
+        """
+        Return the root of the tree. If last is set, it is used as
+        an additional last leaf, without adding it to the tree
+        """
+        peaks = self.peaks
+        if last is not None:
+            peaks = peaks + [last]
+
+        if not peaks:
+            return new_hash(self.hash_type).digest()
+
+        root = peaks[-1]
+        for peak in reversed(peaks[:-1]):
+            root = node_hash(self.hash_type, peak, root)
+
+        return root
+
+
+#=================================================================
+class TreeHasher(object):
+    """
+    A hashlib-like object, whose digest() is the root of the HashTree
+    over chunk_size chunks of all the data passed to update()
+
+    >>> hasher = TreeHasher('SHA-1', 2)
+    >>> hasher.update('abcd'); hasher.update('e')
+    >>> hasher.digest() == hash_tree('SHA-1', 'abcde', 2)
+    True
+    """
+    def __init__(self, hash_type, chunk_size, tree=None):
+        if chunk_size <= 0:
+            raise ValueError('Invalid chunk size: %s' % chunk_size)
+
+        self.chunk_size = chunk_size
+        self.tree = tree or HashTree(hash_type)
+
+        self._leaf = None
+        self._leaf_len = 0
+
+    def update(self, buff):
+        start = 0
+        total = len(buff)
+
+        while start < total:
+            if not self._leaf:
+                self._leaf = new_hash(self.tree.hash_type)
+                self._leaf.update(LEAF_PREFIX)
+                self._leaf_len = 0
+
+            size = min(total - start, self.chunk_size - self._leaf_len)
+
+            if isinstance(buff, memoryview):
+                self._leaf.update(buff[start:start + size])
+            else:
+                self._leaf.update(buffer(buff, start, size))
+
+            self._leaf_len += size
+            start += size
+
+            if self._leaf_len == self.chunk_size:
+                self.tree.add(self._leaf.digest())
+                self._leaf = None
+
+    def last_leaf(self):
+        """ Return digest of the last incomplete chunk, if any
+        """
+        return self._leaf.digest() if self._leaf else None
+
+    def digest(self):
+        return self.tree.root(self.last_leaf())
+
+
+#=================================================================
+def hash_tree(hash_type, buff, chunk_size):
+    """ Root of the hash tree over chunk_size chunks of a string
+    """
+    tree = HashTree(hash_type)
+    for offset in xrange(0, len(buff), chunk_size):
+        tree.add(leaf_hash(hash_type, buffer(buff, offset, chunk_size)))
+
+    return tree.root()
+
+
+#=================================================================
+def hash_tree_file(fh, hash_type, length=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE,
+                   threads=None,
+                   buff_size=DEFAULT_BUFF_SIZE):
+    """
+    Return root of the hash tree over chunk_size chunks of the first
+    length bytes (or all bytes if length is None) of seekable stream fh.
+    See hash_tree_chunks()
+    """
+    tree = HashTree(hash_type)
+    last = hash_tree_chunks(fh, tree, chunk_size, 0, length,
+                            threads, buff_size)
+    return tree.root(last)
+
+
+#=================================================================
+def hash_tree_chunks(fh, tree, chunk_size, start=0, length=None,
+                     threads=None,
+                     buff_size=DEFAULT_BUFF_SIZE,
+                     progress=None):
+    """
+    Add the complete chunk_size chunks of seekable stream fh, from
+    offset start (a chunk boundary) up to length (or to the end if
+    length is None) as leaves of tree.
+    Return the leaf digest of the last incomplete chunk, if any,
+    which is not added to the tree.
+
+    Regular files are memory-mapped and the chunks hashed in parallel
+    by a pool of threads (default one per cpu), as hashlib releases
+    the GIL while hashing. Other streams are read and hashed serially.
+    The stream is left positioned at the end of the hashed range.
+
+    If set, progress(count) is called with the number of bytes hashed
+    after each chunk (or read, for streams)
+    """
+    if not is_regular_file(fh):
+        hashers = [TreeHasher(tree.hash_type, chunk_size, tree)]
+        if progress:
+            hashers.append(_ProgressHasher(progress))
+
+        fh.seek(start)
+        if length is not None:
+            length -= start
+
+        hash_stream(fh, hashers, length, buff_size)
+        return hashers[0].last_leaf()
+
+    # ensure any buffered writes are visible to the mapping
+    fh.flush()
+
+    size = os.fstat(fh.fileno()).st_size
+    if length is None or length > size:
+        length = size
+
+    last = None
+
+    if length > start:
+        mm = mmap.mmap(fh.fileno(), length, access=mmap.ACCESS_READ)
+
+        def hash_chunk(offset):
+            return leaf_hash(tree.hash_type, buffer(mm, offset, chunk_size))
+
+        offsets = xrange(start, length, chunk_size)
+        threads = min(threads or cpu_count(), len(offsets))
+
+        if threads > 1:
+            pool = ThreadPool(threads)
+            digests = pool.imap(hash_chunk, offsets)
+        else:
+            pool = None
+            digests = (hash_chunk(offset) for offset in offsets)
+
+        try:
+            for offset, digest in izip(offsets, digests):
+                if offset + chunk_size <= length:
+                    tree.add(digest)
+                else:
+                    last = digest
+
+                if progress:
+                    progress(min(chunk_size, length - offset))
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+            mm.close()
+
+    fh.seek(length)
+    return last
+
+
+#=================================================================
+class _ProgressHasher(object):
+    def __init__(self, progress):
+        self.progress = progress
+
+    def update(self, buff):
+        self.progress(len(buff))
@@ -0,0 +1,439 @@
+from collections import deque
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+from cdx import CdxIndex
+from gzipmeta import MAGIC_HEADER
+from members import MemberScanner
+
+
+# size of the batches of data decompressed by each thread, each cut
+# at the start of a gzip member, or at most MAX_BATCH_SIZE
+DEFAULT_BATCH_SIZE = 1024 * 1024
+MAX_BATCH_SIZE = 8 * 1024 * 1024
+
+# maximum size of the headers of a WARC record
+MAX_HEADER_SIZE = 64 * 1024
+
+HEADER_END = '\r\n\r\n'
+
+_HEADER, _CONTENT, _TRAILER = range(3)
+
+
+#=================================================================
+class WarcRecordParser(object):
+    r"""
+    Incrementally check the framing of the WARC records of decompressed
+    data passed to update(): each record a WARC/<version> line, headers
+    up to a blank line, including a valid Content-Length, the content
+    and a blank line. Raise ValueError if the data is not valid
+
+    If index is set, the WARC-Target-URI and WARC-Date of each record
+    are added to headers, as (uri, date), or None if not present
+
+    >>> parser = WarcRecordParser()
+    >>> parser.update('WARC/1.0\r\nContent-Length: 3\r\n\r\nab')
+    >>> parser.at_boundary()
+    False
+    >>> parser.update('c\r\n\r\n')
+    >>> parser.records, parser.at_boundary()
+    (1, True)
+
+    >>> parser = WarcRecordParser(index=True)
+    >>> parser.update('WARC/1.0\r\nWARC-Date: 2014\r\nContent-Length: 0\r\n')
+    >>> parser.update('\r\n\r\n\r\n'); parser.headers
+    [(None, '2014')]
+
+    >>> parser.update('HTTP/1.0 200 OK\r\n')
+    Traceback (most recent call last):
+    ValueError: Invalid WARC record: 'HTTP/'
+
+    >>> WarcRecordParser().update('WARC/1.0\r\nContent-Length: x\r\n\r\n')
+    Traceback (most recent call last):
+    ValueError: Invalid Content-Length: 'x'
+
+    >>> WarcRecordParser().update('WARC/1.0\r\nContent-Length: 0\r\n\r\nX')
+    Traceback (most recent call last):
+    ValueError: Invalid end of WARC record: 'X'
+    """
+    def __init__(self, index=False):
+        self.records = 0
+        self.headers = [] if index else None
+
+        self._state = _HEADER
+        self._buff = ''
+        self._remaining = 0
+
+    def at_boundary(self):
+        """ Return True if all records passed so far are complete
+        """
+        return self._state == _HEADER and not self._buff
+
+    def update(self, data):
+        pos = 0
+        total = len(data)
+
+        while pos < total:
+            if self._state == _CONTENT:
+                count = min(self._remaining, total - pos)
+                self._remaining -= count
+                pos += count
+
+                if not self._remaining:
+                    self._state = _TRAILER
+
+            elif self._state == _TRAILER:
+                count = len(HEADER_END) - len(self._buff)
+                self._buff += data[pos:pos + count]
+                pos += count
+
+                if not HEADER_END.startswith(self._buff):
+                    raise ValueError('Invalid end of WARC record: ' +
+                                     repr(self._buff))
+
+                if len(self._buff) == len(HEADER_END):
+                    self.records += 1
+                    self._state = _HEADER
+                    self._buff = ''
+
+            else:
+                pos += self._read_header(data, pos)
+
+    def _read_header(self, data, pos):
+        """ Read headers from data at pos, return the number of bytes used
+        """
+        start = len(self._buff)
+
+        self._buff += data[pos:pos + MAX_HEADER_SIZE]
+
+        if not self._buff.startswith('WARC/'[:len(self._buff)]):
+            raise ValueError('Invalid WARC record: ' + repr(self._buff[:5]))
+
+        end = self._buff.find(HEADER_END, max(start - 3, 0))
+        if end < 0:
+            if len(self._buff) > MAX_HEADER_SIZE:
+                raise ValueError('WARC headers too long')
+
+            return len(self._buff) - start
+
+        used = end + len(HEADER_END) - start
+
+        headers = _parse_headers(self._buff[:end])
+
+        self._remaining = _content_length(headers)
+        if self.headers is not None:
+            self.headers.append((headers.get('warc-target-uri'),
+                                 headers.get('warc-date')))
+
+        self._state = _CONTENT if self._remaining else _TRAILER
+        self._buff = ''
+
+        return used
+
+
+def _parse_headers(headers):
+    """ Return a dict of the headers of a record, by lowercase name
+    """
+    fields = {}
+
+    for line in headers.split('\r\n')[1:]:
+        name, sep, value = line.partition(':')
+        if not sep:
+            raise ValueError('Invalid WARC header: ' + repr(line[:100]))
+
+        fields[name.strip().lower()] = value.strip()
+
+    return fields
+
+
+def _content_length(fields):
+    value = fields.get('content-length')
+    if value is None:
+        raise ValueError('No Content-Length')
+
+    try:
+        length = int(value)
+        assert length >= 0
+    except (AssertionError, ValueError):
+        raise ValueError('Invalid Content-Length: ' + repr(value))
+
+    return length
+
+
+#=================================================================
+class WarcMemberScanner(MemberScanner):
+    """
+    MemberScanner which also checks that each gzip member holds complete
+    WARC records, see WarcRecordParser, starting at offset of the stream.
+    The CRC32 and length of each member are checked by zlib.
+
+    records is the number of records of complete members. If index is
+    set, entries are the (uri, date, offset, length) of each record of
+    complete members, with the offset and length of the member
+    """
+    def __init__(self, offset=0, index=False):
+        super(WarcMemberScanner, self).__init__()
+        self.offset = offset
+        self.records = 0
+
+        self.index = index
+        self.entries = [] if index else None
+
+        self._parser = WarcRecordParser(index)
+
+    def update(self, buff):
+        self._checked(super(WarcMemberScanner, self).update, buff)
+
+    def close(self):
+        return self._checked(super(WarcMemberScanner, self).close)
+
+    def flush(self):
+        return self._checked(super(WarcMemberScanner, self).flush)
+
+    def _checked(self, func, *args):
+        """ Call func, setting the error for an invalid WARC record
+        """
+        try:
+            return func(*args)
+        except ValueError as e:
+            self.error = self.offset
+            self.reason = str(e)
+            return False
+
+    def member_data(self, data):
+        self._parser.update(data)
+
+    def member_end(self, offset, length, digest):
+        if not self._parser.at_boundary():
+            raise ValueError('Incomplete WARC record')
+
+        self.records += self._parser.records
+
+        if self.index:
+            self.entries.extend((uri, date, offset, length)
+                                for uri, date in self._parser.headers)
+
+        self._parser = WarcRecordParser(self.index)
+
+
+def _scan_batch(offset, data, scanner=None, index=False):
+    """ Scan a batch of data, from offset of the stream, continuing
+    scanner, if set, or from the start of a member.
+    Return (scanner, complete, members, records, entries) of the batch,
+    where complete is False if the last member continues
+    """
+    if not scanner:
+        scanner = WarcMemberScanner(offset, index)
+
+    scanner.update(data)
+    complete = scanner.flush()
+
+    members = len(scanner.members)
+    records = scanner.records
+    entries = scanner.entries
+
+    del scanner.members[:]
+    scanner.records = 0
+    if index:
+        scanner.entries = []
+
+    return scanner, complete, members, records, entries
+
+
+#=================================================================
+class WarcChecker(object):
+    """
+    Check the gzip members and WARC records of a stream, in the same
+    pass as hashing it, as one of the hashers passed the data, see
+    RSASigner.verify(checker=...)
+
+    The data passed to update() is cut into batches, of about batch_size
+    bytes, each at the first candidate start of a member (gzip magic
+    bytes) after batch_size, or at max_batch_size, and the batches are
+    decompressed by a pool of threads (default one per cpu), checking
+    the CRC32 and length of each member and the framing of its WARC
+    records, see WarcMemberScanner.
+
+    Results are joined in order: a member continuing past the end of
+    a batch, eg. larger than batch_size, or when a batch was cut within
+    a member, is continued in the next batch, so that each member is
+    checked exactly once. Batches queued are bounded by the threads.
+
+    close() returns True if all the data was valid. Otherwise, error is
+    set to the offset of the first invalid member, and reason to the
+    error. members and records are the number of valid members and
+    records checked
+
+    If index is set, entries are the (uri, date, offset, length) of each
+    record, in order, eg. for a CdxIndex, see cdx_index()
+    """
+    def __init__(self, threads=None, batch_size=DEFAULT_BATCH_SIZE,
+                 max_batch_size=MAX_BATCH_SIZE, index=False):
+        self.threads = threads or cpu_count()
+        self.index = index
+        self.entries = [] if index else None
+        self.batch_size = batch_size
+        self.max_batch_size = max(max_batch_size, batch_size)
+
+        self.error = None
+        self.reason = None
+
+        self.members = 0
+        self.records = 0
+
+        self.closed = False
+
+        self._pool = None
+        self._batches = deque()
+
+        # data of the next batch, and its offset in the stream
+        self._pending = []
+        self._pending_len = 0
+        self._offset = 0
+
+        # scanner of a member continuing in the next batch
+        self._scanner = None
+
+    def update(self, buff):
+        if self.error is not None or self.closed:
+            return
+
+        if isinstance(buff, memoryview):
+            buff = buff.tobytes()
+        else:
+            buff = str(buff)
+
+        self._pending.append(buff)
+        self._pending_len += len(buff)
+
+        if self._pending_len >= self.batch_size:
+            self._cut_batches()
+
+        while self._batches and self._join(block=False):
+            pass
+
+        while len(self._batches) > self.threads * 2:
+            self._join(block=True)
+
+    def close(self):
+        """ Check any remaining data, return True if all data was valid
+        """
+        if self.closed:
+            return self.error is None
+
+        try:
+            if self._pending_len and self.error is None:
+                self._add_batch(''.join(self._pending))
+
+            while self._batches and self.error is None:
+                self._join(block=True)
+
+            if self._scanner and self.error is None:
+                if not self._scanner.close():
+                    self._set_error(self._scanner)
+                else:
+                    self.members += len(self._scanner.members)
+                    self.records += self._scanner.records
+                    if self.index:
+                        self.entries.extend(self._scanner.entries)
+
+        finally:
+            self.closed = True
+            self._pending = []
+            self._batches.clear()
+
+            if self._pool:
+                self._pool.terminate()
+                self._pool.join()
+
+        return self.error is None
+
+    def _cut_batches(self):
+        data = ''.join(self._pending)
+
+        while len(data) >= self.batch_size:
+            cut = data.find(MAGIC_HEADER, self.batch_size,
+                            self.max_batch_size + len(MAGIC_HEADER) - 1)
+
+            if cut < 0:
+                if len(data) < self.max_batch_size:
+                    break
+
+                cut = self.max_batch_size
+
+            self._add_batch(data[:cut])
+            data = data[cut:]
+
+        self._pending = [data]
+        self._pending_len = len(data)
+
+    def _add_batch(self, data):
+        """ Queue a batch, decompressed at once if it may start a member
+        """
+        if not self._pool:
+            self._pool = ThreadPool(self.threads)
+
+        offset = self._offset
+        self._offset += len(data)
+
+        result = None
+        if data.startswith(MAGIC_HEADER):
+            result = self._pool.apply_async(_scan_batch,
+                                            (offset, data, None, self.index))
+
+        self._batches.append([offset, data, result, None])
+
+    def _join(self, block):
+        """ Join the result of the first batch, if done or if block
+        is set, return True if joined
+        """
+        batch = self._batches[0]
+        offset, data, result, continued = batch
+
+        # batch decompressed from the start of a member, if not
+        # continuing the member of the last batch
+        if self._scanner or not result:
+            if not continued:
+                continued = self._pool.apply_async(_scan_batch,
+                                                   (offset, data,
+                                                    self._scanner,
+                                                    self.index))
+                batch[3] = continued
+
+            result = continued
+
+        if not block and not result.ready():
+            return False
+
+        scanner, complete, members, records, entries = result.get()
+
+        self._batches.popleft()
+
+        self.members += members
+        self.records += records
+
+        if self.index:
+            self.entries.extend(entries)
+
+        if scanner.error is not None:
+            self._set_error(scanner)
+            self._batches.clear()
+            self._pending = []
+            self._pending_len = 0
+            return True
+
+        self._scanner = scanner if not complete else None
+        return True
+
+    def _set_error(self, scanner):
+        self.error = scanner.error
+        self.reason = scanner.reason
+
+    def cdx_index(self, filename=None):
+        """ Return a CdxIndex of the records, if index is set and all
+        data was valid, with the file name of the WARC, if given
+        """
+        if not self.index or not self.closed or self.error is not None:
+            return None
+
+        return CdxIndex(self.entries, filename)
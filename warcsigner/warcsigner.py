@@ -1,18 +1,47 @@
 from gzipmeta import write_metadata, read_metadata, size_of_header
+from gzipmeta import write16, read16, write64, read64, read_tail_size
+from gzipmeta import pack_fields, unpack_fields, read_tail
+from hashing import new_hash, hash_file, hash_stream, HASH_METHODS
+from hashing import DEFAULT_BUFF_SIZE, SIGN_HASH_TYPES
+from hashing import hash_sequential, is_regular_file
+from hashing import IO_MODES, MMAP_IO, SEQUENTIAL_IO
+from members import MemberScanner
+from warccheck import WarcChecker
+from cdx import CDX_INDEX_EXT, cdx_filename
+from recordindex import RecordIndex, RECORD_INDEX_EXT
+from manifest import Manifest, hash_files
+from treehash import HashTree, TreeHasher, DEFAULT_CHUNK_SIZE
+from treehash import hash_tree_chunks, leaf_hash
+from cache import VerifyCache, file_identity
+from stats import Stats, NULL_TIMER
+from backends import load_backend, BACKENDS, ED25519, ED25519_SIG_SIZE
+from daemon import RemoteBackend, _is_socket
 
-import rsa
 import math
 import sys
 import os
-
-from argparse import ArgumentParser
+import shutil
+import hashlib
+import io
+import json
+import struct
+import time
+
+from argparse import ArgumentParser, ArgumentTypeError
 from io import BytesIO
+from multiprocessing import Pool
 
 from rsa.pkcs1 import VerificationError
 
 
 DEFAULT_HASH_TYPE = 'SHA-1'
 
+# length of key id, in hex digits of the key fingerprint
+KEY_ID_LEN = 16
+
+# size of each of the head and tail of the data, for a quick check
+DEFAULT_QUICK_SIZE = 64 * 1024
+
 
 #=================================================================
 def numbits(x):
@@ -23,6 +52,14 @@ def numbits(x):
     return int(math.log(x, 2) / 8) + 1
 
 
+#=================================================================
+def key_fingerprint(pub_key):
+    """
+    Return the hex SHA-256 digest of the DER encoding of a public key
+    """
+    return hashlib.sha256(pub_key.save_pkcs1('DER')).hexdigest()
+
+
 #=================================================================
 class RSAMetadata(object):
     """
@@ -58,46 +95,424 @@ class RSAMetadata(object):
 
 
 #=================================================================
-class LimitReader(object):
+class RSATreeMetadata(RSAMetadata):
+    """
+    Custom metadata which represents an RSA signature of the root
+    of a hash tree over fixed size chunks, see treehash.
+    The chunk size is stored before the signature
+    """
+    def __init__(self, signature='', size=0, chunk_size=0):
+        super(RSATreeMetadata, self).__init__(signature, size)
+        self.chunk_size = chunk_size
+
+    def id(self):
+        return 'RT'
+
+    def size(self):
+        return super(RSATreeMetadata, self).size() + 8
+
+    def write(self, fh):
+        write64(fh, self.chunk_size)
+        fh.write(self.signature)
+
+    def read(self, fh):
+        self.chunk_size = read64(fh)
+        self.signature = fh.read(super(RSATreeMetadata, self).size())
+
+
+#=================================================================
+class RSACheckpointMetadata(RSATreeMetadata):
     """
-    A simple reader which will not read more than specified limit
+    Custom metadata which represents an RSA tree signature, also storing
+    the tree over all complete chunks (the peaks of the tree) as a
+    checkpoint, from which the tree can be continued after appending
+    to the file, see treehash.HashTree
+
+    The size varies with the number of complete chunks, so the
+    size is stored last, and can be read with read_tail_size()
+    """
+    def __init__(self, signature='', size=0, chunk_size=0, tree=None):
+        super(RSACheckpointMetadata, self).__init__(signature, size,
+                                                    chunk_size)
+        self.tree = tree
+
+    def id(self):
+        return 'RC'
+
+    def size(self):
+        if not self.signature:
+            return self._size
+
+        peaks_size = sum(len(peak) for peak in self.tree.peaks)
+
+        return 8 + 8 + 2 + peaks_size + len(self.signature) + 2
+
+    def write(self, fh):
+        digest_size = len(self.tree.peaks[0]) if self.tree.peaks else 0
+
+        write64(fh, self.chunk_size)
+        write64(fh, self.tree.count)
+        write16(fh, digest_size)
+        for peak in self.tree.peaks:
+            fh.write(peak)
+
+        fh.write(self.signature)
+        write16(fh, self.size())
+
+    def read(self, fh):
+        self.chunk_size = read64(fh)
+        count = read64(fh)
+        digest_size = read16(fh)
+
+        # one peak per set bit of count
+        num_peaks = bin(count).count('1')
+        peaks = [fh.read(digest_size) for i in xrange(num_peaks)]
+
+        # hash type is only known once signature is verified
+        self.tree = HashTree(None, count, peaks)
+
+        sig_size = self._size - 8 - 8 - 2 - num_peaks * digest_size - 2
+        self.signature = fh.read(sig_size)
+
+        assert read16(fh) == self._size
+
+
+#=================================================================
+class RSAKeyMetadata(RSAMetadata):
+    """
+    Custom metadata which represents an RSA signature, along with
+    the id of the signing key, the start of its key_fingerprint(),
+    so that the key can be found before verifying.
+
+    The size varies with the key size, so the size is stored last,
+    and can be read with read_tail_size()
+    """
+    def __init__(self, signature='', size=0, key_id=''):
+        super(RSAKeyMetadata, self).__init__(signature, size)
+        self.key_id = key_id[:KEY_ID_LEN]
+
+    def id(self):
+        return 'RK'
+
+    def size(self):
+        if not self.signature:
+            return self._size
+
+        return KEY_ID_LEN / 2 + len(self.signature) + 2
+
+    def write(self, fh):
+        fh.write(self.key_id.decode('hex'))
+        fh.write(self.signature)
+        write16(fh, self.size())
+
+    def read(self, fh):
+        self.key_id = fh.read(KEY_ID_LEN / 2).encode('hex')
+        self.signature = fh.read(self._size - KEY_ID_LEN / 2 - 2)
+
+        assert read16(fh) == self._size
+
+
+#=================================================================
+class Ed25519Metadata(object):
+    """
+    Custom metadata which represents an Ed25519 signature of a digest,
+    see backends.CryptographyBackend. The hash type can not be found
+    from the signature, so it is stored before it, padded to 8 bytes
+    """
+    def __init__(self, signature='', hash_type=''):
+        self.signature = signature
+        self.hash_type = hash_type
+
+    def id(self):
+        return 'ED'
+
+    def size(self):
+        return 8 + ED25519_SIG_SIZE
+
+    def write(self, fh):
+        fh.write(self.hash_type.ljust(8, '\000'))
+        fh.write(self.signature)
+
+    def read(self, fh):
+        self.hash_type = fh.read(8).rstrip('\000')
+        self.signature = fh.read(ED25519_SIG_SIZE)
+
+
+#=================================================================
+class SignedInfoMetadata(object):
+    """
+    Custom metadata which represents a signature of fields describing
+    the signed data, rather than of its digest alone: the hash type and
+    digest (or tree root) of the data, its length, a digest of its head
+    and tail, the signing time and the key id, see sign_info()
+
+    All fields are covered by the signature, so that a file of the wrong
+    length, or with a modified head or tail, can be rejected without
+    hashing the data, see verify_stream(quick=...)
+
+    The fields are stored as tagged values, see gzipmeta.pack_fields(),
+    followed by the signature, its size and the total size, which
+    can be read with read_tail_size()
+    """
+    # (tag, attribute, is integer) of each field
+    FIELDS = (('HT', 'hash_type', False),
+              ('LN', 'length', True),
+              ('DG', 'digest', False),
+              ('CS', 'chunk_size', True),
+              ('QS', 'quick_size', True),
+              ('QD', 'quick_digest', False),
+              ('TS', 'timestamp', True),
+              ('KI', 'key_id', False))
+
+    REQUIRED = ('hash_type', 'length', 'digest', 'quick_size', 'quick_digest')
+
+    def __init__(self, signature='', size=0, **fields):
+        self.signature = signature
+        self._size = size
+
+        for tag, name, is_int in self.FIELDS:
+            setattr(self, name, fields.get(name))
+
+        self.packed = None
+
+    def id(self):
+        return 'SI'
+
+    def pack(self):
+        """ Return the packed fields, as read, or to be signed
+        """
+        if self.packed is None:
+            fields = []
+            for tag, name, is_int in self.FIELDS:
+                value = getattr(self, name)
+                if value is None:
+                    continue
+
+                if is_int:
+                    value = struct.pack('<Q', value)
+                elif name == 'key_id':
+                    value = value[:KEY_ID_LEN].decode('hex')
+
+                fields.append((tag, value))
+
+            self.packed = pack_fields(fields)
+
+        return self.packed
+
+    def info_digest(self):
+        """ The digest of the packed fields, which is signed
+        """
+        hasher = new_hash(self.hash_type)
+        hasher.update(self.pack())
+        return hasher.digest()
+
+    def size(self):
+        if not self.signature:
+            return self._size
+
+        return len(self.pack()) + len(self.signature) + 2 + 2
+
+    def write(self, fh):
+        fh.write(self.pack())
+        fh.write(self.signature)
+        write16(fh, len(self.signature))
+        write16(fh, self.size())
+
+    def read(self, fh):
+        buff = fh.read(self._size - 4)
+        sig_size = read16(fh)
+        assert read16(fh) == self._size
+        assert 0 < sig_size <= len(buff)
+
+        self.packed = buff[:-sig_size]
+        self.signature = buff[-sig_size:]
+
+        # unknown tags are ignored, but still covered by the signature
+        fields = dict(unpack_fields(self.packed))
+        for tag, name, is_int in self.FIELDS:
+            value = fields.get(tag)
+            if value is not None:
+                if is_int:
+                    value = struct.unpack('<Q', value)[0]
+                elif name == 'key_id':
+                    value = value.encode('hex')
+
+            setattr(self, name, value)
+
+        for name in self.REQUIRED:
+            assert getattr(self, name) is not None
+
+
+#=================================================================
+class MultiSignatureMetadata(object):
+    """
+    Custom metadata which represents signatures of the same digest by
+    several keys, so that data signed by many parties is hashed once,
+    and no signature covers the others, see multisign.MultiSigner
+
+    The hash type and chunk size (for the root of a hash tree) are
+    stored as tagged values, see gzipmeta.pack_fields(), followed by
+    the key id and signature of each key, and the size, which can be
+    read with read_tail_size()
+    """
+    def __init__(self, signatures=None, size=0, hash_type='',
+                 chunk_size=None):
+        # list of (key id, signature)
+        self.signatures = signatures or []
+        self._size = size
+        self.hash_type = hash_type
+        self.chunk_size = chunk_size
+
+    def id(self):
+        return 'MS'
+
+    def pack(self):
+        fields = [('HT', self.hash_type)]
+        if self.chunk_size:
+            fields.append(('CS', struct.pack('<Q', self.chunk_size)))
+
+        for key_id, signature in self.signatures:
+            fields.append(('KI', key_id[:KEY_ID_LEN].decode('hex')))
+            fields.append(('SG', signature))
+
+        return pack_fields(fields)
+
+    def size(self):
+        if not self.signatures:
+            return self._size
+
+        return len(self.pack()) + 2
+
+    def write(self, fh):
+        fh.write(self.pack())
+        write16(fh, self.size())
+
+    def read(self, fh):
+        fields = unpack_fields(fh.read(self._size - 2))
+        assert read16(fh) == self._size
+
+        self.signatures = []
+        key_id = None
+
+        for tag, value in fields:
+            if tag == 'HT':
+                self.hash_type = value
+            elif tag == 'CS':
+                self.chunk_size = struct.unpack('<Q', value)[0]
+            elif tag == 'KI':
+                key_id = value.encode('hex')
+            elif tag == 'SG':
+                assert key_id
+                self.signatures.append((key_id, value))
+                key_id = None
+
+        assert self.hash_type and self.signatures
+
+    def find_signature(self, key_id):
+        """ The signature by the key with the given fingerprint, or None
+        """
+        for sig_key_id, signature in self.signatures:
+            if sig_key_id == key_id[:KEY_ID_LEN]:
+                return signature
+
+        return None
+
+
+#=================================================================
+class LimitReader(io.RawIOBase):
+    """
+    A simple reader which will not read more than specified limit.
+    Supports readinto(), without copying, if the stream does,
+    and can be wrapped in io.BufferedReader
     """
 
     def __init__(self, stream, limit):
         self.stream = stream
         self.limit = limit
 
-    def read(self, length=8192):
-        length = min(length, self.limit)
-        if length == 0:
-            return ''
+    def readable(self):
+        return True
 
-        buff = self.stream.read(length)
-        self.limit -= len(buff)
-        return buff
+    def readinto(self, b):
+        size = min(len(b), self.limit)
+        if size <= 0:
+            return 0
+
+        count = _readinto(self.stream, memoryview(b)[:size])
+        self.limit -= count
+        return count
 
 
 #=================================================================
 class UnsignedStream(LimitReader):
+    """
+    A reader of the unsigned_len bytes of a stream before its signature
+    (of the size of rsa_meta), without reading the signature.
+
+    After unsigned_len bytes, only the size of the signature is read
+    ahead, to check that it is a signature. If not, it is returned as
+    data, followed by the rest of the stream
+    """
     def __init__(self, stream, unsigned_len, rsa_meta):
         super(UnsignedStream, self).__init__(stream, unsigned_len)
         self.rsa_meta = rsa_meta
 
-    def read(self, length=8192):
-        buff = super(UnsignedStream, self).read(length)
-        if buff:
-            return buff
+        self._lookahead = None
+        self._lookahead_pos = 0
+        self._remainder = False
+
+    def readinto(self, b):
+        count = super(UnsignedStream, self).readinto(b)
+
+        # data, or stream ended before unsigned_len
+        if count or self.limit > 0:
+            return count
+
+        if self._lookahead is None:
+            self._lookahead = self._read_lookahead()
+
+        if self._lookahead_pos < len(self._lookahead):
+            count = min(len(b), len(self._lookahead) - self._lookahead_pos)
+            end = self._lookahead_pos + count
+            memoryview(b)[:count] = self._lookahead[self._lookahead_pos:end]
+            self._lookahead_pos = end
+            return count
+
+        if self._remainder:
+            return _readinto(self.stream, b)
+
+        return 0
+
+    def _read_lookahead(self):
+        sig_header = size_of_header(self.rsa_meta)
 
-        # check that remainder is actually a signature
-        buff = self.stream.read()
-        if not buff:
+        buff = ''
+        while len(buff) < sig_header:
+            data = self.stream.read(sig_header - len(buff))
+            if not data:
+                break
+            buff += data
+
+        if not buff or read_metadata(BytesIO(buff), self.rsa_meta,
+                                     seek=False):
             return ''
 
-        # if not, just return buff
-        if not read_metadata(BytesIO(buff), self.rsa_meta, seek=False):
-            return buff
+        # not a signature, return as data with rest of stream
+        self._remainder = True
+        return buff
+
+
+def _readinto(stream, b):
+    """ Read into writable buffer b from stream, with readinto()
+    if supported
+    """
+    readinto = getattr(stream, 'readinto', None)
+    if readinto:
+        return readinto(b)
 
-        return ''
+    buff = stream.read(len(b))
+    memoryview(b)[:len(buff)] = buff
+    return len(buff)
 
 
 #=================================================================
@@ -106,50 +521,569 @@ class RSASigner(object):
     in an empty gzip record.
     - private key file should be specified for signing
     - public key file should be specified for verification
+    - buff_size is the size of each read (or mapped window) when hashing
+    - chunk_size and threads are used for tree signatures, chunk_size
+    is the size of each leaf chunk of the tree when signing, and threads
+    the number of threads hashing chunks (default: one per cpu)
+    - cache may be a VerifyCache, or the path to its db, to store
+    verification results of files by file identity
+    - backend is the name of the signature backend, 'rsa' (default)
+    or 'cryptography' for native RSA or Ed25519 keys, see backends
+    - stats may be a Stats, to collect bytes read, read, hash and rsa
+    times, and to report progress, of all operations of the signer
+    - quick_size is the size of the head and tail of the data whose
+    digest is signed with info=True, see sign_info()
+    - remote may be the path of the unix socket of a signing daemon,
+    to sign with its key instead of a private key file, see daemon
+    - io_mode is how files are read, 'mmap' (default), or 'sequential'
+    to read the signature with one read and the data with large
+    sequential reads, dropped from the page cache once hashed,
+    see hashing.hash_sequential()
     """
-    def __init__(self, private_key_file=None, public_key_file=None):
-        if private_key_file:
-            with open(private_key_file) as priv_fh:
-                priv_data = priv_fh.read()
-            self.priv_key = rsa.PrivateKey.load_pkcs1(priv_data)
-        else:
-            self.priv_key = None
-
-        if public_key_file:
-            with open(public_key_file) as pub_fh:
-                pub_data = pub_fh.read()
-            self.pub_key = rsa.PublicKey.load_pkcs1(pub_data)
+    def __init__(self, private_key_file=None, public_key_file=None,
+                 buff_size=DEFAULT_BUFF_SIZE,
+                 chunk_size=DEFAULT_CHUNK_SIZE,
+                 threads=None,
+                 cache=None,
+                 backend=None,
+                 stats=None,
+                 quick_size=DEFAULT_QUICK_SIZE,
+                 remote=None,
+                 io_mode=MMAP_IO):
+        if io_mode not in IO_MODES:
+            raise ValueError('Invalid io mode: %s' % io_mode)
+
+        if chunk_size <= 0:
+            raise ValueError('Invalid chunk size: %s' % chunk_size)
+
+        self.io_mode = io_mode
+        self.buff_size = buff_size
+        self.chunk_size = chunk_size
+        self.quick_size = quick_size
+        self.threads = threads
+
+        if cache and not isinstance(cache, VerifyCache):
+            cache = VerifyCache(cache)
+
+        self.cache = cache
+        self.stats = stats
+
+        if remote:
+            backend = RemoteBackend(remote)
+
+        self.backend = load_backend(backend, private_key_file,
+                                    public_key_file)
+
+        self.priv_key = self.backend.priv_key
+        self.pub_key = self.backend.pub_key
+
+        if self.pub_key:
+            self.key_id = self.backend.key_fingerprint()
         else:
-            self.pub_key = None
-
-    def sign(self, file_, hash_type=DEFAULT_HASH_TYPE):
+            self.key_id = None
+
+    def sign(self, file_, hash_type=DEFAULT_HASH_TYPE, index=False,
+             tree=False, checkpoint=False, key_id=False, info=False,
+             cdx=False):
+        """ Sign a file or stream. If index is set, also write a signed
+        index of each gzip member (record). If tree is set, sign the
+        root of a hash tree instead. If checkpoint is set, also store
+        the tree for appending. If key_id is set, store the key id with
+        the signature. If info is set, sign the length, head and tail
+        of the data too. If cdx is set, also write a CDX index of
+        the records, see sign_stream()
+        """
         if hasattr(file_, 'read'):
-            return self.sign_stream(file_, hash_type)
+            return self.sign_stream(file_, hash_type, index or None, tree,
+                                    checkpoint, key_id, info, cdx or None)
         else:
             if not os.path.isfile(file_):
                 return False
 
+            if index is True:
+                index = file_ + RECORD_INDEX_EXT
+
+            if cdx is True:
+                cdx = file_ + CDX_INDEX_EXT
+
             with open(file_, 'a+') as fh:
-                return self.sign_stream(fh, hash_type)
+                return self.sign_stream(fh, hash_type, index or None, tree,
+                                        checkpoint, key_id, info,
+                                        cdx or None)
+
+    def sign_stream(self, fh, hash_type, index=None, tree=False,
+                    checkpoint=False, key_id=False, info=False, cdx=None):
+        """ Sign a seekable stream, appending the signature.
+
+        If index is a filename or writable stream, the digest of each gzip
+        member is computed in the same pass and a signed RecordIndex
+        is written to it, along with the signed digest and length of the
+        data. Not signed if the stream is not valid gzip.
+
+        If tree is set, the root of a hash tree over chunk_size chunks
+        is signed, with chunks hashed in parallel if possible, and
+        stored as RSATreeMetadata
+
+        If checkpoint is set, a tree signature is stored as
+        RSACheckpointMetadata. checkpoint may also be the metadata returned
+        by unsign_stream(), in which case only the data from its last
+        complete chunk is hashed
+
+        If key_id is set, the signature is stored as RSAKeyMetadata,
+        along with the id of the key. Not supported for tree signatures
+
+        If info is set, the signature is stored as SignedInfoMetadata,
+        also covering the length, head and tail of the data and the key
+        id, see sign_info(). Not supported with checkpoint
+
+        If cdx is a filename or writable stream, the url and date of
+        each WARC record, and the offset and length of its gzip member,
+        are found in the same pass, and a CdxIndex is written to it.
+        Not signed if the stream is not valid gzip with WARC records,
+        see warccheck.WarcChecker
+
+        With an Ed25519 key, only the plain signature is supported,
+        stored as Ed25519Metadata, or SignedInfoMetadata with info
+        """
+        if index is True:
+            raise ValueError('index must be a filename or stream ' +
+                             'when signing a stream')
+
+        if cdx is True:
+            raise ValueError('cdx must be a filename or stream ' +
+                             'when signing a stream')
+
+        if key_id and (tree or checkpoint) and not info:
+            raise ValueError('key_id is not supported for tree signatures')
+
+        if info and checkpoint:
+            raise ValueError('info is not supported for checkpoints')
+
+        if self.backend.key_type == ED25519 and (tree or checkpoint or
+                                                 (key_id and not info)):
+            raise ValueError('Only plain signatures are supported ' +
+                             'for Ed25519 keys')
+
+        chunk_size = self.chunk_size
+        start = 0
+        hash_tree = None
+
+        if checkpoint:
+            tree = True
+
+        if (isinstance(checkpoint, RSACheckpointMetadata) and
+            not index and not cdx):
+            chunk_size = checkpoint.chunk_size
+            hash_tree = checkpoint.tree
+            hash_type = hash_tree.hash_type
+            start = hash_tree.count * chunk_size
+
+            fh.seek(0, 2)
+            if fh.tell() < start:
+                return False
+
+        elif tree:
+            hash_tree = HashTree(hash_type)
+
+        if tree and not index and not cdx:
+            total_len = None
+            last = self._hash_tree_chunks(fh, hash_tree, chunk_size,
+                                          start, None)
+            digest = hash_tree.root(last)
+        else:
+            if tree:
+                hasher = TreeHasher(hash_type, chunk_size, hash_tree)
+            else:
+                hasher = new_hash(hash_type)
+
+            hashers = [hasher]
+
+            if index:
+                scanner = MemberScanner(hash_type)
+                hashers.append(scanner)
+
+            if cdx:
+                checker = WarcChecker(self.threads, index=True)
+                hashers.append(checker)
+
+            try:
+                total_len = self._hash_file(fh, hashers)
+            finally:
+                if cdx:
+                    checker.close()
 
-    def sign_stream(self, fh, hash_type):
-        fh.seek(0)
-        signature = rsa.sign(fh, self.priv_key, hash_type)
+            if index and not scanner.close():
+                return False
+
+            if cdx and checker.error is not None:
+                return False
+
+            digest = hasher.digest()
 
-        rsa_meta = RSAMetadata(signature)
+        if info:
+            fh.seek(0, 2)
+            rsa_meta = self.sign_info(fh, digest, hash_type, fh.tell(),
+                                      chunk_size if tree else None)
+        else:
+            rsa_meta = self.sign_digest(digest, hash_type,
+                                        chunk_size if tree else None,
+                                        hash_tree if checkpoint else None,
+                                        key_id)
 
         write_metadata(fh, rsa_meta)
 
         fh.flush()
+
+        if index:
+            record_index = RecordIndex(hash_type, total_len, scanner.members,
+                                       digest)
+            self.sign_record_index(record_index, index, hash_type)
+
+        if cdx:
+            checker.cdx_index(cdx_filename(fh)).write_to(cdx)
+
         return True
 
-    def verify(self, file_, size=None, remove=False,
-               hash_type=DEFAULT_HASH_TYPE):
+    def sign_digest(self, digest, hash_type, chunk_size=None,
+                    hash_tree=None, key_id=False):
+        """ Sign an already computed digest, returning the signature
+        metadata to append with write_metadata():
+        RSAMetadata for the digest of the data, RSATreeMetadata if the digest
+        is the root of a hash tree over chunk_size chunks, or
+        RSACheckpointMetadata if the hash_tree of the complete chunks is
+        also given. If key_id is set, RSAKeyMetadata for the digest of
+        the data, along with the key id.
+        For an Ed25519 key, Ed25519Metadata for the digest of the data
+        """
+        with self._timer('rsa_time'):
+            signature = self.backend.sign_hash(digest, hash_type)
+
+        if self.backend.key_type == ED25519:
+            return Ed25519Metadata(signature, hash_type)
+        elif key_id:
+            return RSAKeyMetadata(signature, key_id=self.key_id)
+        elif hash_tree:
+            return RSACheckpointMetadata(signature, chunk_size=chunk_size,
+                                         tree=hash_tree)
+        elif chunk_size:
+            return RSATreeMetadata(signature, chunk_size=chunk_size)
+        else:
+            return RSAMetadata(signature)
+
+    def sign_info(self, fh, digest, hash_type, length, chunk_size=None):
+        """ Sign the digest of the data of seekable stream fh, of given
+        length, (or the root of a hash tree over chunk_size chunks)
+        along with its length, the digest of its first and last
+        quick_size bytes, the time and the key id, returning the
+        SignedInfoMetadata to append with write_metadata()
+        """
+        quick_digest = self._quick_digest(fh, hash_type, length,
+                                          self.quick_size)
+
+        rsa_meta = SignedInfoMetadata(hash_type=hash_type,
+                                      length=length,
+                                      digest=digest,
+                                      chunk_size=chunk_size,
+                                      quick_size=self.quick_size,
+                                      quick_digest=quick_digest,
+                                      timestamp=int(time.time()),
+                                      key_id=self.key_id)
+
+        with self._timer('rsa_time'):
+            rsa_meta.signature = self.backend.sign_hash(
+                                    rsa_meta.info_digest(), hash_type)
+
+        return rsa_meta
+
+    def append(self, file_, data):
+        """ Append data, a string or stream, to a file signed with
+        checkpoint=True and sign it again, only hashing the data after the
+        last complete chunk. If the file does not have a valid checkpoint
+        signature, it is left unchanged and False is returned
+        """
+        if not os.path.isfile(file_):
+            return False
+
+        with open(file_, 'a+') as fh:
+            checkpoint = self.unsign_stream(fh)
+            if not checkpoint:
+                return False
+
+            if hasattr(data, 'read'):
+                shutil.copyfileobj(data, fh, self.buff_size)
+            else:
+                fh.write(data)
+
+            return self.sign_stream(fh, None, checkpoint=checkpoint)
+
+    def unsign(self, file_):
+        """ Remove a checkpoint signature from a file, see unsign_stream()
+        """
+        if not os.path.isfile(file_):
+            return None
+
+        with open(file_, 'a+') as fh:
+            return self.unsign_stream(fh)
+
+    def unsign_stream(self, fh):
+        """ Remove a checkpoint signature from seekable stream fh,
+        returning the checkpoint metadata, which can be passed to
+        sign_stream() to sign again after appending.
+
+        The signature is checked against the checkpoint, only hashing
+        the last incomplete chunk. The complete chunks are not verified,
+        but if they have been modified, a new signature made from the
+        checkpoint will not verify.
+
+        If the stream is not signed with a valid checkpoint signature,
+        None is returned and the stream is unchanged
+        """
+        sig_header, rsa_meta = self.read_signature(fh)
+        if not isinstance(rsa_meta, RSACheckpointMetadata):
+            return None
+
+        fh.seek(0, 2)
+        total_len = fh.tell() - sig_header
+
+        try:
+            with self._timer('rsa_time'):
+                hash_type, signature_hash = self.backend.find_hash(
+                                                rsa_meta.signature)
+        except VerificationError:
+            return None
+
+        hash_tree = rsa_meta.tree
+        hash_tree.hash_type = hash_type
+
+        digest_size = new_hash(hash_type).digest_size
+        if any(len(peak) != digest_size for peak in hash_tree.peaks):
+            return None
+
+        # checkpoint must end at last chunk boundary
+        start = hash_tree.count * rsa_meta.chunk_size
+        if not (start <= total_len < start + rsa_meta.chunk_size):
+            return None
+
+        last = None
+        if total_len > start:
+            fh.seek(start)
+            last = leaf_hash(hash_type, fh.read(total_len - start))
+
+        if hash_tree.root(last) != signature_hash:
+            return None
+
+        fh.truncate(total_len)
+        return rsa_meta
+
+    def sign_record_index(self, record_index, index,
+                          hash_type=DEFAULT_HASH_TYPE):
+        """ Write and sign a RecordIndex to a filename or stream
+        """
+        return self._write_signed(record_index, index, hash_type)
+
+    def load_record_index(self, index):
+        """ Load a RecordIndex from a filename or stream, only if the
+        index signature is verified. Return None otherwise
+        """
+        data = self._read_verified(index)
+        if data is None:
+            return None
+
+        return RecordIndex.load(BytesIO(data))
+
+    def sign_manifest(self, files, manifest, hash_type=DEFAULT_HASH_TYPE):
+        """ Sign many files with a single signature: hash each file,
+        in parallel by threads, and write a Manifest of their names, sizes
+        and digests to manifest, a filename or stream, which is then signed.
+        The files themselves are not modified.
+
+        Names are stored relative to the directory of a manifest filename.
+        Return False if any file can not be read
+        """
+        base_dir = _manifest_dir(manifest)
+
+        try:
+            entries = [(_manifest_name(filename, base_dir), size, digest)
+                       for filename, size, digest in
+                       hash_files(files, hash_type, self.threads,
+                                  self.buff_size)]
+        except (IOError, OSError):
+            return False
+
+        return self._write_signed(Manifest(hash_type, entries),
+                                  manifest, hash_type)
+
+    def load_manifest(self, manifest):
+        """ Load a Manifest from a filename or stream, only if the
+        manifest signature is verified. Return None otherwise
+        """
+        data = self._read_verified(manifest)
+        if data is None:
+            return None
+
+        return Manifest.load(BytesIO(data), _manifest_dir(manifest))
+
+    def verify_manifest(self, manifest, files=None):
+        """ Verify files against a signed manifest, checking the
+        manifest signature once, and then the size and digest of each file,
+        in parallel by threads.
+
+        manifest may be a Manifest already loaded with load_manifest(),
+        a manifest filename or stream. files defaults to all files
+        of the manifest.
+
+        Return a list of (filename, result), or None if the manifest
+        signature is not verified
+        """
+        if not isinstance(manifest, Manifest):
+            manifest = self.load_manifest(manifest)
+            if not manifest:
+                return None
+
+        if files is None:
+            names = manifest.names()
+            files = [manifest.path(name) for name in names]
+        else:
+            names = [_manifest_name(filename, manifest.base_dir)
+                     for filename in files]
+
+        results = manifest.verify_files(names, self.threads, self.buff_size)
+
+        return [(filename, result) for filename, (name, result)
+                in zip(files, results)]
+
+    def _write_signed(self, obj, target, hash_type):
+        """ Write obj to a filename or stream, and sign it
+        """
+        if hasattr(target, 'write'):
+            obj.write(target)
+            return self.sign_stream(target, hash_type)
+
+        with open(target, 'w+b') as fh:
+            obj.write(fh)
+            return self.sign_stream(fh, hash_type)
+
+    def _read_verified(self, source):
+        """ Read all data of a filename or stream, only if its
+        signature is verified. Return None otherwise
+        """
+        if hasattr(source, 'read'):
+            data = source.read()
+        else:
+            if not os.path.isfile(source):
+                return None
+
+            with open(source, 'rb') as fh:
+                data = fh.read()
+
+        if not self.verify(BytesIO(data)):
+            return None
+
+        return data
+
+    def verify_record(self, file_, offset, length, index=None):
+        """ Verify a single record (gzip member) at offset and length
+        of file or stream, against a signed record index, only reading
+        the record itself.
+
+        index may be a RecordIndex already loaded with load_record_index(),
+        an index filename or stream. For a filename, the default index
+        is the filename + '.sigidx'
+
+        The index must be of this file: the length of its signed data must
+        be that of the index, and its signature of the digest of the index,
+        checked from the tail of the file, without hashing it
+        """
+        if index is None:
+            if hasattr(file_, 'read'):
+                return False
+
+            index = file_ + RECORD_INDEX_EXT
+
+        if not isinstance(index, RecordIndex):
+            index = self.load_record_index(index)
+            if not index:
+                return False
+
+        if hasattr(file_, 'read'):
+            return self._verify_indexed_record(file_, offset, length, index)
+
+        if not os.path.isfile(file_):
+            return False
+
+        with open(file_, 'rb') as fh:
+            return self._verify_indexed_record(fh, offset, length, index)
+
+    def _verify_indexed_record(self, fh, offset, length, index):
+        sig_header, rsa_meta = self.read_signature(fh)
+        if not rsa_meta:
+            return False
+
+        fh.seek(0, 2)
+        total_len = fh.tell() - sig_header
+
+        if not self.signs_digest(rsa_meta, index.digest, index.hash_type):
+            return False
+
+        return index.verify_record(fh, offset, length, total_len,
+                                   self.buff_size)
+
+    def signs_digest(self, rsa_meta, digest, hash_type):
+        """ Return True if signature metadata of any type is a signature
+        with the key of the given digest (or tree root) of the data
+        """
+        with self._timer('rsa_time'):
+            if isinstance(rsa_meta, SignedInfoMetadata):
+                return (rsa_meta.hash_type == hash_type and
+                        rsa_meta.digest == digest and
+                        (not rsa_meta.key_id or
+                         rsa_meta.key_id == self.key_id[:KEY_ID_LEN]) and
+                        self.backend.verify_hash(rsa_meta.signature,
+                                                 rsa_meta.info_digest(),
+                                                 hash_type))
+
+            if isinstance(rsa_meta, MultiSignatureMetadata):
+                signature = rsa_meta.find_signature(self.key_id)
+                return (signature is not None and
+                        rsa_meta.hash_type == hash_type and
+                        self.backend.verify_hash(signature, digest,
+                                                 hash_type))
+
+            if (isinstance(rsa_meta, RSAKeyMetadata) and
+                rsa_meta.key_id != self.key_id[:KEY_ID_LEN]):
+                return False
+
+            return self.backend.verify_hash(rsa_meta.signature, digest,
+                                            hash_type)
+
+    def verify(self, file_, size=None, remove=False, hash_type=None,
+               quick=False, checker=None):
+        """ Verify a file or stream. The hash type is found from the
+        signature, except for a non-seekable stream of known size,
+        see verify_stream_data(). If quick is set, only check the
+        length, head and tail of data signed with info=True, see
+        verify_stream(). Quick results are not cached
+
+        If checker is set, eg. a warccheck.WarcChecker, it is also passed
+        the signed data, in the same pass, and the result is only True
+        if checker.close() is too. quick and the cache are then not used
+        """
+        if checker:
+            try:
+                return self._verify(file_, size, remove, hash_type,
+                                    False, checker)
+            finally:
+                checker.close()
+
+        return self._verify(file_, size, remove, hash_type, quick)
+
+    def _verify(self, file_, size, remove, hash_type, quick, checker=None):
         if hasattr(file_, 'read'):
             if size is not None:
-                return self.verify_stream_data(file_, size, hash_type)
+                return self.verify_stream_data(file_, size, hash_type,
+                                               checker)
             else:
-                return self.verify_stream(file_, remove)
+                return self.verify_stream(file_, remove, quick, checker)
         else:
             if not os.path.isfile(file_):
                 return False
@@ -157,60 +1091,314 @@ class RSASigner(object):
             mod = 'r' if not remove else 'a+'
 
             with open(file_, mod) as fh:
-                return self.verify_stream(fh, remove)
+                if self.cache and not remove and not quick and not checker:
+                    return self.verify_cached(fh, hash_type)
+
+                return self.verify_stream(fh, remove, quick, checker)
+
+    def verify_cached(self, fh, hash_type=None):
+        """ Verify a file, using the cached result if the file (and key)
+        have not changed since last verified. The result is only
+        cached if the file did not change while being verified
+        """
+        st = os.fstat(fh.fileno())
+
+        # hash type is found from the signature
+        hash_type = hash_type or ''
+
+        result = self.cache.get(st, self.key_id, hash_type)
+        if result is not None:
+            return result
+
+        result = self.verify_stream(fh)
+
+        if file_identity(os.fstat(fh.fileno())) == file_identity(st):
+            self.cache.put(st, self.key_id, hash_type, result)
+
+        return result
 
     def get_rsa_metadata(self):
-        size = numbits(self.pub_key.n)
+        """ Return (sig_header, metadata) for a plain signature
+        with the key: RSAMetadata, or Ed25519Metadata for an Ed25519 key
+        """
+        if self.backend.key_type == ED25519:
+            rsa_meta = Ed25519Metadata()
+        else:
+            rsa_meta = RSAMetadata(size=self.backend.sig_size())
 
-        rsa_meta = RSAMetadata(size=size)
         sig_header = size_of_header(rsa_meta)
         return sig_header, rsa_meta
 
-    def verify_stream(self, fh, remove=False):
-        sig_header, rsa_meta = self.get_rsa_metadata()
-        try:
-            fh.seek(-sig_header, 2)
-        except IOError:
-            return False
+    def get_tree_metadata(self):
+        tree_meta = RSATreeMetadata(size=self.backend.sig_size())
+        sig_header = size_of_header(tree_meta)
+        return sig_header, tree_meta
+
+    def get_sized_metadata(self, fh):
+        """ Return (sig_header, metadata) for each metadata type
+        which stores its own size, using the size at the end of fh
+        """
+        size = read_tail_size(fh)
+        if not size:
+            return []
+
+        sized_metas = []
+        for meta_cls in (SignedInfoMetadata, MultiSignatureMetadata,
+                         RSACheckpointMetadata, RSAKeyMetadata):
+            sized_meta = meta_cls(size=size)
+            sized_metas.append((size_of_header(sized_meta), sized_meta))
+
+        return sized_metas
+
+    def read_signature(self, fh):
+        """ Read signature metadata, of any supported type, from the end
+        of seekable stream fh. Return (sig_header, metadata), or
+        (0, None) if no signature is found
+        """
+        # candidates are read from the tail, read at once
+        if self.io_mode == SEQUENTIAL_IO:
+            fh = read_tail(fh)
+
+        candidates = [self.get_rsa_metadata()]
+        if self.backend.key_type != ED25519:
+            candidates.append(self.get_tree_metadata())
+            candidates.extend(self.get_sized_metadata(fh))
+        else:
+            candidates.extend(meta for meta in self.get_sized_metadata(fh)
+                              if isinstance(meta[1], (SignedInfoMetadata,
+                                                      MultiSignatureMetadata)))
 
-        if not read_metadata(fh, rsa_meta):
+        for sig_header, rsa_meta in candidates:
+            try:
+                fh.seek(-sig_header, 2)
+            except IOError:
+                continue
+
+            if read_metadata(fh, rsa_meta):
+                return sig_header, rsa_meta
+
+        return 0, None
+
+    def get_signed_length(self, file_):
+        """ Return the length of the signed data of a file or seekable
+        stream, before the signature, as found by verify_stream(), or
+        None if not signed. The signature is not verified
+        """
+        if not hasattr(file_, 'read'):
+            if not os.path.isfile(file_):
+                return None
+
+            with open(file_, 'rb') as fh:
+                return self.get_signed_length(fh)
+
+        sig_header, rsa_meta = self.read_signature(file_)
+        if not rsa_meta:
+            return None
+
+        file_.seek(0, 2)
+        return file_.tell() - sig_header
+
+    def verify_stream(self, fh, remove=False, quick=False, checker=None):
+        """ Verify seekable stream fh, with the signature of any type.
+
+        For a SignedInfoMetadata signature, the signed fields are checked
+        first, rejecting data of the wrong length or with a modified head
+        or tail without hashing it, see verify_info(). If quick is set,
+        the data is not hashed at all, as a cheap check of files known to
+        have been verified before. Other signatures are always verified
+        in full
+
+        If checker is set, it is passed the data as it is hashed, and
+        closed, and the signature is only removed if it is valid
+        """
+        sig_header, rsa_meta = self.read_signature(fh)
+        if not rsa_meta:
             return False
 
         fh.seek(0, 2)
         total_len = fh.tell() - sig_header
 
-        fh.seek(0)
-        lim = LimitReader(fh, total_len)
-        try:
-            result = rsa.verify(lim, rsa_meta.signature, self.pub_key)
-        except VerificationError:
-            return False
+        if isinstance(rsa_meta, SignedInfoMetadata):
+            result = self.verify_info(fh, rsa_meta, total_len,
+                                      quick and not remove and not checker,
+                                      checker)
+
+        elif isinstance(rsa_meta, MultiSignatureMetadata):
+            result = self.verify_multi(fh, rsa_meta, total_len, checker)
+
+        else:
+            result = self.verify_digest(fh, rsa_meta, total_len, checker)
+
+        if result and checker:
+            result = checker.close()
 
         if result and remove:
             fh.truncate(total_len)
 
         return result
 
-    def verify_stream_data(self, fh, total_len, hash_type):
+    def verify_digest(self, fh, rsa_meta, total_len, checker=None):
+        """ Verify seekable stream fh, of total_len bytes of data, against
+        the signature of a digest or tree root, of any other type
+        """
+        # signed with a different key
+        if (isinstance(rsa_meta, RSAKeyMetadata) and
+            rsa_meta.key_id != self.key_id[:KEY_ID_LEN]):
+            return False
+
+        # hash type is determined from the signature, before hashing
+        hash_type = self.find_hash_type(rsa_meta)
+        if not hash_type:
+            return False
+
+        chunk_size = None
+        if isinstance(rsa_meta, RSATreeMetadata):
+            if rsa_meta.chunk_size <= 0:
+                return False
+
+            chunk_size = rsa_meta.chunk_size
+
+        digest = self.hash_data(fh, hash_type, total_len, chunk_size,
+                                checker)
+
+        with self._timer('rsa_time'):
+            return self.backend.verify_hash(rsa_meta.signature,
+                                            digest, hash_type)
+
+    def verify_info(self, fh, rsa_meta, total_len, quick=False,
+                    checker=None):
+        """ Verify seekable stream fh, of total_len bytes of data,
+        against SignedInfoMetadata, only reading its head and tail
+        unless the signed fields and head and tail match, and only
+        hashing all the data if quick is not set
+        """
+        hash_type = rsa_meta.hash_type
+        if hash_type not in HASH_METHODS:
+            return False
+
+        if rsa_meta.length != total_len:
+            return False
+
+        if rsa_meta.key_id and rsa_meta.key_id != self.key_id[:KEY_ID_LEN]:
+            return False
+
+        with self._timer('rsa_time'):
+            if not self.backend.verify_hash(rsa_meta.signature,
+                                            rsa_meta.info_digest(),
+                                            hash_type):
+                return False
+
+        quick_digest = self._quick_digest(fh, hash_type, total_len,
+                                          rsa_meta.quick_size)
+
+        if quick_digest != rsa_meta.quick_digest:
+            return False
+
+        if quick:
+            return True
+
+        digest = self.hash_data(fh, hash_type, total_len,
+                                rsa_meta.chunk_size, checker)
+
+        return digest == rsa_meta.digest
+
+    def verify_multi(self, fh, rsa_meta, total_len, checker=None):
+        """ Verify seekable stream fh, of total_len bytes of data, against
+        the signature of this key in MultiSignatureMetadata, if any
+        """
+        signature = rsa_meta.find_signature(self.key_id)
+        if not signature or rsa_meta.hash_type not in HASH_METHODS:
+            return False
+
+        digest = self.hash_data(fh, rsa_meta.hash_type, total_len,
+                                rsa_meta.chunk_size, checker)
+
+        with self._timer('rsa_time'):
+            return self.backend.verify_hash(signature, digest,
+                                            rsa_meta.hash_type)
+
+    def hash_data(self, fh, hash_type, length, chunk_size=None,
+                  checker=None):
+        """ Return the digest of the first length bytes of seekable
+        stream fh, or the root of a hash tree over chunk_size chunks.
+        If set, checker is passed the data too, in the same pass,
+        with tree chunks then hashed in order
+        """
+        if chunk_size and not checker:
+            hash_tree = HashTree(hash_type)
+            last = self._hash_tree_chunks(fh, hash_tree, chunk_size,
+                                          0, length)
+            return hash_tree.root(last)
+
+        if chunk_size:
+            hasher = TreeHasher(hash_type, chunk_size)
+        else:
+            hasher = new_hash(hash_type)
+
+        self._hash_file(fh, [hasher, checker] if checker else [hasher],
+                        length)
+        return hasher.digest()
+
+    def find_hash_type(self, rsa_meta):
+        """ Return the hash type of a signature, stored in its metadata
+        or found by decrypting it, or None if not a supported type
+        """
+        if isinstance(rsa_meta, Ed25519Metadata):
+            hash_type = rsa_meta.hash_type
+        else:
+            try:
+                with self._timer('rsa_time'):
+                    hash_type, _ = self.backend.find_hash(rsa_meta.signature)
+            except VerificationError:
+                return None
+
+        if hash_type not in HASH_METHODS:
+            return None
+
+        return hash_type
+
+    def verify_stream_data(self, fh, total_len, hash_type=None,
+                           checker=None):
+        """ Verify a stream of known total length, without seeking,
+        reading it only once.
+
+        The signature is only read after the data is hashed, so hash_type
+        may be a list of candidate hash types, each computed in the same
+        pass, and the one found from the signature is verified.
+        If hash_type is None, the candidates are SIGN_HASH_TYPES.
+        If set, checker is passed the data too, and closed
+        """
         sig_header, rsa_meta = self.get_rsa_metadata()
 
         total_len -= sig_header
 
-        lim = LimitReader(fh, total_len)
+        hash_types = candidate_hash_types(hash_type)
+        hashers = [new_hash(candidate) for candidate in hash_types]
 
-        def read_sig():
-            if not read_metadata(fh, rsa_meta, seek=False):
-                return False
+        self._hash_stream(LimitReader(fh, total_len),
+                          hashers + [checker] if checker else hashers)
 
-            return rsa_meta.signature
+        if not read_metadata(fh, rsa_meta, seek=False):
+            return False
 
-        try:
-            result = _rsa_streaming_verify(lim, read_sig,
-                                           self.pub_key, hash_type)
-        except VerificationError:
+        if checker and not checker.close():
             return False
 
-        return result
+        return self.verify_candidates(rsa_meta, hash_types, hashers)
+
+    def verify_candidates(self, rsa_meta, hash_types, hashers):
+        """ Verify a plain signature, of the digest of one of hash_types,
+        computed by the hasher at the same index of hashers
+        """
+        signed_type = self.find_hash_type(rsa_meta)
+        if signed_type not in hash_types:
+            return False
+
+        digest = hashers[hash_types.index(signed_type)].digest()
+
+        with self._timer('rsa_time'):
+            return self.backend.verify_hash(rsa_meta.signature,
+                                            digest, signed_type)
 
     def get_unsigned_stream(self, fh, total_len, hash_type=DEFAULT_HASH_TYPE):
         """ Return a stream that truncates the signature, if present
@@ -220,47 +1408,275 @@ class RSASigner(object):
 
         return UnsignedStream(fh, total_len, rsa_meta)
 
+    def _timer(self, field):
+        if not self.stats:
+            return NULL_TIMER
+
+        return self.stats.timer(field)
+
+    def _quick_digest(self, fh, hash_type, length, quick_size):
+        """ Digest of the first and last quick_size bytes of the
+        length bytes of data of seekable stream fh
+        """
+        hasher = new_hash(hash_type)
+
+        for offset in (0, max(length - quick_size, 0)):
+            fh.seek(offset)
+            self._hash_stream(fh, [hasher], min(quick_size, length))
+
+        return hasher.digest()
+
+    def _hash_file(self, fh, hashers, length=None, start=0):
+        if self.stats:
+            hashers = [self.stats.hasher(hashers)]
+
+        if self.io_mode == SEQUENTIAL_IO:
+            reader = self.stats.reader if self.stats else None
+            return hash_sequential(fh, hashers, length, self.buff_size,
+                                   start, reader)
+
+        if self.stats:
+            fh = self.stats.reader(fh)
+
+        return hash_file(fh, hashers, length, self.buff_size)
+
+    def _hash_stream(self, fh, hashers, limit=None):
+        if self.stats:
+            fh = self.stats.reader(fh)
+            hashers = [self.stats.hasher(hashers)]
+
+        return hash_stream(fh, hashers, limit, self.buff_size)
+
+    def _hash_tree_chunks(self, fh, hash_tree, chunk_size, start, length):
+        # chunks hashed in order, from sequential reads
+        if self.io_mode == SEQUENTIAL_IO and is_regular_file(fh):
+            tree_hasher = TreeHasher(hash_tree.hash_type, chunk_size,
+                                     hash_tree)
+            self._hash_file(fh, [tree_hasher], length, start)
+            return tree_hasher.last_leaf()
+
+        if not self.stats:
+            return hash_tree_chunks(fh, hash_tree, chunk_size, start, length,
+                                    self.threads, self.buff_size)
+
+        # reads are done by the hashing threads, included in hash_time
+        with self.stats.timer('hash_time'):
+            return hash_tree_chunks(fh, hash_tree, chunk_size, start, length,
+                                    self.threads, self.buff_size,
+                                    self.stats.add_bytes)
+
+
+#=================================================================
+def candidate_hash_types(hash_type=None):
+    """ List of candidate hash types, when the hash type of a signature
+    is only known after hashing: hash_type, if a string, or a list of
+    hash types, or SIGN_HASH_TYPES by default
+
+    >>> candidate_hash_types('SHA-1')
+    ['SHA-1']
+    >>> candidate_hash_types() == SIGN_HASH_TYPES
+    True
+    """
+    if not hash_type:
+        return list(SIGN_HASH_TYPES)
+    elif isinstance(hash_type, basestring):
+        return [hash_type]
+    else:
+        return list(hash_type)
+
+
+#=================================================================
+def _manifest_dir(manifest):
+    if hasattr(manifest, 'read') or hasattr(manifest, 'write'):
+        return None
+
+    return os.path.dirname(os.path.abspath(manifest))
+
+
+def _manifest_name(filename, base_dir):
+    if not base_dir:
+        return filename
+
+    return os.path.relpath(os.path.abspath(filename), base_dir)
+
 
 #=================================================================
-def _rsa_streaming_verify(fh, sig_func, pub_key, hash_type):
+# worker pool support for the cli tools, each worker process loads
+# the key(s) once in the initializer and reuses its signer
+_worker_signer = None
+
+
+def _init_worker(signer_kwargs, signer_cls=None):
+    global _worker_signer
+    _worker_signer = (signer_cls or RSASigner)(**signer_kwargs)
+
+
+def _sign_worker(args):
+    input_, kwargs = args
+    return _run_worker(input_, _worker_signer.sign, input_, **kwargs)
+
+
+def _verify_worker(args):
+    input_, kwargs = args
+    return _run_worker(input_, _worker_signer.verify, input_, **kwargs)
+
+
+def _deep_verify_worker(args):
+    """ Verify, also checking the gzip members and WARC records with
+    a WarcChecker, adding the offset and reason of the first invalid
+    member to the stats, if any. If cdx is set, a CdxIndex of each
+    verified file is written to <input>.cdx
+    """
+    input_, kwargs = args
+    kwargs = dict(kwargs)
+    cdx = kwargs.pop('cdx', False)
+    checker = WarcChecker(kwargs.pop('threads', None), index=cdx)
+
+    input_, result, stats = _run_worker(input_, _worker_signer.verify,
+                                        input_, checker=checker, **kwargs)
+
+    if result and cdx:
+        cdx_index = checker.cdx_index(os.path.basename(input_))
+        cdx_index.write_to(input_ + CDX_INDEX_EXT)
+
+    if checker.error is not None:
+        stats = dict(stats or {}, invalid_member=checker.error,
+                     invalid_reason=checker.reason)
+
+    return input_, result, stats
+
+
+def _run_worker(input_, func, *args, **kwargs):
+    """ Return (input, result, stats), where stats is a dict of
+    the signer Stats of this call only, if the signer has stats
+    """
+    stats = _worker_signer.stats
+    if not stats:
+        return input_, func(*args, **kwargs), None
+
+    stats.reset()
+    with stats.timer('total_time'):
+        result = func(*args, **kwargs)
+
+    return input_, result, stats.as_dict()
+
+
+def run_jobs(func, inputs, signer_kwargs, jobs=1, signer_cls=None):
+    """ Apply a worker func to each input, yielding (input, result, stats)
+    tuples as soon as each one is finished.
+
+    If jobs > 1, the inputs are processed by a pool of jobs processes,
+    and results are yielded in order of completion, otherwise inputs
+    are processed serially in the current process.
+
+    Each worker creates a signer_cls (default RSASigner) from signer_kwargs
+    """
+    if jobs <= 1:
+        _init_worker(signer_kwargs, signer_cls)
+        for input_ in inputs:
+            yield func(input_)
+        return
+
+    pool = Pool(jobs, _init_worker, (signer_kwargs, signer_cls))
+    try:
+        for res in pool.imap_unordered(func, inputs):
+            yield res
+
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
 
-    # Compute hash first, using given type
-    message_hash = rsa.pkcs1._hash(fh, hash_type)
 
-    # Compute signature given sig_func(), presumably
-    # reading rest of stream
-    signature = sig_func()
+def _parse_inputs(parser, args):
+    """ Parse args of a parser with optional inputs (nargs='*'), also
+    accepting inputs after options, eg. "key.pem -r file", which
+    argparse leaves unparsed once the (empty) inputs are consumed
+    """
+    cmd, extra = parser.parse_known_args(args=args)
 
-    if not signature:
-        raise VerificationError('Verification failed')
+    unknown = [arg for arg in extra if arg.startswith('-') and arg != '-']
+    if unknown:
+        parser.error('unrecognized arguments: %s' % ' '.join(unknown))
 
-    # Below is copy of rest of rsa.verify() to check the signature
-    # ------------------------------------------------------------
-    blocksize = rsa.common.byte_size(pub_key.n)
-    encrypted = rsa.transform.bytes2int(signature)
-    decrypted = rsa.core.decrypt_int(encrypted, pub_key.e, pub_key.n)
-    clearsig = rsa.transform.int2bytes(decrypted, blocksize)
+    cmd.inputs += extra
+    return cmd
 
-    # If we can't find the signature  marker, verification failed.
-    if clearsig[0:2] != rsa._compat.b('\x00\x01'):
-        raise VerificationError('Verification failed')
 
-    # Find the 00 separator between the padding and the payload
+def _positive_int(value):
+    """ argparse type of sizes, which must be positive
+    """
     try:
-        sep_idx = clearsig.index(rsa._compat.b('\x00'), 2)
-    except ValueError:  # pragma: no cover (part of rsa.verify())
-        raise VerificationError('Verification failed')
+        number = int(value)
+    except ValueError:
+        number = 0
+
+    if number <= 0:
+        raise ArgumentTypeError('must be a positive integer: %s' % value)
+
+    return number
+
+
+def _add_jobs_arg(parser):
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes to use ' +
+                             '(default: 1, no worker pool)')
 
-    # Get the hash method and and signature
-    (actual_hash_type, signature_hash) = (rsa.pkcs1.
-        _find_method_hash(clearsig[sep_idx + 1:]))
+    parser.add_argument('-t', '--threads', type=int,
+                        help='number of threads hashing each file, ' +
+                             'for tree signatures (default: one per cpu)')
 
-    # Compare the real hash to the hash in the signature
-    if message_hash != signature_hash or hash_type != actual_hash_type:
-        raise VerificationError('Verification failed')
+    parser.add_argument('--backend', choices=sorted(BACKENDS),
+                        help='signature backend, cryptography is native ' +
+                             'and supports Ed25519 keys (default: rsa)')
 
-    # end rsa.verify() --------------------------------------------
-    return True
+    parser.add_argument('--io', choices=IO_MODES, default=MMAP_IO,
+                        help='how files are read, sequential avoids ' +
+                             'small reads and evicting the page cache, ' +
+                             'eg. on network filesystems ' +
+                             '(default: %(default)s)')
+
+    parser.add_argument('--stats', action='store_true',
+                        help='output JSON lines with the bytes read, read, ' +
+                             'hash and rsa times of each file, and totals')
+
+
+def _print_results(results, key, ok_msg, err_msg, stats=False):
+    """ Print the results of run_jobs(), as text lines or
+    JSON lines with stats. Return true if any input failed
+    """
+    errs = False
+    total = Stats()
+    count = 0
+
+    for input_, res, file_stats in results:
+        if not res:
+            errs = True
+
+        if not stats:
+            msg = ok_msg if res else err_msg
+            if file_stats and 'invalid_member' in file_stats:
+                print msg, input_, ('(invalid member at %(invalid_member)d: '
+                                    '%(invalid_reason)s)' % file_stats)
+            else:
+                print msg, input_
+            continue
+
+        count += 1
+        file_stats = file_stats or {}
+        total.add(Stats.from_dict(file_stats))
+
+        file_stats['file'] = input_
+        file_stats[key] = bool(res)
+        print json.dumps(file_stats, sort_keys=True)
+
+    if stats:
+        total = total.as_dict()
+        total['files'] = count
+        total['total'] = True
+        print json.dumps(total, sort_keys=True)
+
+    return errs
 
 
 #=================================================================
@@ -268,25 +1684,108 @@ def sign_cli(args=None):
     parser = ArgumentParser(description='sign warcs(s) with given private key')
 
     parser.add_argument('private_key',
-                        help='a privatekey.pem file in PEM format')
+                        help='a privatekey.pem file in PEM format, ' +
+                             'or the socket of a warc-sign-daemon')
 
     parser.add_argument('inputs', nargs='+',
                         help='one or more files to sign')
 
-    cmd = parser.parse_args(args=args)
+    parser.add_argument('-i', '--index', action='store_true',
+                        help='also write a signed index of each record ' +
+                             'to <input>' + RECORD_INDEX_EXT)
 
-    signer = RSASigner(private_key_file=cmd.private_key)
+    parser.add_argument('--tree', action='store_true',
+                        help='sign the root of a hash tree over fixed ' +
+                             'size chunks, hashed in parallel')
 
-    errs = False
+    parser.add_argument('--checkpoint', action='store_true',
+                        help='sign a hash tree, also storing a checkpoint ' +
+                             'to allow appending without rehashing')
 
-    for input_ in cmd.inputs:
-        res = signer.sign(input_)
+    parser.add_argument('--key-id', action='store_true',
+                        help='store the id of the signing key ' +
+                             'with the signature')
 
-        if res:
-            print 'Signed ', input_
-        else:
-            print 'NOT SIGNED'
-            errs = True
+    parser.add_argument('--info', action='store_true',
+                        help='also sign the length, head and tail of ' +
+                             'the data, the time and key id, for fast ' +
+                             'rejection and quick checks')
+
+    parser.add_argument('--cdx', action='store_true',
+                        help='also write a CDX index of the url, date, ' +
+                             'offset and length of each record to ' +
+                             '<input>' + CDX_INDEX_EXT)
+
+    parser.add_argument('-k', '--key', action='append', default=[],
+                        help='an additional private key, to sign with ' +
+                             'several keys in one pass, may be repeated')
+
+    parser.add_argument('--hash', default=DEFAULT_HASH_TYPE,
+                        choices=SIGN_HASH_TYPES,
+                        help='hash type to sign (default: %(default)s), ' +
+                             'found from the signature when verifying')
+
+    parser.add_argument('--chunk-size', type=_positive_int,
+                        default=DEFAULT_CHUNK_SIZE,
+                        help='size of each hash tree chunk, with --tree ' +
+                             '(default: %(default)s)')
+
+    parser.add_argument('-m', '--manifest',
+                        help='instead of signing each file, write a ' +
+                             'manifest of the digest of each file, ' +
+                             'signed once, to this file')
+
+    _add_jobs_arg(parser)
+
+    cmd = parser.parse_args(args=args)
+
+    signer_kwargs = dict(private_key_file=cmd.private_key,
+                         chunk_size=cmd.chunk_size,
+                         threads=cmd.threads,
+                         backend=cmd.backend,
+                         io_mode=cmd.io,
+                         stats=Stats() if cmd.stats else None)
+
+    sign_kwargs = dict(hash_type=cmd.hash,
+                       index=cmd.index,
+                       tree=cmd.tree,
+                       checkpoint=cmd.checkpoint,
+                       key_id=cmd.key_id,
+                       info=cmd.info,
+                       cdx=cmd.cdx)
+
+    signer_cls = None
+
+    # sign with the key of a daemon, only hashing locally
+    if _is_socket(cmd.private_key):
+        signer_kwargs['remote'] = signer_kwargs.pop('private_key_file')
+
+    # one signature per key, of a single digest
+    if cmd.key:
+        if (cmd.index or cmd.checkpoint or cmd.key_id or cmd.info or
+            cmd.cdx or cmd.manifest or 'remote' in signer_kwargs):
+            parser.error('--key can not be used with --index, ' +
+                         '--checkpoint, --key-id, --info, --cdx, ' +
+                         '--manifest or a daemon socket')
+
+        from multisign import MultiSigner
+        signer_cls = MultiSigner
+        signer_kwargs['private_key_files'] = [cmd.private_key] + cmd.key
+        del signer_kwargs['private_key_file']
+
+        sign_kwargs = dict(hash_type=cmd.hash, tree=cmd.tree)
+
+    if cmd.manifest:
+        signer = RSASigner(**signer_kwargs)
+        res = signer.sign_manifest(cmd.inputs, cmd.manifest, cmd.hash)
+        results = [(cmd.manifest, res, None)]
+    else:
+        inputs = [(input_, sign_kwargs) for input_ in cmd.inputs]
+        results = run_jobs(_sign_worker, inputs, signer_kwargs, cmd.jobs,
+                           signer_cls)
+
+    errs = _print_results(results, 'signed', 'Signed ', 'NOT SIGNED ',
+                          cmd.stats)
 
     return 0 if not errs else 1
 
@@ -296,28 +1795,186 @@ def verify_cli(args=None):
     parser = ArgumentParser(description='verify warcs with given public key')
 
     parser.add_argument('public_key',
-                        help='a public_key.pem file in PEM format')
+                        help='a public_key.pem file in PEM format, ' +
+                             'or a directory of *.pem public keys')
 
-    parser.add_argument('inputs', nargs='+',
-                        help='one or more files to verify')
+    parser.add_argument('inputs', nargs='*',
+                        help='one or more files to verify, or with ' +
+                             '--tar or --framed, streams (default: stdin)')
 
 
     parser.add_argument('-r', '--remove', help='remove verification signature',
                         action='store_true')
 
-    cmd = parser.parse_args(args=args)
+    parser.add_argument('-q', '--quick', action='store_true',
+                        help='for files signed with --info, only check ' +
+                             'the signed length, head and tail of the data')
+
+    parser.add_argument('--cache',
+                        help='path to a cache db of verification ' +
+                             'results, unchanged files are not verified again')
+
+    parser.add_argument('--deep', action='store_true',
+                        help='also check the gzip CRC and length and ' +
+                             'the WARC records of each member, in the ' +
+                             'same pass, decompressed by --threads')
+
+    parser.add_argument('--cdx', action='store_true',
+                        help='as --deep, also writing a CDX index of ' +
+                             'each verified file to <input>' + CDX_INDEX_EXT)
+
+    parser.add_argument('-m', '--manifest',
+                        help='verify files against a signed manifest, ' +
+                             'by default all files of the manifest')
+
+    parser.add_argument('-k', '--key', action='append', default=[],
+                        help='an additional public key, to verify files ' +
+                             'signed with several keys, may be repeated')
+
+    parser.add_argument('--require', type=int,
+                        help='with --key, the number of keys which must ' +
+                             'be verified (default: all)')
+
+    packed = parser.add_mutually_exclusive_group()
+    packed.add_argument('--tar', action='store_true',
+                        help='verify each file of tar stream(s), ' +
+                             'in one pass, eg. from a pipe')
+
+    packed.add_argument('--framed', action='store_true',
+                        help='verify each member of framed stream(s), ' +
+                             'each a "<size> <name>" line and the data')
+
+    _add_jobs_arg(parser)
+
+    cmd = _parse_inputs(parser, args)
+
+    is_packed = cmd.tar or cmd.framed
+
+    if not cmd.inputs and not cmd.manifest and not is_packed:
+        parser.error('no files to verify')
+
+    if is_packed and (os.path.isdir(cmd.public_key) or cmd.manifest or
+                      cmd.remove):
+        parser.error('--tar and --framed require a public key file, ' +
+                     'and no --manifest or --remove')
+
+    if cmd.key and (os.path.isdir(cmd.public_key) or cmd.manifest or
+                    is_packed or cmd.cache):
+        parser.error('--key requires a public key file, ' +
+                     'and no --manifest, --tar, --framed or --cache')
+
+    if (cmd.deep or cmd.cdx) and (cmd.manifest or is_packed):
+        parser.error('--deep and --cdx can not be used with --manifest, ' +
+                     '--tar or --framed')
+
+    signer_kwargs = dict(public_key_file=cmd.public_key,
+                         threads=cmd.threads,
+                         cache=cmd.cache,
+                         backend=cmd.backend,
+                         io_mode=cmd.io,
+                         stats=Stats() if cmd.stats else None)
+
+    signer_cls = None
+
+    # verify with any key in directory
+    if os.path.isdir(cmd.public_key):
+        from keyring import Keyring
+        signer_cls = Keyring
+        signer_kwargs = dict(public_key_files=[cmd.public_key],
+                             threads=cmd.threads,
+                             cache=cmd.cache,
+                             backend=cmd.backend,
+                             io_mode=cmd.io,
+                             stats=signer_kwargs['stats'])
+
+    # verify signatures of several keys, hashing once
+    elif cmd.key:
+        from multisign import MultiSigner
+        signer_cls = MultiSigner
+        signer_kwargs = dict(public_key_files=[cmd.public_key] + cmd.key,
+                             required=cmd.require,
+                             threads=cmd.threads,
+                             backend=cmd.backend,
+                             io_mode=cmd.io,
+                             stats=signer_kwargs['stats'])
+
+    if cmd.manifest:
+        results = _verify_manifest(signer_kwargs, signer_cls, cmd)
+    elif is_packed:
+        results = _verify_packed(signer_kwargs, cmd)
+    else:
+        verify_kwargs = dict(remove=cmd.remove, quick=cmd.quick)
+        worker = _verify_worker
+
+        if cmd.deep or cmd.cdx:
+            verify_kwargs = dict(remove=cmd.remove, threads=cmd.threads,
+                                 cdx=cmd.cdx)
+            worker = _deep_verify_worker
+
+        inputs = [(input_, verify_kwargs) for input_ in cmd.inputs]
+        results = run_jobs(worker, inputs, signer_kwargs, cmd.jobs,
+                           signer_cls)
+
+    errs = _print_results(results, 'verified', 'Verified ', 'NOT VERIFIED ',
+                          cmd.stats)
 
-    signer = RSASigner(public_key_file=cmd.public_key)
+    return 0 if not errs else 1
 
-    errs = False
 
-    for input_ in cmd.inputs:
-        res = signer.verify(input_, remove=cmd.remove is not None)
+def _verify_manifest(signer_kwargs, signer_cls, cmd):
+    signer = None
+    results = None
 
-        if res:
-            print 'Verified ', input_
-        else:
-            print 'NOT VERIFIED'
-            errs = True
+    if not signer_cls:
+        signer = RSASigner(**signer_kwargs)
 
-    return 0 if not errs else 1
+    elif os.path.isfile(cmd.manifest):
+        # find the key of the manifest signature
+        with open(cmd.manifest, 'rb') as fh:
+            signer = signer_cls(**signer_kwargs).find_signer(fh)
+
+    if signer:
+        results = signer.verify_manifest(cmd.manifest, cmd.inputs or None)
+
+    if results is None:
+        return [(cmd.manifest, False, None)]
+
+    return [(filename, result, None) for filename, result in results]
+
+
+def _verify_packed(signer_kwargs, cmd):
+    from packed import verify_tar, verify_framed
+    import tarfile
+
+    signer = RSASigner(**signer_kwargs)
+    stats = signer.stats
+
+    verify_members = verify_tar if cmd.tar else verify_framed
+
+    for input_ in cmd.inputs or ['-']:
+        try:
+            if input_ == '-':
+                fh = io.open(sys.stdin.fileno(), 'rb', closefd=False)
+            else:
+                fh = io.open(input_, 'rb')
+        except IOError:
+            yield input_, False, None
+            continue
+
+        try:
+            if stats:
+                stats.reset()
+
+            # each member is reported as <input>:<member name>
+            for name, result in verify_members(signer, fh):
+                yield (input_ + ':' + name, result,
+                       stats.as_dict() if stats else None)
+
+                if stats:
+                    stats.reset()
+
+        except (tarfile.TarError, ValueError, IOError):
+            yield input_, False, None
+
+        finally:
+            fh.close()
@@ -0,0 +1,106 @@
+from gzipmeta import write_metadata
+from hashing import new_hash
+from treehash import TreeHasher
+
+from warcsigner import DEFAULT_HASH_TYPE
+
+
+#=================================================================
+class SigningWriter(object):
+    """
+    A writable stream wrapper which hashes all data as it is written,
+    and when closed, appends the signature to the stream, so that
+    the written data never needs to be read back to be signed.
+
+    fh may be a writable stream or a filename to create.
+
+    For file rotation, rotate() signs and closes the current stream,
+    and continues writing to a new one.
+
+    tree and checkpoint are as in RSASigner.sign(), using the
+    signer chunk_size. The tree is hashed serially as data is written.
+
+    If used as a context manager and an exception occurs,
+    the stream is closed but not signed.
+    """
+    def __init__(self, signer, fh, hash_type=DEFAULT_HASH_TYPE,
+                 tree=False, checkpoint=False, close_stream=True):
+        self.signer = signer
+        self.hash_type = hash_type
+        self.tree = tree or checkpoint
+        self.checkpoint = checkpoint
+        self.close_stream = close_stream
+
+        self._start(fh)
+
+    def _start(self, fh):
+        if not hasattr(fh, 'write'):
+            fh = open(fh, 'wb')
+
+        self.fh = fh
+        self.length = 0
+        self.closed = False
+
+        if self.tree:
+            self.hasher = TreeHasher(self.hash_type, self.signer.chunk_size)
+        else:
+            self.hasher = new_hash(self.hash_type)
+
+    def write(self, buff):
+        if self.closed:
+            raise ValueError('write to closed SigningWriter')
+
+        self.fh.write(buff)
+        self.hasher.update(buff)
+        self.length += len(buff)
+
+    def tell(self):
+        return self.length
+
+    def flush(self):
+        self.fh.flush()
+
+    def _sign(self):
+        """ Append the signature of all data written
+        to the current stream, only when closing it
+        """
+        chunk_size = None
+        hash_tree = None
+
+        if self.tree:
+            chunk_size = self.signer.chunk_size
+
+        if self.checkpoint:
+            hash_tree = self.hasher.tree
+
+        rsa_meta = self.signer.sign_digest(self.hasher.digest(),
+                                           self.hash_type,
+                                           chunk_size, hash_tree)
+
+        write_metadata(self.fh, rsa_meta)
+        self.fh.flush()
+
+    def close(self, sign=True):
+        if self.closed:
+            return
+
+        if sign:
+            self._sign()
+
+        if self.close_stream:
+            self.fh.close()
+
+        self.closed = True
+
+    def rotate(self, fh):
+        """ Sign and close the current stream, and continue
+        writing to a new stream or filename fh
+        """
+        self.close()
+        self._start(fh)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(sign=exc_type is None)